@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from pathlib import Path
+import json
 import os
 
 from dotenv import load_dotenv
@@ -9,6 +10,20 @@ BASE_DIR = Path(__file__).resolve().parent
 load_dotenv(BASE_DIR / ".env")
 
 
+def _load_config_json(path: Path) -> dict:
+	try:
+		return json.loads(path.read_text())
+	except (OSError, ValueError):
+		return {}
+
+
+CONFIG_JSON = _load_config_json(BASE_DIR / "config.json")
+
+
+def _config_value(env_key: str, json_key: str, default: str) -> str:
+	return os.getenv(env_key, str(CONFIG_JSON.get(json_key, default)))
+
+
 @dataclass
 class Settings:
 	base_dir: Path = BASE_DIR
@@ -17,6 +32,26 @@ class Settings:
 
 	azure_connection_string: str = os.getenv("AZURE_STORAGE_CONNECTION_STRING", "")
 	azure_container: str = os.getenv("AZURE_STORAGE_CONTAINER", "images")
+	azure_block_size_mb: float = float(os.getenv("AZURE_BLOCK_SIZE_MB", "4"))
+	azure_max_concurrency: int = int(os.getenv("AZURE_MAX_CONCURRENCY", "4"))
+	azure_chunked_threshold_mb: float = float(os.getenv("AZURE_CHUNKED_THRESHOLD_MB", "8"))
+	azure_upload_state_dir: Path = BASE_DIR / "upload_state"
+	azure_progressive_upload: bool = os.getenv("AZURE_PROGRESSIVE_UPLOAD", "1") == "1"
+	azure_media_cache_dir: Path = BASE_DIR / "media_cache"
+	azure_media_cache_mb: float = float(os.getenv("AZURE_MEDIA_CACHE_MB", "512"))
+	# Larger blobs are streamed but never kept in the media cache.
+	azure_media_cache_max_file_mb: float = float(os.getenv("AZURE_MEDIA_CACHE_MAX_FILE_MB", "256"))
+	azure_props_ttl_sec: float = float(os.getenv("AZURE_PROPS_TTL_SEC", "300"))
+	azure_sas_ttl_sec: float = float(os.getenv("AZURE_SAS_TTL_SEC", "900"))
+	# azure.storage.blob.aio on one pooled aiohttp session (needs aiohttp); off falls back to the sync SDK.
+	azure_async: bool = os.getenv("AZURE_ASYNC", "1") == "1"
+	azure_pool_size: int = int(os.getenv("AZURE_POOL_SIZE", "16"))
+	azure_index_file: Path = BASE_DIR / "blob_index.sqlite3"
+	azure_index_sync_sec: float = float(os.getenv("AZURE_INDEX_SYNC_SEC", "300"))
+	azure_index_page_size: int = int(os.getenv("AZURE_INDEX_PAGE_SIZE", "1000"))
+	upload_journal_file: Path = BASE_DIR / "upload_queue.jsonl"
+	upload_workers: int = int(os.getenv("UPLOAD_WORKERS", "2"))
+	upload_max_attempts: int = int(os.getenv("UPLOAD_MAX_ATTEMPTS", "10"))
 
 	notification_cooldown: int = int(os.getenv("NOTIFICATION_COOLDOWN", "60"))
 
@@ -24,10 +59,27 @@ class Settings:
 	motion_min_area: int = int(os.getenv("MOTION_MIN_AREA", "500"))
 	motion_warmup_sec: float = float(os.getenv("MOTION_WARMUP_SEC", "3"))
 	motion_save_clips: bool = os.getenv("MOTION_SAVE_CLIPS", "0") == "1"
+	# Size motion detection samples the 640x480 lores Y plane down to; must divide it by one whole factor.
+	motion_lores_size: str = os.getenv("MOTION_LORES_SIZE", "320x240")
+	motion_clip_pre_sec: float = float(os.getenv("MOTION_CLIP_PRE_SEC", "5"))
+	motion_clip_post_sec: float = float(os.getenv("MOTION_CLIP_POST_SEC", "10"))
+	motion_clip_buffer_mb: float = float(os.getenv("MOTION_CLIP_BUFFER_MB", "4"))
 
 	stream_stale_sec: float = float(os.getenv("STREAM_STALE_SEC", "30"))
 	stream_debounce_sec: float = float(os.getenv("STREAM_DEBOUNCE_SEC", "5"))
 	stream_warmup_sec: float = float(os.getenv("STREAM_WARMUP_SEC", "10"))
+	stream_async: bool = os.getenv("STREAM_ASYNC", "1") == "1"
+	snapshot_max_age_sec: int = int(os.getenv("SNAPSHOT_MAX_AGE_SEC", "1"))
+	# Shared by HLS live view and motion clips; ~600 kbit/s is roughly a tenth of the 640x480 MJPEG stream.
+	lores_h264_bitrate: int = int(os.getenv("LORES_H264_BITRATE", "600000"))
+
+	camera_source: str = _config_value("CAMERA_SOURCE", "camera_source", "picamera")
+	usb_camera_device: str = _config_value("USB_CAMERA_DEVICE", "usb_camera_device", "/dev/video0")
+	usb_camera_size: str = _config_value("USB_CAMERA_SIZE", "usb_camera_size", "1280x720")
+	usb_camera_fps: float = float(_config_value("USB_CAMERA_FPS", "usb_camera_fps", "30"))
+	usb_camera_format: str = _config_value("USB_CAMERA_FORMAT", "usb_camera_format", "MJPG")
+	replay_source: str = os.getenv("REPLAY_SOURCE", "")
+	replay_fps: float = float(os.getenv("REPLAY_FPS", "15"))
 
 	rtc_enabled: bool = os.getenv("RTC_ENABLED", "0") == "1"
 	shutter_button_enabled: bool = os.getenv("SHUTTER_BUTTON_ENABLED", "1") == "1"
@@ -1,4 +1,7 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 
 try:
     from picamera2 import Picamera2  # noqa: F401
@@ -7,6 +10,9 @@ except Exception:
     PICAMERA_AVAILABLE = False
 
 from config import settings
+from services.camera_backends import create_camera_backend
+from services.clip_buffer import MotionClipBuffer
+from utils import parse_size
 from routers import azure_router, create_camera_router, create_events_router, create_notifications_router, create_motion_router
 from services import (
     azure_service,
@@ -16,9 +22,18 @@ from services import (
     ButtonService,
     StartupService,
     BackendService,
+    UploadQueue,
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Let in-flight uploads finish their journal writes before the process exits.
+    await run_in_threadpool(upload_queue.stop)
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(azure_router)
 MEDIA_DIR = settings.media_dir
 MEDIA_DIR.mkdir(exist_ok=True)
@@ -26,25 +41,56 @@ MEDIA_DIR.mkdir(exist_ok=True)
 if not azure_service.is_configured:
     print("[PiCam] Azure upload disabled: AZURE_STORAGE_CONNECTION_STRING not set")
 
+upload_queue = UploadQueue(
+    upload=lambda path, blob_name: azure_service.upload_path(path, blob_name=blob_name),
+    journal_path=settings.upload_journal_file,
+    workers=settings.upload_workers,
+    max_attempts=settings.upload_max_attempts,
+)
+if azure_service.is_configured:
+    upload_queue.start()
+    azure_service.start_index_sync(settings.azure_index_sync_sec)
+
 STREAM_STALE_SEC = settings.stream_stale_sec
 STREAM_DEBOUNCE_SEC = settings.stream_debounce_sec
 STREAM_WARMUP_SEC = settings.stream_warmup_sec
+STREAM_ASYNC = settings.stream_async
+SNAPSHOT_MAX_AGE_SEC = settings.snapshot_max_age_sec
 
 SHUTTER_BUTTON_ENABLED = settings.shutter_button_enabled
 SHUTTER_BUTTON_GPIO = settings.shutter_button_gpio
 MEDIA_RETENTION_DAYS = settings.media_retention_days
+MOTION_LORES_SIZE = parse_size(settings.motion_lores_size, (320, 240))
 recording_state = {"is_recording": False, "duration": 0, "start_time": None}
 
-camera_service = CameraService(
+camera_backend = create_camera_backend(
+    source=settings.camera_source,
     picamera_available=PICAMERA_AVAILABLE,
+    motion_size=MOTION_LORES_SIZE,
+    usb_device=settings.usb_camera_device,
+    usb_size=parse_size(settings.usb_camera_size, (1280, 720)),
+    usb_fps=settings.usb_camera_fps,
+    usb_format=settings.usb_camera_format,
+    replay_source=settings.replay_source or None,
+    replay_fps=settings.replay_fps,
+    lores_h264_bitrate=settings.lores_h264_bitrate,
+)
+print(f"[PiCam] Camera backend: {camera_backend.name}")
+
+camera_service = CameraService(
+    picamera_available=camera_backend.available,
     stream_stale_sec=STREAM_STALE_SEC,
     stream_debounce_sec=STREAM_DEBOUNCE_SEC,
     stream_warmup_sec=STREAM_WARMUP_SEC,
     is_recording=lambda: recording_state["is_recording"],
+    stream_async=STREAM_ASYNC,
+    backend=camera_backend,
+    snapshot_max_age_sec=SNAPSHOT_MAX_AGE_SEC,
 )
 
 motion_service = MotionService(
     get_frame_array=camera_service.get_frame_array,
+    get_gray_frame=camera_service.get_gray_frame,
     send_push_notification_sync=notification_service.send_push_notification_sync,
     add_notification=notification_service.add_notification,
     threshold=settings.motion_threshold,
@@ -61,7 +107,23 @@ backend_service = BackendService(
     motion_service=motion_service,
     notification_service=notification_service,
     azure_service=azure_service,
+    upload_queue=upload_queue,
+    progressive_upload=settings.azure_progressive_upload,
 )
+# Recording jobs stay "uploading" until the queue reports the blob landed (or gave up).
+upload_queue.on_uploaded = backend_service.upload_finished
+upload_queue.on_dropped = backend_service.upload_dropped
+
+if settings.motion_save_clips:
+    camera_service.enable_motion_clips(
+        MotionClipBuffer(
+            pre_seconds=settings.motion_clip_pre_sec,
+            post_seconds=settings.motion_clip_post_sec,
+            max_bytes=int(settings.motion_clip_buffer_mb * 1024 * 1024),
+            on_clip_ready=backend_service.motion_clip_ready,
+        )
+    )
+    motion_service.on_motion = backend_service.save_motion_clip
 
 app.include_router(create_events_router(MEDIA_DIR, backend_service.list_recordings))
 app.include_router(create_notifications_router(notification_service))
@@ -92,6 +154,14 @@ app.include_router(
         stop_stream_fn=backend_service.stop_stream,
         photo_fn=backend_service.photo,
         record_start_fn=backend_service.start_recording,
+        record_status_fn=backend_service.recording_status,
+        camera_session_fn=backend_service.camera_session,
+        snapshot_fn=backend_service.snapshot,
+        snapshot_max_age=SNAPSHOT_MAX_AGE_SEC,
+        hls_playlist_fn=backend_service.hls_playlist,
+        hls_init_fn=backend_service.hls_init_segment,
+        hls_segment_fn=backend_service.hls_segment,
+        stream_ws_fn=backend_service.stream_websocket,
     )
 )
 
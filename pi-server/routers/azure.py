@@ -1,22 +1,66 @@
+from typing import Optional
+
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.concurrency import run_in_threadpool
 
 from services import azure_service
+from utils import parse_timestamp
 
 
 router = APIRouter(tags=["azure"])
 
 
 @router.get("/azure/blobs")
-async def list_azure_blobs(limit: int = 10000):
+async def list_azure_blobs(
+    limit: int = 10000,
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    sas: bool = False,
+):
     if not azure_service.is_configured:
         return JSONResponse({"error": "Azure not configured"}, status_code=400)
     try:
-        blobs = await run_in_threadpool(azure_service.list_blobs, limit)
-        return JSONResponse(blobs)
+        since_ts = parse_timestamp(since) if since else None
+        until_ts = parse_timestamp(until) if until else None
+    except ValueError:
+        return JSONResponse({"error": "since/until must be epoch seconds or ISO 8601"}, status_code=400)
+    try:
+        blobs, next_cursor = await azure_service.query_blobs_async(
+            limit=limit,
+            cursor=cursor,
+            prefix=prefix,
+            since=since_ts,
+            until=until_ts,
+        )
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
     except Exception as exc:
         return JSONResponse({"error": f"Azure list failed: {exc}"}, status_code=500)
+    if sas:
+        try:
+            blobs = await run_in_threadpool(azure_service.with_sas_urls, blobs)
+        except Exception as exc:
+            return JSONResponse({"error": f"Azure SAS failed: {exc}"}, status_code=500)
+    # The body stays a plain list for existing clients; the next page is advertised in a header.
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if azure_service.indexing:
+        # The first index pass is still running, so this listing may be incomplete.
+        headers["X-Indexing"] = "true"
+    return JSONResponse(blobs, headers=headers)
+
+
+@router.get("/azure/url/{blob_name:path}")
+async def get_azure_url(blob_name: str):
+    if not azure_service.is_configured:
+        return JSONResponse({"error": "Azure not configured"}, status_code=400)
+    try:
+        url, expires_at = azure_service.sas_url(blob_name)
+    except Exception as exc:
+        return JSONResponse({"error": f"Azure SAS failed: {exc}"}, status_code=500)
+    return JSONResponse({"name": blob_name, "url": url, "expires_at": expires_at.isoformat()})
 
 
 @router.get("/azure/media/{blob_name:path}")
@@ -25,10 +69,9 @@ async def get_azure_media(blob_name: str, request: Request):
         return JSONResponse({"error": "Azure not configured"}, status_code=400)
 
     try:
-        chunks, media_type, status_code, headers = await run_in_threadpool(
-            azure_service.get_blob_stream,
+        chunks, media_type, status_code, headers = await azure_service.get_blob_stream_async(
             blob_name,
-            request.headers.get("range"),
+            request.headers,
         )
         return StreamingResponse(
             chunks,
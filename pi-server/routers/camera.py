@@ -1,5 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response, WebSocket
+from fastapi.responses import JSONResponse
 import inspect
+from typing import Optional
 from starlette.concurrency import run_in_threadpool
 
 from models import RecordRequest
@@ -17,6 +19,14 @@ def create_camera_router(
     stop_stream_fn,
     photo_fn,
     record_start_fn,
+    record_status_fn=None,
+    camera_session_fn=None,
+    snapshot_fn=None,
+    snapshot_max_age: int = 1,
+    hls_playlist_fn=None,
+    hls_init_fn=None,
+    hls_segment_fn=None,
+    stream_ws_fn=None,
     rtc_status_fn=None,
     rtc_sync_fn=None,
 ) -> APIRouter:
@@ -27,8 +37,58 @@ def create_camera_router(
         return await _invoke(health_fn)
 
     @router.get("/stream")
-    async def stream():
-        return await _invoke(stream_fn)
+    async def stream(width: Optional[int] = None, fps: Optional[float] = None, quality: Optional[int] = None):
+        return await _invoke(stream_fn, width=width, fps=fps, quality=quality)
+
+    if stream_ws_fn is not None:
+        @router.websocket("/stream/ws")
+        async def stream_ws(
+            websocket: WebSocket,
+            width: Optional[int] = None,
+            fps: Optional[float] = None,
+            quality: Optional[int] = None,
+            window: int = 2,
+        ):
+            await stream_ws_fn(websocket, width=width, fps=fps, quality=quality, window=window)
+
+    if snapshot_fn is not None:
+        @router.get("/snapshot.jpg")
+        async def snapshot(request: Request):
+            try:
+                data, etag = await _invoke(snapshot_fn)
+            except TimeoutError:
+                return JSONResponse({"error": "Camera busy"}, status_code=503, headers={"Retry-After": "1"})
+            headers = {"ETag": etag, "Cache-Control": f"max-age={snapshot_max_age}"}
+            if_none_match = request.headers.get("if-none-match", "")
+            if etag in {tag.strip() for tag in if_none_match.split(",")} or if_none_match.strip() == "*":
+                return Response(status_code=304, headers=headers)
+            return Response(content=data, media_type="image/jpeg", headers=headers)
+
+    if hls_playlist_fn is not None:
+        @router.get("/hls/stream.m3u8")
+        async def hls_playlist():
+            playlist = await _invoke(hls_playlist_fn)
+            if playlist is None:
+                return JSONResponse({"error": "HLS stream not available"}, status_code=503)
+            return Response(
+                content=playlist,
+                media_type="application/vnd.apple.mpegurl",
+                headers={"Cache-Control": "no-cache"},
+            )
+
+        @router.get("/hls/init.mp4")
+        async def hls_init():
+            data = await _invoke(hls_init_fn)
+            if data is None:
+                return JSONResponse({"error": "HLS stream not available"}, status_code=503)
+            return Response(content=data, media_type="video/mp4", headers={"Cache-Control": "no-cache"})
+
+        @router.get("/hls/segment_{seq}.m4s")
+        async def hls_segment(seq: int):
+            data = await _invoke(hls_segment_fn, seq)
+            if data is None:
+                return JSONResponse({"error": "Segment not found"}, status_code=404)
+            return Response(content=data, media_type="video/iso.segment", headers={"Cache-Control": "max-age=60"})
 
     @router.post("/stream/stop")
     async def stop_stream():
@@ -38,6 +98,11 @@ def create_camera_router(
     async def photo():
         return await _invoke(photo_fn)
 
+    if camera_session_fn is not None:
+        @router.get("/camera/session")
+        async def camera_session():
+            return await _invoke(camera_session_fn)
+
     if rtc_status_fn is not None:
         @router.get("/rtc/status")
         async def rtc_status():
@@ -52,4 +117,9 @@ def create_camera_router(
     async def start_recording(req: RecordRequest):
         return await _invoke(record_start_fn, req)
 
+    if record_status_fn is not None:
+        @router.get("/record/{job_id}")
+        async def recording_status(job_id: str):
+            return await _invoke(record_status_fn, job_id)
+
     return router
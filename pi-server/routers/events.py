@@ -1,8 +1,11 @@
+import mimetypes
 from pathlib import Path
 from typing import Callable
 
-from fastapi import APIRouter
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from utils import file_response
 
 
 def create_events_router(media_dir: Path, list_recordings_fn: Callable[[], list[Path]]) -> APIRouter:
@@ -12,7 +15,7 @@ def create_events_router(media_dir: Path, list_recordings_fn: Callable[[], list[
     async def events():
         photos = sorted(media_dir.glob("photo_*.jpg"), reverse=True)
         motion = sorted(media_dir.glob("motion_*.jpg"), reverse=True)
-        clips = sorted(media_dir.glob("motion_*.avi"), reverse=True)
+        clips = sorted(list(media_dir.glob("motion_*.mp4")) + list(media_dir.glob("motion_*.avi")), reverse=True)
         recordings = list_recordings_fn()
         payload = [
             {
@@ -39,10 +42,11 @@ def create_events_router(media_dir: Path, list_recordings_fn: Callable[[], list[
         return JSONResponse(payload)
 
     @router.get("/media/{filename}")
-    async def get_media(filename: str):
+    async def get_media(filename: str, request: Request):
         file_path = media_dir / filename
         if not file_path.exists():
             return JSONResponse({"error": "Not found"}, status_code=404)
-        return FileResponse(str(file_path))
+        media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        return file_response(file_path, request.headers, media_type)
 
     return router
@@ -0,0 +1,302 @@
+"""Benchmark AzureService uploads against a local fake Blob endpoint.
+
+Starts an in-process HTTP server that speaks just enough of the Blob REST API
+(Put Blob, Put Block, Put Block List, Get Block List, Get Blob, Get Blob
+Properties, List Blobs) for the real SDK, with a per-request round-trip delay
+and a per-connection throughput cap to mimic the Pi's uplink. Then times a
+single-call upload against block uploads at several concurrencies, and an
+interrupted-then-resumed block upload.
+
+With aiohttp installed it also compares concurrent ranged reads (as a video
+player scrubbing would issue) through the sync SDK on threads against the
+shared ``azure.storage.blob.aio`` client, counting new TCP connections.
+
+    python scripts/bench_azure_upload.py --size-mb 64 --rtt-ms 40 --conn-mbps 20
+"""
+import argparse
+import asyncio
+import base64
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from azure.storage.blob import BlobServiceClient  # noqa: E402
+
+from services.azure_async import AZURE_AIO_AVAILABLE, AsyncAzureClient  # noqa: E402
+from services.azure_service import AzureService  # noqa: E402
+
+ACCOUNT = "devstoreaccount1"
+ACCOUNT_KEY = base64.b64encode(b"fake-blob-endpoint-key").decode()
+
+
+class FakeBlobStore:
+    def __init__(self, rtt: float, conn_bytes_per_sec: float, fail_every: int = 0) -> None:
+        self.rtt = rtt
+        self.conn_bytes_per_sec = conn_bytes_per_sec
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.blobs: dict[str, bytes] = {}
+        self.blocks: dict[str, dict[str, bytes]] = {}
+        self.requests = 0
+        self.block_puts = 0
+        self.connections = 0
+
+
+def _handler(store: FakeBlobStore):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            with store.lock:
+                store.connections += 1
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _reply(self, status: int, body: bytes = b"", content_type: str = "application/xml") -> None:
+            self.send_response(status)
+            self.send_header("ETag", '"0x1"')
+            self.send_header("Last-Modified", "Thu, 01 Jan 2026 00:00:00 GMT")
+            self.send_header("x-ms-request-id", "bench")
+            self.send_header("x-ms-version", "2025-01-05")
+            self.send_header("x-ms-request-server-encrypted", "true")
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self) -> bytes:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            # One round trip plus the time this connection needs to push the bytes.
+            time.sleep(store.rtt + len(body) / store.conn_bytes_per_sec)
+            return body
+
+        def do_PUT(self) -> None:
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            name = url.path.split("/", 3)[-1]
+            body = self._read_body()
+            comp = query.get("comp", [""])[0]
+            with store.lock:
+                store.requests += 1
+                if comp == "block":
+                    store.block_puts += 1
+                    if store.fail_every and store.block_puts % store.fail_every == 0:
+                        self._reply(503, b"<?xml version='1.0'?><Error><Code>ServerBusy</Code><Message>bench</Message></Error>")
+                        return
+                    block_id = base64.b64decode(query["blockid"][0]).decode()
+                    store.blocks.setdefault(name, {})[block_id] = body
+                elif comp == "blocklist":
+                    ids = [base64.b64decode(value).decode() for value in re.findall(rb"<(?:Latest|Uncommitted|Committed)>([^<]+)<", body)]
+                    staged = store.blocks.pop(name, {})
+                    store.blobs[name] = b"".join(staged[block_id] for block_id in ids)
+                else:
+                    store.blobs[name] = body
+            self._reply(201)
+
+        def _blob_headers(self, status: int, data: bytes, start: int, end: int) -> None:
+            self.send_response(status)
+            self.send_header("ETag", '"0x1"')
+            self.send_header("Last-Modified", "Thu, 01 Jan 2026 00:00:00 GMT")
+            self.send_header("x-ms-blob-type", "BlockBlob")
+            self.send_header("x-ms-version", "2025-01-05")
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(end - start + 1))
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            self.end_headers()
+
+        def do_HEAD(self) -> None:
+            name = urlparse(self.path).path.split("/", 3)[-1]
+            with store.lock:
+                store.requests += 1
+                data = store.blobs.get(name)
+            if data is None:
+                self._reply(404)
+                return
+            time.sleep(store.rtt)
+            self._blob_headers(200, data, 0, len(data) - 1)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            name = url.path.split("/", 3)[-1]
+            with store.lock:
+                store.requests += 1
+                data = store.blobs.get(name)
+                staged = dict(store.blocks.get(name, {}))
+                names = sorted(store.blobs)
+            time.sleep(store.rtt)
+            if query.get("comp") == ["list"]:
+                items = "".join(
+                    f"<Blob><Name>{blob}</Name><Properties><Last-Modified>Thu, 01 Jan 2026 00:00:00 GMT</Last-Modified>"
+                    f"<Content-Length>{len(store.blobs[blob])}</Content-Length><BlobType>BlockBlob</BlobType></Properties></Blob>"
+                    for blob in names
+                )
+                body = f"<?xml version='1.0'?><EnumerationResults ContainerName='bench'><Blobs>{items}</Blobs><NextMarker/></EnumerationResults>"
+                self._reply(200, body.encode())
+                return
+            if query.get("comp") == ["blocklist"]:
+                if not staged:
+                    self._reply(404, b"<?xml version='1.0'?><Error><Code>BlobNotFound</Code><Message>bench</Message></Error>")
+                    return
+                entries = "".join(
+                    f"<Block><Name>{base64.b64encode(block_id.encode()).decode()}</Name><Size>{len(block)}</Size></Block>"
+                    for block_id, block in staged.items()
+                )
+                body = f"<?xml version='1.0'?><BlockList><CommittedBlocks/><UncommittedBlocks>{entries}</UncommittedBlocks></BlockList>"
+                self._reply(200, body.encode())
+                return
+            if data is None:
+                self._reply(404, b"<?xml version='1.0'?><Error><Code>BlobNotFound</Code><Message>bench</Message></Error>")
+                return
+            start, end, status = 0, len(data) - 1, 200
+            match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("x-ms-range") or self.headers.get("Range") or "")
+            if match:
+                start, status = int(match.group(1)), 206
+                end = min(int(match.group(2) or end), end)
+            body = data[start:end + 1]
+            time.sleep(len(body) / store.conn_bytes_per_sec)
+            self._blob_headers(status, data, start, end)
+            self.wfile.write(body)
+
+    return Handler
+
+
+def connection_string(port: int) -> str:
+    return (
+        f"DefaultEndpointsProtocol=http;AccountName={ACCOUNT};AccountKey={ACCOUNT_KEY};"
+        f"BlobEndpoint=http://127.0.0.1:{port}/{ACCOUNT};"
+    )
+
+
+def start_fake_endpoint(store: FakeBlobStore) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(store))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_service(port: int, state_dir: Path, use_aio: bool = False) -> AzureService:
+    """An AzureService pointed at the fake endpoint (index and media cache left off)."""
+    service = AzureService()
+    service.connection_string = connection_string(port)
+    service.container_name = "bench"
+    service.blob_service = BlobServiceClient.from_connection_string(service.connection_string, retry_total=0)
+    service.container_client = service.blob_service.get_container_client("bench")
+    service.resume_dir = state_dir
+    if use_aio:
+        service.aio = AsyncAzureClient(service.connection_string, "bench")
+    return service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=64)
+    parser.add_argument("--block-mb", type=float, default=4)
+    parser.add_argument("--rtt-ms", type=float, default=40)
+    parser.add_argument("--conn-mbps", type=float, default=20, help="throughput cap per connection, Mbit/s")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+
+    parser.add_argument("--reads", type=int, default=32, help="concurrent 256 KB range reads per client")
+    args = parser.parse_args()
+
+    store = FakeBlobStore(args.rtt_ms / 1000, args.conn_mbps * 1_000_000 / 8)
+    server = start_fake_endpoint(store)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        path = tmp_dir / "recording_bench.mp4"
+        size = int(args.size_mb * 1024 * 1024)
+        with open(path, "wb") as handle:
+            handle.write(bytes(range(256)) * (size // 256) + bytes(size % 256))
+        expected = path.read_bytes()
+        service = make_service(server.server_address[1], tmp_dir / "state")
+        block_size = int(args.block_mb * 1024 * 1024)
+
+        print(f"{args.size_mb:g} MB file, {args.block_mb:g} MB blocks, {args.rtt_ms:g} ms RTT, {args.conn_mbps:g} Mbit/s per connection")
+        rows = []
+        started = time.perf_counter()
+        with open(path, "rb") as handle:
+            service.container_client.upload_blob("single.mp4", handle, overwrite=True)
+        rows.append(("upload_blob (single call)", time.perf_counter() - started))
+        for concurrency in (int(value) for value in args.concurrency.split(",")):
+            name = f"blocks_{concurrency}.mp4"
+            started = time.perf_counter()
+            service.upload_path_chunked(path, name, block_size=block_size, max_concurrency=concurrency)
+            rows.append((f"blocks, max_concurrency={concurrency}", time.perf_counter() - started))
+            assert store.blobs[name] == expected
+
+        # Every 5th block PUT fails; each retry only re-stages what is missing.
+        store.fail_every = 5
+        started = time.perf_counter()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                result = service.upload_path_chunked(path, "resumed.mp4", block_size=block_size, max_concurrency=4)
+                break
+            except Exception:
+                continue
+        rows.append((f"blocks, flaky, {attempts} attempts, {result['resumed']} resumed", time.perf_counter() - started))
+        assert store.blobs["resumed.mp4"] == expected
+
+        for label, elapsed in rows:
+            print(f"  {label:<40} {elapsed:7.2f} s  {size / elapsed / 1024 / 1024:7.2f} MB/s")
+
+        if AZURE_AIO_AVAILABLE:
+            _bench_reads(store, server.server_address[1], tmp_dir, args.reads, name, expected)
+    server.shutdown()
+
+
+def _bench_reads(store: FakeBlobStore, port: int, tmp_dir: Path, reads: int, blob_name: str, expected: bytes) -> None:
+    span = 256 * 1024
+    offsets = [(index * span * 7) % max(1, len(expected) - span) for index in range(reads)]
+    print(f"{reads} concurrent {span // 1024} KB range reads of {blob_name}")
+
+    sync_service = make_service(port, tmp_dir / "state")
+    connections = store.connections
+    started = time.perf_counter()
+
+    def read(offset: int) -> bytes:
+        chunks, _, _, _ = sync_service.get_blob_stream(blob_name, {"range": f"bytes={offset}-{offset + span - 1}"})
+        return b"".join(chunks)
+
+    threads = [threading.Thread(target=read, args=(offset,)) for offset in offsets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"  {'sync SDK, one thread per read':<40} {time.perf_counter() - started:7.2f} s  {store.connections - connections} new connections")
+
+    aio_service = make_service(port, tmp_dir / "state", use_aio=True)
+
+    async def run() -> None:
+        async def read_async(offset: int) -> bytes:
+            chunks, _, _, _ = await aio_service.get_blob_stream_async(
+                blob_name, {"range": f"bytes={offset}-{offset + span - 1}"}
+            )
+            return b"".join([chunk async for chunk in chunks])
+
+        for label in ("aio client, cold pool", "aio client, warm pool"):
+            connections = store.connections
+            started = time.perf_counter()
+            results = await asyncio.gather(*(read_async(offset) for offset in offsets))
+            assert all(result == expected[offset:offset + span] for result, offset in zip(results, offsets))
+            print(f"  {label:<40} {time.perf_counter() - started:7.2f} s  {store.connections - connections} new connections")
+
+    try:
+        asyncio.run(run())
+    finally:
+        aio_service.aio.close()
+
+
+if __name__ == "__main__":
+    main()
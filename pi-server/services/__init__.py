@@ -4,7 +4,10 @@ from .button_service import ButtonService
 from .camera_service import CameraService
 from .motion_service import MotionService
 from .notification_service import NotificationService, notification_service
+from .recording_jobs import RecordingJobQueue
 from .startup_service import StartupService
+from .stream_hub import StreamHub
+from .upload_queue import UploadQueue
 
 __all__ = [
 	"AzureService",
@@ -15,5 +18,8 @@ __all__ = [
 	"NotificationService",
 	"notification_service",
 	"MotionService",
+	"RecordingJobQueue",
 	"StartupService",
+	"StreamHub",
+	"UploadQueue",
 ]
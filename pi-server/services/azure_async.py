@@ -0,0 +1,170 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+try:
+    import aiohttp
+    from azure.core.pipeline.transport import AioHttpTransport
+    from azure.storage.blob import BlobBlock, ContentSettings
+    from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+except Exception:  # pragma: no cover - aiohttp is optional; the sync SDK is used without it
+    aiohttp = None  # type: ignore[assignment]
+
+
+AZURE_AIO_AVAILABLE = aiohttp is not None
+
+
+class AsyncAzureClient:
+    """One ``azure.storage.blob.aio`` client shared by every Azure call in the process.
+
+    The client, its aiohttp session and the session's connection pool live on
+    a dedicated event loop thread, so request handlers (on uvicorn's loop) and
+    worker threads (uploads, index sync) all reuse the same pooled TLS
+    connections. Handlers ``await call(...)`` without holding a thread; threads
+    block on ``run(...)``.
+    """
+
+    def __init__(self, connection_string: str, container_name: str, pool_size: int = 16) -> None:
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is not installed")
+        self.connection_string = connection_string
+        self.container_name = container_name
+        self.pool_size = pool_size
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.session = None
+        self.service = None
+        self.container = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=self._run_loop, args=(loop,), name="azure-aio", daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+                self.loop = loop
+            return self.loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _open(self) -> None:
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60),
+        )
+        transport = AioHttpTransport(session=self.session, session_owner=False)
+        self.service = AsyncBlobServiceClient.from_connection_string(self.connection_string, transport=transport)
+        self.container = self.service.get_container_client(self.container_name)
+
+    def _submit(self, fn: Callable[..., Awaitable], *args) -> Future:
+        return asyncio.run_coroutine_threadsafe(fn(*args), self._ensure_loop())
+
+    async def call(self, fn: Callable[..., Awaitable], *args):
+        """Await ``fn(*args)`` on the client loop from any other event loop."""
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def run(self, fn: Callable[..., Awaitable], *args, timeout: Optional[float] = None):
+        """Run ``fn(*args)`` on the client loop and block the calling thread for the result."""
+        return self._submit(fn, *args).result(timeout)
+
+    async def _close(self) -> None:
+        if self.service is not None:
+            await self.service.close()
+        if self.session is not None:
+            await self.session.close()
+
+    def close(self) -> None:
+        with self.lock:
+            loop, self.loop = self.loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+    # Coroutines below run on the client loop; use them through call()/run().
+
+    async def properties(self, blob_name: str):
+        return await self.container.get_blob_client(blob_name).get_blob_properties()
+
+    async def list_page(self, marker: Optional[str], page_size: int) -> tuple[list, Optional[str]]:
+        pages = self.container.list_blobs(results_per_page=page_size).by_page(continuation_token=marker)
+        blobs = []
+        async for page in pages:
+            async for blob in page:
+                blobs.append(blob)
+            break
+        return blobs, pages.continuation_token
+
+    # Local file I/O goes through asyncio.to_thread so a slow SD card never
+    # stalls the requests multiplexed on this loop.
+
+    async def upload_file(self, path: Path, blob_name: str, content_type: str, max_concurrency: int) -> None:
+        # Only files under the chunked-upload threshold come through here.
+        data = await asyncio.to_thread(path.read_bytes)
+        await self.container.get_blob_client(blob_name).upload_blob(
+            data,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type),
+            max_concurrency=max_concurrency,
+        )
+
+    async def stage_block(self, blob_name: str, block_id: str, data: bytes) -> None:
+        await self.container.get_blob_client(blob_name).stage_block(block_id, data, length=len(data))
+
+    async def commit_block_list(self, blob_name: str, block_ids: list[str], content_type: str) -> None:
+        await self.container.get_blob_client(blob_name).commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids],
+            content_settings=ContentSettings(content_type=content_type),
+        )
+
+    async def download_into(self, blob_name: str, handle) -> None:
+        downloader = await self.container.get_blob_client(blob_name).download_blob()
+        async for chunk in downloader.chunks():
+            await asyncio.to_thread(handle.write, chunk)
+
+    @staticmethod
+    async def _iter_chunks(downloader) -> AsyncIterator[bytes]:
+        async for chunk in downloader.chunks():
+            yield chunk
+
+    async def _open_download(self, blob_name: str, offset: Optional[int], length: Optional[int]):
+        downloader = await self.container.get_blob_client(blob_name).download_blob(offset=offset, length=length)
+        return self._iter_chunks(downloader)
+
+    @staticmethod
+    async def _next_chunk(chunks) -> Optional[bytes]:
+        try:
+            return await chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    @staticmethod
+    async def _close_chunks(chunks) -> None:
+        try:
+            await chunks.aclose()
+        except RuntimeError:
+            pass  # a cancelled _next_chunk is still unwinding; it closes the generator itself
+
+    async def download_chunks(
+        self, blob_name: str, offset: Optional[int] = None, length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream a blob (or a byte range of it) into the caller's event loop.
+
+        If the consumer stops early (client disconnect), the chunk generator is
+        closed on the client loop so no further chunk requests are issued.
+        """
+        chunks = await self.call(self._open_download, blob_name, offset, length)
+        try:
+            while True:
+                chunk = await self.call(self._next_chunk, chunks)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            # Submitted rather than awaited: the caller may already be cancelled.
+            self._submit(self._close_chunks, chunks)
@@ -1,9 +1,31 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import AsyncIterator, BinaryIO, Iterator, Mapping, Optional, Tuple
 
-from azure.storage.blob import BlobServiceClient, ContentSettings
+import anyio
+from azure.storage.blob import (
+    BlobBlock,
+    BlobSasPermissions,
+    BlobServiceClient,
+    ContentSettings,
+    generate_blob_sas,
+)
+
+from starlette.concurrency import run_in_threadpool
 
 from config import settings
+from services.azure_async import AZURE_AIO_AVAILABLE, AsyncAzureClient
+from services.blob_index import BlobIndex
+from services.media_cache import BlobMediaCache, BlobProperties, CacheFill
+from services.progressive_upload import ProgressiveUpload
+from utils.http_media import MediaPlan, plan_chunks, plan_chunks_async, plan_media_response
 
 
 class AzureService:
@@ -12,10 +34,35 @@ class AzureService:
         self.container_name = settings.azure_container
         self.blob_service: Optional[BlobServiceClient] = None
         self.container_client = None
+        self.block_size = max(1, int(settings.azure_block_size_mb * 1024 * 1024))
+        self.max_concurrency = max(1, settings.azure_max_concurrency)
+        self.chunked_threshold = int(settings.azure_chunked_threshold_mb * 1024 * 1024)
+        self.resume_dir = settings.azure_upload_state_dir
+        self.index: Optional[BlobIndex] = None
+        self.index_page_size = max(1, settings.azure_index_page_size)
+        self.index_sync_lock = threading.Lock()
+        self.media_cache: Optional[BlobMediaCache] = None
+        self.sas_ttl = max(60.0, settings.azure_sas_ttl_sec)
+        self.sas_cache: OrderedDict[str, tuple[str, datetime]] = OrderedDict()
+        self.sas_cache_size = 4096
+        self.sas_lock = threading.Lock()
+        self.aio: Optional[AsyncAzureClient] = None
 
         if self.connection_string:
             self.blob_service = BlobServiceClient.from_connection_string(self.connection_string)
             self.container_client = self.blob_service.get_container_client(self.container_name)
+            if settings.azure_async and AZURE_AIO_AVAILABLE:
+                self.aio = AsyncAzureClient(self.connection_string, self.container_name, settings.azure_pool_size)
+            self.index = BlobIndex(settings.azure_index_file, self.container_name)
+            self.media_cache = BlobMediaCache(
+                settings.azure_media_cache_dir,
+                max_bytes=int(settings.azure_media_cache_mb * 1024 * 1024),
+                fetch_properties=self._fetch_properties,
+                download=self._download_into,
+                media_dir=settings.media_dir,
+                props_ttl=settings.azure_props_ttl_sec,
+                max_fill_bytes=int(settings.azure_media_cache_max_file_mb * 1024 * 1024),
+            )
 
     @property
     def is_configured(self) -> bool:
@@ -32,70 +79,428 @@ class AzureService:
             return "video/x-msvideo"
         return "application/octet-stream"
 
+    def _record_upload(self, blob_name: str, size: int) -> None:
+        if self.index is not None:
+            self.index.upsert(blob_name, size, time.time())
+        if self.media_cache is not None:
+            self.media_cache.invalidate(blob_name)
+
     def upload_path(self, path: Path, blob_name: Optional[str] = None) -> None:
         if not self.is_configured:
             raise RuntimeError("Azure not configured")
 
         target_name = blob_name or path.name
+        if path.stat().st_size > self.chunked_threshold:
+            self.upload_path_chunked(path, target_name)
+            return
         content_type = self._detect_content_type(target_name)
 
-        with open(path, "rb") as handle:
-            self.container_client.upload_blob(
-                name=target_name,
-                data=handle,
-                overwrite=True,
+        if self.aio is not None:
+            self.aio.run(self.aio.upload_file, path, target_name, content_type, self.max_concurrency)
+        else:
+            with open(path, "rb") as handle:
+                self.container_client.upload_blob(
+                    name=target_name,
+                    data=handle,
+                    overwrite=True,
+                    content_settings=ContentSettings(content_type=content_type),
+                )
+        self._record_upload(target_name, path.stat().st_size)
+
+    def _stage_block(self, blob_client, blob_name: str, block_id: str, data: bytes) -> None:
+        if self.aio is not None:
+            self.aio.run(self.aio.stage_block, blob_name, block_id, data)
+        else:
+            blob_client.stage_block(block_id, data, length=len(data))
+
+    def _commit_block_list(self, blob_client, blob_name: str, block_ids: list[str]) -> None:
+        content_type = self._detect_content_type(blob_name)
+        if self.aio is not None:
+            self.aio.run(self.aio.commit_block_list, blob_name, block_ids, content_type)
+        else:
+            blob_client.commit_block_list(
+                [BlobBlock(block_id=block_id) for block_id in block_ids],
                 content_settings=ContentSettings(content_type=content_type),
             )
 
-    def list_blobs(self, limit: int = 10000) -> list[dict]:
+    def _resume_state_path(self, blob_name: str) -> Path:
+        return self.resume_dir / f"{hashlib.sha1(blob_name.encode()).hexdigest()}.json"
+
+    def _load_resume_state(self, state_path: Path, fingerprint: dict) -> set[int]:
+        try:
+            state = json.loads(state_path.read_text())
+        except (OSError, ValueError):
+            return set()
+        # A different file (or block size) under the same blob name starts over.
+        if any(state.get(key) != value for key, value in fingerprint.items()):
+            return set()
+        return set(state.get("staged", []))
+
+    @staticmethod
+    def _save_resume_state(state_path: Path, fingerprint: dict, staged: set[int]) -> None:
+        tmp_path = state_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({**fingerprint, "staged": sorted(staged)}))
+        os.replace(tmp_path, state_path)
+
+    def upload_path_chunked(
+        self,
+        path: Path,
+        blob_name: Optional[str] = None,
+        block_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> dict:
+        """Upload ``path`` as staged blocks plus a block-list commit.
+
+        Staged block indexes are persisted under ``resume_dir`` after every
+        block, so a retry after a failure (or a restart) only stages the blocks
+        Azure does not already hold.
+        """
         if not self.is_configured:
             raise RuntimeError("Azure not configured")
 
-        blobs = []
-        for blob in self.container_client.list_blobs():
-            blobs.append(
-                {
-                    "name": blob.name,
-                    "size": blob.size,
-                    "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
-                }
-            )
-            if len(blobs) >= max(1, limit):
+        target_name = blob_name or path.name
+        block_size = max(1, block_size or self.block_size)
+        stat = path.stat()
+        fingerprint = {
+            "blob_name": target_name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "block_size": block_size,
+        }
+        # Block IDs must all be the same length within a blob; tying them to the file
+        # means blocks staged for an older file are never mistaken for this one.
+        tag = hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:12]
+        count = max(1, -(-stat.st_size // block_size))
+        block_ids = [f"{tag}-{index:06d}" for index in range(count)]
+
+        blob_client = self.container_client.get_blob_client(target_name)
+        self.resume_dir.mkdir(parents=True, exist_ok=True)
+        state_path = self._resume_state_path(target_name)
+        staged = self._load_resume_state(state_path, fingerprint)
+        if staged:
+            # Uncommitted blocks expire after a week; only skip what Azure still has.
+            try:
+                _, uncommitted = blob_client.get_block_list("uncommitted")
+                held = {block.id for block in uncommitted}
+            except Exception:
+                held = set()
+            staged = {index for index in staged if index < count and block_ids[index] in held}
+        resumed = len(staged)
+
+        lock = threading.Lock()
+
+        def stage(index: int) -> None:
+            with open(path, "rb") as handle:
+                handle.seek(index * block_size)
+                data = handle.read(block_size)
+            self._stage_block(blob_client, target_name, block_ids[index], data)
+            with lock:
+                staged.add(index)
+                self._save_resume_state(state_path, fingerprint, staged)
+
+        pending = [index for index in range(count) if index not in staged]
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency or self.max_concurrency)) as pool:
+            futures = [pool.submit(stage, index) for index in pending]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        self._commit_block_list(blob_client, target_name, block_ids)
+        state_path.unlink(missing_ok=True)
+        self._record_upload(target_name, stat.st_size)
+        return {"blocks": count, "staged": len(pending), "resumed": resumed, "bytes": stat.st_size}
+
+    def progressive_upload(self, path: Path, blob_name: Optional[str] = None) -> ProgressiveUpload:
+        """Start staging a still-growing, append-only file; call ``finish()`` once it is complete."""
+        if not self.is_configured:
+            raise RuntimeError("Azure not configured")
+
+        target_name = blob_name or path.name
+        blob_client = self.container_client.get_blob_client(target_name)
+
+        def commit(block_ids: list[str]) -> None:
+            self._commit_block_list(blob_client, target_name, block_ids)
+            self._record_upload(target_name, path.stat().st_size)
+
+        return ProgressiveUpload(
+            path,
+            stage_block=lambda block_id, data: self._stage_block(blob_client, target_name, block_id, data),
+            commit=commit,
+            block_size=self.block_size,
+        ).start()
+
+    def sync_index_page(self) -> bool:
+        """Reconcile one listing page into the index; True when that finished a full pass."""
+        if not self.is_configured or self.index is None:
+            raise RuntimeError("Azure not configured")
+
+        if self.aio is not None:
+            blobs, next_marker = self.aio.run(self.aio.list_page, self.index.marker(), self.index_page_size)
+            return self.index.reconcile_page(blobs, next_marker)
+        pages = self.container_client.list_blobs(results_per_page=self.index_page_size).by_page(
+            continuation_token=self.index.marker()
+        )
+        blobs = list(next(pages, []))
+        return self.index.reconcile_page(blobs, pages.continuation_token)
+
+    def sync_index(self, blocking: bool = True) -> None:
+        """Finish the current reconcile pass, one page at a time.
+
+        With ``blocking=False`` this returns at once if another pass is already running.
+        """
+        if not self.index_sync_lock.acquire(blocking):
+            return
+        try:
+            while not self.sync_index_page():
+                pass
+        finally:
+            self.index_sync_lock.release()
+
+    def _sync_index_in_background(self) -> None:
+        def _run() -> None:
+            try:
+                self.sync_index(blocking=False)
+            except Exception as exc:
+                print(f"[PiCam] Azure index sync failed: {exc}")
+
+        if not self.index_sync_lock.locked():
+            threading.Thread(target=_run, daemon=True).start()
+
+    @property
+    def indexing(self) -> bool:
+        """True until the blob index has completed its first full pass."""
+        return self.index is not None and not self.index.synced
+
+    def start_index_sync(self, interval_sec: float) -> None:
+        def _loop() -> None:
+            while True:
+                try:
+                    self.sync_index()
+                except Exception as exc:
+                    print(f"[PiCam] Azure index sync failed: {exc}")
+                time.sleep(interval_sec)
+
+        threading.Thread(target=_loop, daemon=True).start()
+
+    def query_blobs(
+        self,
+        limit: int = 10000,
+        cursor: Optional[str] = None,
+        prefix: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> tuple[list[dict], Optional[str]]:
+        """A page of blobs from the local index, newest first, plus the next-page cursor.
+
+        Before the first full sync this is whatever the index holds so far
+        (``indexing`` is True); the sync continues in the background.
+        """
+        if not self.is_configured or self.index is None:
+            raise RuntimeError("Azure not configured")
+
+        if not self.index.synced:
+            self._sync_index_in_background()
+        return self.index.query(limit=limit, cursor=cursor, prefix=prefix, since=since, until=until)
+
+    async def query_blobs_async(self, **query) -> tuple[list[dict], Optional[str]]:
+        # Even a synced index read can build thousands of rows; keep it off the event loop.
+        return await run_in_threadpool(lambda: self.query_blobs(**query))
+
+    def list_blobs(self, limit: int = 10000) -> list[dict]:
+        return self.query_blobs(limit=limit)[0]
+
+    def _fetch_properties(self, blob_name: str) -> BlobProperties:
+        props = self.container_client.get_blob_client(blob_name).get_blob_properties()
+        return self._blob_properties(props)
+
+    @staticmethod
+    def _blob_properties(props) -> BlobProperties:
+        last_modified = props.last_modified.timestamp() if props.last_modified else None
+        return BlobProperties(size=props.size, etag=props.etag, last_modified=last_modified)
+
+    def _download_into(self, blob_name: str, handle: BinaryIO) -> None:
+        if self.aio is not None:
+            self.aio.run(self.aio.download_into, blob_name, handle)
+            return
+        self.container_client.get_blob_client(blob_name).download_blob(max_concurrency=2).readinto(handle)
+
+    def _media_plan(self, blob_name: str, request_headers: Mapping[str, str], props: BlobProperties) -> MediaPlan:
+        return plan_media_response(
+            request_headers, props.size, self._detect_content_type(blob_name), props.etag, props.last_modified
+        )
+
+    @staticmethod
+    def _span(start: int, length: int, size: int) -> tuple[Optional[int], Optional[int]]:
+        """Download offset/length for a span; the whole blob is fetched without a range."""
+        return (None, None) if (start, length) == (0, size) else (start, length)
+
+    @staticmethod
+    def _read_span(handle: BinaryIO, start: int, length: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        handle.seek(start)
+        while length > 0:
+            data = handle.read(min(chunk_size, length))
+            if not data:
                 break
+            length -= len(data)
+            yield data
+
+    def _file_chunks(self, handle: BinaryIO, plan: MediaPlan) -> Iterator[bytes]:
+        try:
+            yield from plan_chunks(plan, lambda start, length: self._read_span(handle, start, length))
+        finally:
+            handle.close()
+
+    @staticmethod
+    def _tee(chunks: Iterator[bytes], fill: Optional[CacheFill]) -> Iterator[bytes]:
+        """Pass a full-body download through, copying it into the media cache on the way."""
+        if fill is None:
+            yield from chunks
+            return
+        completed = False
+        try:
+            for chunk in chunks:
+                fill.write(chunk)
+                yield chunk
+            completed = True
+        finally:
+            # A client that disconnects early leaves a partial copy, which is discarded.
+            if completed:
+                fill.finish()
+            else:
+                fill.abort()
+
+    @staticmethod
+    async def _tee_async(chunks: AsyncIterator[bytes], fill: Optional[CacheFill]) -> AsyncIterator[bytes]:
+        if fill is None:
+            async for chunk in chunks:
+                yield chunk
+            return
+        completed = False
+        try:
+            async for chunk in chunks:
+                await anyio.to_thread.run_sync(fill.write, chunk)
+                yield chunk
+            completed = True
+        finally:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(fill.finish if completed else fill.abort)
 
-        blobs.sort(key=lambda item: item.get("last_modified") or "", reverse=True)
+    def sas_url(self, blob_name: str) -> tuple[str, datetime]:
+        """A read-only SAS URL for ``blob_name``, signed locally with the account key.
+
+        URLs are cached and reused until they are within a fifth of the TTL of
+        expiring, so repeated listings hand out the same URL (and the client
+        can keep its HTTP cache) without re-signing.
+        """
+        if not self.is_configured:
+            raise RuntimeError("Azure not configured")
+
+        now = datetime.now(timezone.utc)
+        with self.sas_lock:
+            cached = self.sas_cache.get(blob_name)
+            if cached is not None and (cached[1] - now).total_seconds() > self.sas_ttl / 5:
+                self.sas_cache.move_to_end(blob_name)
+                return cached
+        account_key = getattr(self.blob_service.credential, "account_key", None)
+        if not account_key:
+            raise RuntimeError("SAS URLs need an AccountKey in the connection string")
+
+        expires_at = now + timedelta(seconds=self.sas_ttl)
+        token = generate_blob_sas(
+            account_name=self.blob_service.account_name,
+            container_name=self.container_name,
+            blob_name=blob_name,
+            account_key=account_key,
+            permission=BlobSasPermissions(read=True),
+            # Allow for clock skew between the Pi and Azure.
+            start=now - timedelta(minutes=5),
+            expiry=expires_at,
+        )
+        entry = (f"{self.container_client.get_blob_client(blob_name).url}?{token}", expires_at)
+        with self.sas_lock:
+            self.sas_cache[blob_name] = entry
+            self.sas_cache.move_to_end(blob_name)
+            while len(self.sas_cache) > self.sas_cache_size:
+                self.sas_cache.popitem(last=False)
+        return entry
+
+    def with_sas_urls(self, blobs: list[dict]) -> list[dict]:
+        for blob in blobs:
+            url, expires_at = self.sas_url(blob["name"])
+            blob["url"] = url
+            blob["url_expires_at"] = expires_at.isoformat()
         return blobs
 
     def get_blob_stream(
-        self, blob_name: str, range_header: Optional[str]
+        self, blob_name: str, request_headers: Mapping[str, str]
     ) -> Tuple[object, str, int, dict]:
+        """Body chunks, content type, status and headers for a (conditional, ranged) blob GET."""
         if not self.is_configured:
             raise RuntimeError("Azure not configured")
 
+        cache = self.media_cache
+        props = cache.properties(blob_name) if cache is not None else self._fetch_properties(blob_name)
+        content_type = self._detect_content_type(blob_name)
+        plan = self._media_plan(blob_name, request_headers, props)
+        if not plan.parts:
+            # 304 / 416: nothing to read.
+            return iter(()), content_type, plan.status, plan.headers
+
+        handle = cache.open(blob_name, props) if cache is not None else None
+        if handle is not None:
+            return self._file_chunks(handle, plan), content_type, plan.status, plan.headers
+
         blob_client = self.container_client.get_blob_client(blob_name)
-        props = blob_client.get_blob_properties()
-        file_size = props.size
+
+        def read(start: int, length: int) -> Iterator[bytes]:
+            offset, count = self._span(start, length, props.size)
+            return blob_client.download_blob(offset=offset, length=count).chunks()
+
+        fill = None
+        if cache is not None and plan.status == 200:
+            # The whole blob is on its way to the client anyway: keep a copy instead of downloading it twice.
+            fill = cache.begin_fill(blob_name, props)
+        elif cache is not None:
+            cache.fill_async(blob_name, props)
+        return self._tee(plan_chunks(plan, read), fill), content_type, plan.status, plan.headers
+
+    async def get_blob_stream_async(
+        self, blob_name: str, request_headers: Mapping[str, str]
+    ) -> Tuple[object, str, int, dict]:
+        """``get_blob_stream`` for request handlers: Azure I/O is awaited on the shared aio client."""
+        if self.aio is None:
+            return await run_in_threadpool(self.get_blob_stream, blob_name, request_headers)
+        if not self.is_configured:
+            raise RuntimeError("Azure not configured")
+
+        cache = self.media_cache
+        props = cache.cached_properties(blob_name) if cache is not None else None
+        if props is None:
+            props = self._blob_properties(await self.aio.call(self.aio.properties, blob_name))
+            if cache is not None:
+                cache.remember_properties(blob_name, props)
         content_type = self._detect_content_type(blob_name)
+        plan = self._media_plan(blob_name, request_headers, props)
+        if not plan.parts:
+            return iter(()), content_type, plan.status, plan.headers
 
-        if range_header:
-            range_match = range_header.replace("bytes=", "").split("-")
-            start = int(range_match[0]) if range_match[0] else 0
-            end = int(range_match[1]) if len(range_match) > 1 and range_match[1] else file_size - 1
-            length = end - start + 1
-            download = blob_client.download_blob(offset=start, length=length)
-            headers = {
-                "Content-Range": f"bytes {start}-{end}/{file_size}",
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(length),
-            }
-            return download.chunks(), content_type, 206, headers
-
-        download = blob_client.download_blob()
-        headers = {
-            "Accept-Ranges": "bytes",
-            "Content-Length": str(file_size),
-        }
-        return download.chunks(), content_type, 200, headers
+        handle = await run_in_threadpool(cache.open, blob_name, props) if cache is not None else None
+        if handle is not None:
+            return self._file_chunks(handle, plan), content_type, plan.status, plan.headers
+
+        def read(start: int, length: int):
+            return self.aio.download_chunks(blob_name, *self._span(start, length, props.size))
+
+        fill = None
+        if cache is not None and plan.status == 200:
+            fill = await run_in_threadpool(cache.begin_fill, blob_name, props)
+        elif cache is not None:
+            cache.fill_async(blob_name, props)
+        return self._tee_async(plan_chunks_async(plan, read), fill), content_type, plan.status, plan.headers
 
 
 azure_service = AzureService()
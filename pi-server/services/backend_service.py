@@ -1,6 +1,8 @@
 import threading
 import time
+from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 from config import BASE_DIR
 from models import MotionSettings, RecordRequest
@@ -8,7 +10,10 @@ from services.azure_service import AzureService
 from services.camera_service import CameraService
 from services.motion_service import MotionService
 from services.notification_service import NotificationService
-from utils import cleanup_old_media
+from services.progressive_upload import ProgressiveUpload
+from services.recording_jobs import RecordingJob, RecordingJobQueue
+from services.upload_queue import UploadQueue, UploadTask
+from utils import cleanup_old_media, remux_h264_to_mp4, remux_h264_to_mp4_async
 
 
 class BackendService:
@@ -21,6 +26,8 @@ class BackendService:
         motion_service: MotionService,
         notification_service: NotificationService,
         azure_service: AzureService,
+        upload_queue: Optional[UploadQueue] = None,
+        progressive_upload: bool = True,
     ) -> None:
         self.media_dir = media_dir
         self.media_retention_days = media_retention_days
@@ -29,19 +36,55 @@ class BackendService:
         self.motion_service = motion_service
         self.notification_service = notification_service
         self.azure_service = azure_service
+        self.upload_queue = upload_queue
+        self.progressive_upload = progressive_upload
+        self.progressive_uploads: dict[str, ProgressiveUpload] = {}
+        # Recordings whose queued upload has not landed yet, by upload task id.
+        self.recording_uploads: dict[str, tuple[RecordingJob, Path]] = {}
+        self.recording_uploads_lock = threading.Lock()
+        self.recording_jobs = RecordingJobQueue(
+            capture=self._capture_recording,
+            remux=remux_h264_to_mp4_async,
+            finalize=self._finish_recording,
+            on_capture_state=self._set_recording_state,
+        )
 
     def _add_notification(self, message: str, kind: str = "info") -> None:
         self.notification_service.add_notification(message, kind)
 
-    def _upload_blob(self, path: Path) -> None:
+    def _upload_blob(self, path: Path, blob_name: Optional[str] = None) -> Optional[UploadTask]:
+        """Upload ``path``; returns the queued task when the upload finishes in the background."""
         if not self.azure_service.is_configured:
             print(f"[PiCam] Azure upload skipped for {path.name}")
-            return
+            return None
+        if self.upload_queue is not None:
+            # Uploads run on the queue's workers; callers only wait for the journal write.
+            return self.upload_queue.enqueue(path, blob_name)
         try:
-            self.azure_service.upload_path(path)
+            self.azure_service.upload_path(path, blob_name=blob_name)
             print(f"[PiCam] Azure upload ok: {path.name}")
         except Exception as exc:
             print(f"[PiCam] Azure upload failed for {path.name}: {exc}")
+        return None
+
+    def upload_finished(self, task: UploadTask) -> None:
+        """Upload queue callback: a recording's blob now exists, so announce it."""
+        with self.recording_uploads_lock:
+            pending = self.recording_uploads.pop(task.id, None)
+        if pending is None:
+            return
+        job, final_path = pending
+        self.recording_jobs.upload_finished(job)
+        self._recording_ready(job, final_path)
+
+    def upload_dropped(self, task: UploadTask) -> None:
+        with self.recording_uploads_lock:
+            pending = self.recording_uploads.pop(task.id, None)
+        if pending is None:
+            return
+        job, final_path = pending
+        self.recording_jobs.upload_finished(job, error=f"upload failed: {task.last_error or 'file missing'}")
+        self._add_notification(f"Recording upload failed: {final_path.name}", "recording")
 
     def load_push_tokens(self) -> None:
         self.notification_service.load_push_tokens()
@@ -62,10 +105,33 @@ class BackendService:
             "picamera": self.camera_service.picamera_available,
             "motion_enabled": self.motion_service.motion_enabled,
             "last_motion": self.motion_service.last_motion_ts,
+            "stream_viewers": self.camera_service.stream_hub.subscriber_count,
+            "stream_profiles": self.camera_service.stream_profiles.stats()["profiles"],
+            "stream_ws_clients": self.camera_service.ws_stats(),
+            "uploads": self.upload_queue.stats() if self.upload_queue is not None else None,
+            "azure_media_cache": self.azure_service.media_cache.stats() if self.azure_service.media_cache is not None else None,
         }
 
-    def stream(self):
-        return self.camera_service.stream_response()
+    def camera_session(self) -> dict:
+        return self.camera_service.session_stats()
+
+    def hls_playlist(self) -> Optional[str]:
+        return self.camera_service.hls_playlist()
+
+    def hls_init_segment(self) -> Optional[bytes]:
+        return self.camera_service.hls_init_segment()
+
+    def hls_segment(self, seq: int) -> Optional[bytes]:
+        return self.camera_service.hls_segment(seq)
+
+    def snapshot(self) -> tuple[bytes, str]:
+        return self.camera_service.snapshot()
+
+    def stream(self, width: Optional[int] = None, fps: Optional[float] = None, quality: Optional[int] = None):
+        return self.camera_service.stream_response(width=width, fps=fps, quality=quality)
+
+    async def stream_websocket(self, websocket, **profile) -> None:
+        await self.camera_service.stream_websocket(websocket, **profile)
 
     def stop_stream(self) -> dict:
         return self.camera_service.stop_stream()
@@ -124,79 +190,138 @@ class BackendService:
         result = self.motion_service.run_motion_test()
         return {**result, "tokens": self.notification_service.token_count}
 
+    def save_motion_clip(self) -> None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        clip_path = self.media_dir / f"motion_{timestamp}.h264"
+        if self.camera_service.trigger_motion_clip(clip_path):
+            print(f"[PiCam] Motion clip started: {clip_path.name}")
+
+    def motion_clip_ready(self, clip_path: Path, fps: Optional[float] = None) -> None:
+        # Raw H264 carries no timing; use the rate the packets actually arrived at.
+        final_path = remux_h264_to_mp4(clip_path, framerate=round(fps) if fps else 30)
+        print(f"[PiCam] Motion clip saved: {final_path.name}")
+        self._add_notification(f"Motion clip saved: {final_path.name}", "motion")
+
+    def _set_recording_state(self, job: Optional[RecordingJob]) -> None:
+        if job is None:
+            self.recording_state.update({"is_recording": False, "duration": 0, "start_time": None})
+        else:
+            self.recording_state.update({"is_recording": True, "duration": job.duration, "start_time": job.started_at})
+
+    def _queue_recording(self, duration: int, source: str) -> Optional[RecordingJob]:
+        duration = max(5, min(120, duration))
+        return self.recording_jobs.submit(duration, source=source)
+
     def start_recording(self, req: RecordRequest) -> dict:
-        if self.recording_state["is_recording"]:
-            return {"error": "Recording already in progress"}
         if not self.camera_service.picamera_available:
             return {"error": "Camera not available"}
 
-        duration = max(5, min(120, req.duration))
-        self.recording_state.update({"is_recording": True, "duration": duration, "start_time": time.time()})
-        threading.Thread(target=self._record_video, args=(duration,), daemon=True).start()
+        queued = self.recording_jobs.busy
+        job = self._queue_recording(req.duration, "api")
+        if job is None:
+            return {"error": "Recording queue is full"}
         return {
-            "status": "recording",
-            "duration": duration,
-            "message": f"Recording for {duration} seconds",
+            "status": "queued" if queued else "recording",
+            "job_id": job.id,
+            "duration": job.duration,
+            "message": f"Recording for {job.duration} seconds",
         }
 
+    def recording_status(self, job_id: str) -> dict:
+        job = self.recording_jobs.get(job_id)
+        if job is None:
+            return {"error": "Recording job not found"}
+        return job.to_dict()
+
     def start_recording_internal(self, duration: int) -> None:
-        if self.recording_state["is_recording"]:
-            print("[PiCam] Recording already in progress, ignoring button press")
-            return
         if not self.camera_service.picamera_available:
             print("[PiCam] Camera not available for recording")
             return
 
-        duration = max(5, min(120, duration))
-        self.recording_state.update({"is_recording": True, "duration": duration, "start_time": time.time()})
-        threading.Thread(target=self._record_video, args=(duration,), daemon=True).start()
-        print(f"[PiCam] Recording started: {duration}s")
-        self._add_notification(f"Recording started: {duration}s video", "recording")
+        queued = self.recording_jobs.busy
+        job = self._queue_recording(duration, "button")
+        if job is None:
+            print("[PiCam] Recording queue is full, ignoring button press")
+            return
+        duration = job.duration
+        if queued:
+            print(f"[PiCam] Recording queued: {duration}s ({job.id})")
+        else:
+            print(f"[PiCam] Recording started: {duration}s")
+        self._add_notification(f"Recording {'queued' if queued else 'started'}: {duration}s video", "recording")
         threading.Thread(
             target=self.notification_service.send_push_notification_sync,
             args=(
-                "Recording Started",
+                "Recording Queued" if queued else "Recording Started",
                 f"Recording {duration}s video...",
-                {"type": "recording_started", "duration": duration},
+                {"type": "recording_queued" if queued else "recording_started", "duration": duration, "job_id": job.id},
             ),
             daemon=True,
         ).start()
 
-    def _record_video(self, duration: int) -> None:
-        original_motion_state = self.motion_service.motion_enabled
-        self.motion_service.motion_enabled = False
-        time.sleep(1.0)
+    def _start_progressive_upload(self, job: RecordingJob, path: Path) -> None:
+        # Only fragmented MP4 recordings are append-only; raw .h264 still goes through the remux.
+        if not self.progressive_upload or not self.azure_service.is_configured or path.suffix != ".mp4":
+            return
         try:
-            final_path = self.camera_service.record_video(duration, self.media_dir)
-            if final_path is None:
-                return
-
-            if self.azure_service.is_configured and final_path.suffix == ".mp4":
-                try:
-                    blob_name = f"recordings/{final_path.name}"
-                    self.azure_service.upload_path(final_path, blob_name=blob_name)
-                    print(f"Uploaded to Azure: {blob_name}")
-                except Exception as upload_err:
-                    print(f"Azure upload error: {upload_err}")
-            elif self.azure_service.is_configured:
-                print("Skipping Azure upload for non-mp4 recording")
-
-            if final_path.suffix == ".mp4":
-                self._add_notification(f"Recording ready: {final_path.name}", "recording")
-                threading.Thread(
-                    target=self.notification_service.send_push_notification_sync,
-                    args=(
-                        "Recording Ready",
-                        f"Recording ready: {final_path.name}",
-                        {"type": "recording_ready", "filename": final_path.name},
-                    ),
-                    daemon=True,
-                ).start()
+            self.progressive_uploads[job.id] = self.azure_service.progressive_upload(path, f"recordings/{path.name}")
         except Exception as exc:
-            print(f"Recording error: {exc}")
-            import traceback
+            print(f"[PiCam] Progressive upload not started for {path.name}: {exc}")
 
-            traceback.print_exc()
+    def _capture_recording(self, job: RecordingJob) -> Optional[Path]:
+        # Motion detection and the live stream keep running on the lores stream while recording.
+        path = None
+        try:
+            path = self.camera_service.capture_video(
+                job.duration,
+                self.media_dir,
+                on_started=lambda started_path: self._start_progressive_upload(job, started_path),
+            )
         finally:
-            self.motion_service.motion_enabled = original_motion_state
-            self.recording_state.update({"is_recording": False, "duration": 0, "start_time": None})
+            if path is None and job.id in self.progressive_uploads:
+                self.progressive_uploads.pop(job.id).abort()
+        return path
+
+    def _finish_recording(self, job: RecordingJob, final_path: Path) -> bool:
+        """Upload and announce a recording; True while its queued upload is still pending."""
+        blob_name = f"recordings/{final_path.name}"
+        upload = self.progressive_uploads.pop(job.id, None)
+        full_upload = False
+        if upload is not None:
+            try:
+                result = upload.finish()
+                print(
+                    f"[PiCam] Azure upload ok: {blob_name} "
+                    f"({result['blocks_during_capture']}/{result['blocks']} blocks sent during capture, "
+                    f"tail committed in {result['finish_ms']:.0f} ms)"
+                )
+            except Exception as exc:
+                print(f"[PiCam] Progressive upload failed for {blob_name}, queueing full upload: {exc}")
+                full_upload = True
+        elif self.azure_service.is_configured and final_path.suffix == ".mp4":
+            full_upload = True
+        elif self.azure_service.is_configured:
+            print("Skipping Azure upload for non-mp4 recording")
+
+        if full_upload:
+            # Registered under the lock so a worker finishing the task first still finds the job.
+            with self.recording_uploads_lock:
+                task = self._upload_blob(final_path, blob_name)
+                if task is not None:
+                    self.recording_uploads[task.id] = (job, final_path)
+                    return True
+        self._recording_ready(job, final_path)
+        return False
+
+    def _recording_ready(self, job: RecordingJob, final_path: Path) -> None:
+        if final_path.suffix == ".mp4":
+            self._add_notification(f"Recording ready: {final_path.name}", "recording")
+            threading.Thread(
+                target=self.notification_service.send_push_notification_sync,
+                args=(
+                    "Recording Ready",
+                    f"Recording ready: {final_path.name}",
+                    {"type": "recording_ready", "filename": final_path.name, "job_id": job.id},
+                ),
+                daemon=True,
+            ).start()
@@ -0,0 +1,158 @@
+import base64
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    modified REAL NOT NULL,
+    pass INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS blobs_by_modified ON blobs (modified DESC, name DESC);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def encode_cursor(modified: float, name: str) -> str:
+    return base64.urlsafe_b64encode(f"{modified!r}|{name}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, str]:
+    try:
+        modified, name = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return float(modified), name
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+class BlobIndex:
+    """SQLite copy of the container listing, newest first.
+
+    Our own uploads are recorded directly; a reconcile pass walks the Azure
+    listing a page at a time (the continuation marker is persisted, so each
+    call does bounded work) and, when a pass completes, removes rows the pass
+    did not see.
+    """
+
+    def __init__(self, db_path: Path, container: str) -> None:
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(_SCHEMA)
+        if self._meta("container") != container:
+            # A different container: nothing in the old index applies.
+            with self.db:
+                self.db.execute("DELETE FROM blobs")
+                self.db.execute("DELETE FROM meta")
+                self._set_meta("container", container)
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Optional[str]) -> None:
+        if value is None:
+            self.db.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def synced(self) -> bool:
+        """True once at least one full reconcile pass has completed."""
+        with self.lock:
+            return self._meta("last_full_sync") is not None
+
+    def _current_pass(self) -> int:
+        return int(self._meta("pass") or 1)
+
+    def upsert(self, name: str, size: int, modified: float) -> None:
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO blobs (name, size, modified, pass) VALUES (?, ?, ?, ?)",
+                (name, size, modified, self._current_pass()),
+            )
+
+    def remove(self, name: str) -> None:
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM blobs WHERE name = ?", (name,))
+
+    def reconcile_page(self, blobs: Iterable, next_marker: Optional[str]) -> bool:
+        """Apply one listing page; returns True when it completed a full pass."""
+        with self.lock, self.db:
+            current = self._current_pass()
+            self.db.executemany(
+                "INSERT OR REPLACE INTO blobs (name, size, modified, pass) VALUES (?, ?, ?, ?)",
+                [
+                    (blob.name, blob.size or 0, blob.last_modified.timestamp() if blob.last_modified else 0.0, current)
+                    for blob in blobs
+                ],
+            )
+            if next_marker:
+                self._set_meta("marker", next_marker)
+                return False
+            # Anything not seen (or uploaded) during this pass was deleted in Azure.
+            self.db.execute("DELETE FROM blobs WHERE pass < ?", (current,))
+            self._set_meta("marker", None)
+            self._set_meta("pass", str(current + 1))
+            self._set_meta("last_full_sync", datetime.now(timezone.utc).isoformat())
+            return True
+
+    def marker(self) -> Optional[str]:
+        with self.lock:
+            return self._meta("marker")
+
+    def query(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        prefix: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> tuple[list[dict], Optional[str]]:
+        """One page of blobs, newest first, plus the cursor for the next page (None at the end)."""
+        clauses, params = [], []
+        if cursor:
+            modified, name = decode_cursor(cursor)
+            clauses.append("(modified < ? OR (modified = ? AND name < ?))")
+            params += [modified, modified, name]
+        if prefix:
+            # Range scan instead of LIKE so '_' and '%' in names need no escaping.
+            clauses.append("name >= ? AND name < ?")
+            params += [prefix, prefix + "\U0010ffff"]
+        if since is not None:
+            clauses.append("modified >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("modified < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        limit = max(1, limit)
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT name, size, modified FROM blobs {where} ORDER BY modified DESC, name DESC LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1][2], rows[limit - 1][0]) if len(rows) > limit else None
+        return (
+            [{"name": name, "size": size, "last_modified": _iso(modified)} for name, size, modified in rows[:limit]],
+            next_cursor,
+        )
+
+    def stats(self) -> dict:
+        with self.lock:
+            count = self.db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+            return {
+                "blobs": count,
+                "last_full_sync": self._meta("last_full_sync"),
+                "sync_in_progress": self._meta("marker") is not None,
+            }
@@ -0,0 +1,735 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+try:
+    from picamera2 import Picamera2
+    from picamera2.encoders import MJPEGEncoder, H264Encoder
+    from picamera2.outputs import FileOutput
+except Exception:  # pragma: no cover - handled at runtime on Pi
+    Picamera2 = None  # type: ignore[assignment]
+    MJPEGEncoder = None  # type: ignore[assignment]
+    H264Encoder = None  # type: ignore[assignment]
+    FileOutput = object  # type: ignore[assignment]
+
+from services.camera_session import (
+    MODE_CLOSED,
+    MODE_PREVIEW,
+    MODE_RECORD,
+    MODE_STILL,
+    MODE_STREAM,
+    CameraSession,
+)
+from services.mp4_output import MP4_MUXER_AVAILABLE, Mp4Output
+
+
+FrameCallback = Callable[[bytes], None]
+PacketCallback = Callable[[bytes, bool], None]
+
+
+def yuv420_to_bgr(yuv: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+    """BGR frame from a picamera2 YUV420 array, whose rows may be padded past the image width."""
+    width, height = size
+    stride = yuv.shape[1]
+    if stride == width:
+        return cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420)
+    # The buffer is Y (height rows of stride) then U and V (height/2 rows of stride/2 each).
+    flat = yuv.reshape(-1)
+    chroma = (height // 2) * (stride // 2)
+    u_start = height * stride
+    u = flat[u_start:u_start + chroma].reshape(height // 2, stride // 2)[:, : width // 2]
+    v = flat[u_start + chroma:u_start + 2 * chroma].reshape(height // 2, stride // 2)[:, : width // 2]
+    i420 = np.concatenate((yuv[:height, :width].reshape(-1), u.reshape(-1), v.reshape(-1)))
+    return cv2.cvtColor(i420.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_I420)
+
+
+class CameraBackend:
+    """Interface every camera source implements for CameraService.
+
+    ``start_mjpeg`` delivers encoded JPEG frames to a callback (the stream hub);
+    ``capture_array``/``capture_gray`` return BGR and grayscale frames for
+    motion detection; ``start_h264``/``stop_h264`` record a clip when supported.
+    """
+
+    name = "none"
+    supports_recording = False
+
+    @property
+    def available(self) -> bool:
+        return False
+
+    @property
+    def recording(self) -> bool:
+        return False
+
+    @property
+    def busy(self) -> bool:
+        """True while an encoder other than live MJPEG needs the camera kept open."""
+        return self.recording
+
+    @property
+    def is_open(self) -> bool:
+        return False
+
+    def open(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        pass
+
+    @property
+    def stream_width(self) -> int:
+        """Width in pixels of the JPEG frames ``start_mjpeg`` delivers."""
+        return 640
+
+    def start_mjpeg(self, on_frame: FrameCallback) -> bool:
+        return False
+
+    def stop_mjpeg(self) -> None:
+        pass
+
+    def capture_array(self) -> Optional[np.ndarray]:
+        return None
+
+    def capture_gray(self) -> Optional[np.ndarray]:
+        return None
+
+    def capture_file(self, path: Path) -> None:
+        raise RuntimeError(f"{self.name} backend cannot capture stills")
+
+    @property
+    def recording_suffix(self) -> str:
+        """File extension recordings use: ".mp4" when muxed in-process, else raw ".h264"."""
+        return ".h264"
+
+    def start_h264(self, path: Path) -> bool:
+        return False
+
+    def stop_h264(self) -> None:
+        pass
+
+    @property
+    def packet_encoding(self) -> bool:
+        return False
+
+    def start_h264_packets(self, on_packet: PacketCallback) -> bool:
+        return False
+
+    def stop_h264_packets(self) -> None:
+        pass
+
+    def session_stats(self) -> dict:
+        return {"mode": MODE_PREVIEW if self.is_open else MODE_CLOSED}
+
+
+class PicameraBackend(CameraBackend):
+    """Picamera2 session running several encoders side by side.
+
+    The camera is configured once with a YUV420 main stream at the recording
+    size for H264 and a YUV420 lores stream that feeds both the MJPEG encoder and
+    motion detection, so recording never reconfigures the camera or
+    interrupts live view. The camera stays open between consumers; stills
+    taken while no encoder is running switch to the full-sensor still
+    configuration and back in place; stills taken while one is running come
+    from the main stream, at the recording size. ``session`` tracks the current mode and
+    how long each switch took.
+    """
+
+    name = "picamera"
+    supports_recording = True
+
+    def __init__(
+        self,
+        camera_factory: Optional[Callable[[], object]] = None,
+        mjpeg_encoder_factory: Optional[Callable[[], object]] = None,
+        h264_encoder_factory: Optional[Callable[[], object]] = None,
+        stream_size: tuple[int, int] = (640, 480),
+        motion_size: tuple[int, int] = (320, 240),
+        record_size: tuple[int, int] = (1920, 1080),
+        packet_bitrate: int = 1_500_000,
+        packet_iperiod: int = 30,
+        record_fps: float = 30,
+        record_mp4: bool = True,
+    ) -> None:
+        self.camera_factory = camera_factory or Picamera2
+        self.mjpeg_encoder_factory = mjpeg_encoder_factory or MJPEGEncoder
+        self.h264_encoder_factory = h264_encoder_factory or H264Encoder
+        width, height = stream_size
+        motion_width, motion_height = motion_size
+        if (
+            motion_width <= 0
+            or motion_height <= 0
+            or width % motion_width
+            or height % motion_height
+            or width // motion_width != height // motion_height
+        ):
+            # capture_gray strides the lores Y plane by one whole factor in both directions.
+            raise ValueError(f"motion size {motion_width}x{motion_height} must divide stream size {width}x{height} evenly")
+        self.stream_size = stream_size
+        self.motion_size = motion_size
+        self.record_size = record_size
+        self.picam = None
+        self.lock = threading.RLock()
+        self.packet_bitrate = packet_bitrate
+        self.packet_iperiod = packet_iperiod
+        self.record_fps = record_fps
+        self.record_mp4 = record_mp4 and MP4_MUXER_AVAILABLE
+        self.mjpeg_encoder = None
+        self.h264_encoder = None
+        self.packet_encoder = None
+        self.session = CameraSession(self._current_mode)
+
+    @property
+    def available(self) -> bool:
+        return self.camera_factory is not None
+
+    def _current_mode(self) -> str:
+        if self.picam is None:
+            return MODE_CLOSED
+        if self.h264_encoder is not None:
+            return MODE_RECORD
+        if self.mjpeg_encoder is not None:
+            return MODE_STREAM
+        return MODE_PREVIEW
+
+    def session_stats(self) -> dict:
+        return self.session.stats()
+
+    @property
+    def is_open(self) -> bool:
+        return self.picam is not None
+
+    @property
+    def stream_width(self) -> int:
+        return self.stream_size[0]
+
+    @property
+    def recording(self) -> bool:
+        return self.h264_encoder is not None
+
+    @property
+    def packet_encoding(self) -> bool:
+        return self.packet_encoder is not None
+
+    @property
+    def busy(self) -> bool:
+        return self.h264_encoder is not None or self.packet_encoder is not None
+
+    def _video_configuration(self, picam) -> dict:
+        # main carries the recording size for H264; YUV420 is the encoder's native input and
+        # half the size of RGB888. The lores stream serves MJPEG and the motion Y plane.
+        return picam.create_video_configuration(
+            main={"size": self.record_size, "format": "YUV420"},
+            lores={"size": self.stream_size, "format": "YUV420"},
+        )
+
+    def open(self) -> bool:
+        with self.lock:
+            if self.picam is not None:
+                return True
+            if self.camera_factory is None:
+                return False
+            with self.session.switching():
+                return self._open_locked()
+
+    def _open_locked(self) -> bool:
+        try:
+            self.picam = self.camera_factory()
+            self.picam.configure(self._video_configuration(self.picam))
+            self.picam.start()
+            return True
+        except Exception as exc:
+            print(f"Camera initialization error: {exc}")
+            if self.picam:
+                try:
+                    self.picam.close()
+                except Exception:
+                    pass
+            self.picam = None
+            return False
+
+    def _stop_encoder(self, encoder) -> None:
+        if encoder is None or self.picam is None:
+            return
+        try:
+            self.picam.stop_encoder(encoder)
+        except Exception as exc:
+            print(f"Encoder stop failed: {exc}")
+
+    def close(self) -> None:
+        with self.lock, self.session.switching():
+            self._stop_encoder(self.mjpeg_encoder)
+            self._stop_encoder(self.h264_encoder)
+            self._stop_encoder(self.packet_encoder)
+            self.mjpeg_encoder = None
+            self.h264_encoder = None
+            self.packet_encoder = None
+            if self.picam:
+                try:
+                    self.picam.stop()
+                except Exception:
+                    pass
+                try:
+                    self.picam.close()
+                except Exception:
+                    pass
+            self.picam = None
+
+    def start_mjpeg(self, on_frame: FrameCallback) -> bool:
+        if self.mjpeg_encoder_factory is None:
+            return False
+
+        class _StreamOutput(FileOutput):
+            def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=None):
+                on_frame(frame)
+
+        with self.lock, self.session.switching():
+            if not self.open():
+                return False
+            self._stop_encoder(self.mjpeg_encoder)
+            try:
+                encoder = self.mjpeg_encoder_factory()
+                self.picam.start_encoder(encoder, _StreamOutput(), name="lores")
+                self.mjpeg_encoder = encoder
+                return True
+            except Exception as exc:
+                print(f"Stream: Encoder start failed: {exc}")
+                self.mjpeg_encoder = None
+                return False
+
+    def stop_mjpeg(self) -> None:
+        with self.lock, self.session.switching():
+            self._stop_encoder(self.mjpeg_encoder)
+            self.mjpeg_encoder = None
+
+    def capture_array(self) -> Optional[np.ndarray]:
+        if not self.open():
+            return None
+        try:
+            return yuv420_to_bgr(self.picam.capture_array("lores"), self.stream_size)
+        except Exception as exc:
+            print(f"Frame capture error: {exc}")
+            return None
+
+    def capture_gray(self) -> Optional[np.ndarray]:
+        if not self.open():
+            return None
+        try:
+            yuv = self.picam.capture_array("lores")
+        except Exception as exc:
+            print(f"Lores capture error: {exc}")
+            return None
+        width, height = self.stream_size
+        # Integer striding down to the motion size is a view, not a copy.
+        step = max(1, width // max(1, self.motion_size[0]))
+        return yuv[:height, :width][::step, ::step]
+
+    def capture_file(self, path: Path) -> None:
+        with self.lock:
+            if not self.open():
+                raise RuntimeError("Camera not available")
+            if self._current_mode() != MODE_PREVIEW or self.packet_encoder is not None:
+                # Encoders are attached to the video configuration; take the still from its main stream.
+                frame = yuv420_to_bgr(self.picam.capture_array("main"), self.record_size)
+                if not cv2.imwrite(str(path), frame):
+                    raise RuntimeError(f"Could not write {path}")
+                return
+            with self.session.switching(MODE_STILL):
+                self.picam.switch_mode_and_capture_file(self.picam.create_still_configuration(), str(path))
+
+    @property
+    def recording_suffix(self) -> str:
+        return ".mp4" if self.record_mp4 else ".h264"
+
+    def start_h264(self, path: Path) -> bool:
+        """Record the main stream to ``path``; a ".mp4" path is muxed in-process as it is written."""
+        if self.h264_encoder_factory is None:
+            return False
+        with self.lock:
+            if self.h264_encoder is not None or not self.open():
+                return False
+            with self.session.switching():
+                return self._start_h264_locked(path)
+
+    def _start_h264_locked(self, path: Path) -> bool:
+        try:
+            if path.suffix == ".mp4":
+                output = Mp4Output(path, fps=self.record_fps, size=self.record_size)
+            else:
+                output = str(path)
+            encoder = self.h264_encoder_factory()
+            self.picam.start_encoder(encoder, output, name="main")
+            self.h264_encoder = encoder
+            print(f"Recording started: {path}")
+            return True
+        except Exception as exc:
+            print(f"Recording capture error: {exc}")
+            return False
+
+    def stop_h264(self) -> None:
+        with self.lock, self.session.switching():
+            self._stop_encoder(self.h264_encoder)
+            self.h264_encoder = None
+
+    def start_h264_packets(self, on_packet: PacketCallback) -> bool:
+        """Run a continuous lores H264 encoder whose packets go to ``on_packet``.
+
+        SPS/PPS are repeated on every keyframe so any keyframe can start a
+        standalone clip.
+        """
+        if self.h264_encoder_factory is None:
+            return False
+
+        class _PacketOutput(FileOutput):
+            def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=None):
+                on_packet(frame, keyframe)
+
+        with self.lock:
+            if self.packet_encoder is not None:
+                return True
+            if not self.open():
+                return False
+            try:
+                encoder = self.h264_encoder_factory(
+                    bitrate=self.packet_bitrate, repeat=True, iperiod=self.packet_iperiod
+                )
+                self.picam.start_encoder(encoder, _PacketOutput(), name="lores")
+                self.packet_encoder = encoder
+                return True
+            except Exception as exc:
+                print(f"Packet encoder start failed: {exc}")
+                return False
+
+    def stop_h264_packets(self) -> None:
+        with self.lock:
+            self._stop_encoder(self.packet_encoder)
+            self.packet_encoder = None
+
+
+class _JpegSourceBackend(CameraBackend, ABC):
+    """Shared plumbing for sources that natively produce JPEG frames.
+
+    A single reader thread owns the source; the newest JPEG is kept in memory
+    and forwarded untouched to the MJPEG callback, and it is only decoded when
+    motion detection or a still capture asks for pixels.
+    """
+
+    size: tuple[int, int]
+
+    def __init__(self, fps: float) -> None:
+        self.fps = fps
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.on_frame: Optional[FrameCallback] = None
+        self.latest_jpeg: Optional[bytes] = None
+        self.latest_seq = 0
+        self.decoded_seq = 0
+        self.decoded: Optional[np.ndarray] = None
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @property
+    def is_open(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    @property
+    def stream_width(self) -> int:
+        return self.size[0]
+
+    @abstractmethod
+    def _open_source(self) -> bool:
+        ...
+
+    def _close_source(self) -> None:
+        pass
+
+    @abstractmethod
+    def _read_jpeg(self) -> Optional[bytes]:
+        ...
+
+    def _pace(self, started: float) -> None:
+        pass
+
+    def _run(self) -> None:
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            jpeg = self._read_jpeg()
+            if jpeg is None:
+                self.stop_event.wait(0.1)
+                continue
+            with self.lock:
+                self.latest_jpeg = jpeg
+                self.latest_seq += 1
+                callback = self.on_frame
+            if callback is not None:
+                callback(jpeg)
+            self._pace(started)
+
+    def open(self) -> bool:
+        if self.is_open:
+            return True
+        if not self._open_source():
+            return False
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return True
+
+    def close(self) -> None:
+        self.on_frame = None
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        self.thread = None
+        self._close_source()
+
+    def start_mjpeg(self, on_frame: FrameCallback) -> bool:
+        self.on_frame = on_frame
+        if not self.open():
+            self.on_frame = None
+            return False
+        return True
+
+    def stop_mjpeg(self) -> None:
+        self.on_frame = None
+
+    def _wait_for_frame(self, timeout: float = 2.0) -> Optional[bytes]:
+        deadline = time.monotonic() + timeout
+        while self.latest_jpeg is None and time.monotonic() < deadline and self.is_open:
+            time.sleep(0.02)
+        return self.latest_jpeg
+
+    def capture_array(self) -> Optional[np.ndarray]:
+        if not self.open() or self._wait_for_frame() is None:
+            return None
+        with self.lock:
+            if self.decoded_seq != self.latest_seq:
+                self.decoded = cv2.imdecode(np.frombuffer(self.latest_jpeg, np.uint8), cv2.IMREAD_COLOR)
+                self.decoded_seq = self.latest_seq
+            return self.decoded
+
+    def capture_gray(self) -> Optional[np.ndarray]:
+        if not self.open():
+            return None
+        jpeg = self._wait_for_frame()
+        if jpeg is None:
+            return None
+        # Reduced-size grayscale decode skips most of the IDCT work.
+        return cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_2)
+
+    def capture_file(self, path: Path) -> None:
+        if not self.open():
+            raise RuntimeError(f"{self.name} camera not available")
+        jpeg = self._wait_for_frame()
+        if jpeg is None:
+            raise RuntimeError(f"{self.name} camera produced no frame")
+        Path(path).write_bytes(jpeg)
+
+
+class OpenCVBackend(_JpegSourceBackend):
+    """USB/V4L2 camera via OpenCV, forwarding the camera's own MJPEG frames.
+
+    With ``CAP_PROP_CONVERT_RGB`` disabled the V4L2 backend returns the raw
+    compressed buffer, so /stream never decodes or re-encodes a frame. Cameras
+    that do not deliver JPEG fall back to encoding each frame once.
+    """
+
+    name = "usb"
+
+    def __init__(
+        self,
+        device: str = "/dev/video0",
+        size: tuple[int, int] = (1280, 720),
+        fps: float = 30,
+        fourcc: str = "MJPG",
+        jpeg_quality: int = 80,
+    ) -> None:
+        super().__init__(fps)
+        self.device = device
+        self.size = size
+        self.fourcc = fourcc
+        self.jpeg_quality = jpeg_quality
+        self.capture = None
+        self.passthrough = False
+
+    def _open_source(self) -> bool:
+        device = int(self.device) if str(self.device).isdigit() else self.device
+        capture = cv2.VideoCapture(device, cv2.CAP_V4L2)
+        if not capture.isOpened():
+            print(f"USB camera: cannot open {self.device}")
+            capture.release()
+            return False
+        if self.fourcc:
+            capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc[:4].ljust(4)))
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+        capture.set(cv2.CAP_PROP_FPS, self.fps)
+        self.passthrough = self.fourcc.upper() == "MJPG" and bool(capture.set(cv2.CAP_PROP_CONVERT_RGB, 0))
+        self.capture = capture
+        print(f"USB camera: opened {self.device} ({'MJPEG passthrough' if self.passthrough else 'encode'})")
+        return True
+
+    def _close_source(self) -> None:
+        if self.capture is not None:
+            self.capture.release()
+        self.capture = None
+
+    def _read_jpeg(self) -> Optional[bytes]:
+        if self.capture is None:
+            return None
+        ok, frame = self.capture.read()
+        if not ok or frame is None:
+            return None
+        if self.passthrough and frame.ndim <= 2 and frame.size > 2 and frame.flat[0] == 0xFF and frame.flat[1] == 0xD8:
+            return frame.tobytes()
+        if frame.ndim != 3:
+            frame = cv2.imdecode(frame.reshape(-1), cv2.IMREAD_COLOR)
+            if frame is None:
+                return None
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return encoded.tobytes() if ok else None
+
+
+class ReplayBackend(_JpegSourceBackend):
+    """Synthetic or recorded frames replayed at a fixed rate, for off-Pi load tests.
+
+    ``source`` may be a directory of JPEGs, a concatenated MJPEG file, a video
+    file OpenCV can read, or None for a generated moving-square pattern. Frames
+    are JPEG-encoded once up front so replay itself costs almost no CPU.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        source: Optional[Path] = None,
+        fps: float = 15,
+        size: tuple[int, int] = (640, 480),
+        max_frames: int = 300,
+        jpeg_quality: int = 80,
+    ) -> None:
+        super().__init__(fps)
+        self.source = Path(source) if source else None
+        self.size = size
+        self.max_frames = max_frames
+        self.jpeg_quality = jpeg_quality
+        self.frames: list[bytes] = []
+        self.index = 0
+
+    def _encode(self, frame: np.ndarray) -> Optional[bytes]:
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return encoded.tobytes() if ok else None
+
+    def _synthetic_frames(self) -> list[bytes]:
+        width, height = self.size
+        box = max(8, width // 8)
+        frames = []
+        for index in range(min(self.max_frames, 60)):
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            frame[:, :, 1] = np.linspace(30, 90, width, dtype=np.uint8)[None, :]
+            x = (index * max(1, (width - box) // 60)) % max(1, width - box)
+            y = (height - box) // 2
+            frame[y:y + box, x:x + box] = 230
+            encoded = self._encode(frame)
+            if encoded:
+                frames.append(encoded)
+        return frames
+
+    @staticmethod
+    def _split_mjpeg(data: bytes) -> list[bytes]:
+        frames = []
+        start = data.find(b"\xff\xd8")
+        while start != -1:
+            end = data.find(b"\xff\xd9", start + 2)
+            if end == -1:
+                break
+            frames.append(data[start:end + 2])
+            start = data.find(b"\xff\xd8", end + 2)
+        return frames
+
+    def _load_frames(self) -> list[bytes]:
+        if self.source is None:
+            return self._synthetic_frames()
+        if self.source.is_dir():
+            paths = sorted(self.source.glob("*.jpg")) + sorted(self.source.glob("*.jpeg"))
+            return [path.read_bytes() for path in paths[: self.max_frames]]
+        if self.source.suffix.lower() in (".mjpeg", ".mjpg"):
+            return self._split_mjpeg(self.source.read_bytes())[: self.max_frames]
+        capture = cv2.VideoCapture(str(self.source))
+        frames = []
+        try:
+            while len(frames) < self.max_frames:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                encoded = self._encode(frame)
+                if encoded:
+                    frames.append(encoded)
+        finally:
+            capture.release()
+        return frames
+
+    def _open_source(self) -> bool:
+        if not self.frames:
+            try:
+                self.frames = self._load_frames()
+            except Exception as exc:
+                print(f"Replay camera: failed to load {self.source}: {exc}")
+                self.frames = []
+        if not self.frames:
+            print(f"Replay camera: no frames available from {self.source or 'synthetic source'}")
+            return False
+        return True
+
+    def _read_jpeg(self) -> Optional[bytes]:
+        frame = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        return frame
+
+    def _pace(self, started: float) -> None:
+        remaining = (1.0 / max(0.1, self.fps)) - (time.monotonic() - started)
+        if remaining > 0:
+            self.stop_event.wait(remaining)
+
+
+def create_camera_backend(
+    source: str,
+    picamera_available: bool,
+    motion_size: tuple[int, int] = (320, 240),
+    usb_device: str = "/dev/video0",
+    usb_size: tuple[int, int] = (1280, 720),
+    usb_fps: float = 30,
+    usb_format: str = "MJPG",
+    replay_source: Optional[str] = None,
+    replay_fps: float = 15,
+    lores_h264_bitrate: int = 600_000,
+) -> CameraBackend:
+    source = (source or "picamera").lower()
+    if source == "usb":
+        return OpenCVBackend(device=usb_device, size=usb_size, fps=usb_fps, fourcc=usb_format)
+    if source == "replay":
+        return ReplayBackend(source=Path(replay_source) if replay_source else None, fps=replay_fps)
+    if source == "fake":
+        from services.fake_camera import FakeEncoder, FakePicamera2
+
+        return PicameraBackend(
+            camera_factory=FakePicamera2,
+            mjpeg_encoder_factory=FakeEncoder,
+            h264_encoder_factory=FakeEncoder,
+            motion_size=motion_size,
+            # The fake encoders emit JPEGs, which cannot be muxed as H264.
+            record_mp4=False,
+        )
+    if source != "picamera":
+        print(f"[PiCam] Unknown camera_source {source!r}; falling back to picamera")
+    if not picamera_available:
+        return CameraBackend()
+    return PicameraBackend(motion_size=motion_size, packet_bitrate=lores_h264_bitrate)
@@ -0,0 +1,147 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional, TypeVar
+
+
+PRIORITY_RECORD = 0
+PRIORITY_STILL = 1
+PRIORITY_STREAM = 2
+PRIORITY_MOTION = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_RECORD: "record",
+    PRIORITY_STILL: "still",
+    PRIORITY_STREAM: "stream",
+    PRIORITY_MOTION: "motion",
+}
+
+T = TypeVar("T")
+
+
+@dataclass
+class CameraLease:
+    """A long-running consumer (e.g. the live stream) that can be paused for higher-priority jobs."""
+
+    name: str
+    priority: int
+    pause: Callable[[], None]
+    resume: Callable[[], None]
+
+
+class CameraBroker:
+    """Single owner of the camera: every camera operation runs as a job through here.
+
+    Jobs are granted one at a time, lowest priority value first (recording >
+    still > stream > motion), FIFO within a priority. A job started with
+    ``preempt=True`` pauses every lease of lower priority before it runs and
+    resumes them afterwards. Nested calls from the thread holding the camera
+    run inline.
+    """
+
+    def __init__(self, history: int = 200) -> None:
+        self.cond = threading.Condition()
+        self.waiting: list[tuple[int, int]] = []
+        self.counter = itertools.count()
+        self.active: Optional[tuple[int, int]] = None
+        self.local = threading.local()
+        self.leases: dict[str, CameraLease] = {}
+        self.waits_ms: dict[int, deque[float]] = {priority: deque(maxlen=history) for priority in PRIORITY_NAMES}
+        self.jobs: dict[int, int] = {priority: 0 for priority in PRIORITY_NAMES}
+        self.timeouts: dict[int, int] = {priority: 0 for priority in PRIORITY_NAMES}
+        self.preemptions: dict[str, int] = {}
+
+    def register_lease(self, lease: CameraLease) -> None:
+        with self.cond:
+            self.leases[lease.name] = lease
+
+    def release_lease(self, name: str) -> None:
+        with self.cond:
+            self.leases.pop(name, None)
+
+    def _acquire(self, priority: int, timeout: Optional[float]) -> None:
+        ticket = (priority, next(self.counter))
+        started = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            heapq.heappush(self.waiting, ticket)
+            while self.active is not None or self.waiting[0] != ticket:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.waiting.remove(ticket)
+                    heapq.heapify(self.waiting)
+                    self.timeouts[priority] += 1
+                    self.cond.notify_all()
+                    raise TimeoutError(f"Camera busy; {PRIORITY_NAMES.get(priority, priority)} job timed out")
+                self.cond.wait(remaining)
+            heapq.heappop(self.waiting)
+            self.active = ticket
+            self.jobs[priority] += 1
+            self.waits_ms[priority].append((time.perf_counter() - started) * 1000)
+
+    def _release(self) -> None:
+        with self.cond:
+            self.active = None
+            self.cond.notify_all()
+
+    def run(
+        self,
+        priority: int,
+        fn: Callable[..., T],
+        *args,
+        timeout: Optional[float] = None,
+        preempt: bool = False,
+    ) -> T:
+        """Run ``fn`` once the camera is granted; raises TimeoutError if not granted within ``timeout``."""
+        if getattr(self.local, "holding", False):
+            return fn(*args)
+        self._acquire(priority, timeout)
+        self.local.holding = True
+        paused: list[CameraLease] = []
+        try:
+            if preempt:
+                with self.cond:
+                    leases = [lease for lease in self.leases.values() if lease.priority > priority]
+                for lease in leases:
+                    try:
+                        lease.pause()
+                    except Exception as exc:
+                        print(f"Camera broker: pausing {lease.name} failed: {exc}")
+                        continue
+                    paused.append(lease)
+                    with self.cond:
+                        self.preemptions[lease.name] = self.preemptions.get(lease.name, 0) + 1
+            return fn(*args)
+        finally:
+            with self.cond:
+                # A lease released while paused (e.g. the stream was stopped) must stay stopped.
+                resumable = [lease for lease in reversed(paused) if self.leases.get(lease.name) is lease]
+            for lease in resumable:
+                try:
+                    lease.resume()
+                except Exception as exc:
+                    print(f"Camera broker: resuming {lease.name} failed: {exc}")
+            self.local.holding = False
+            self._release()
+
+    def metrics(self) -> dict:
+        with self.cond:
+            consumers = {}
+            for priority, name in PRIORITY_NAMES.items():
+                waits = list(self.waits_ms[priority])
+                consumers[name] = {
+                    "jobs": self.jobs[priority],
+                    "timeouts": self.timeouts[priority],
+                    "avg_wait_ms": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                    "max_wait_ms": round(max(waits), 2) if waits else 0.0,
+                }
+            return {
+                "queue_depth": len(self.waiting),
+                "active": PRIORITY_NAMES.get(self.active[0]) if self.active else None,
+                "leases": sorted(self.leases),
+                "preemptions": dict(self.preemptions),
+                "consumers": consumers,
+            }
@@ -1,26 +1,39 @@
-import io
-import shutil
-import subprocess
-import time
+import asyncio
 import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Callable, Optional
 
+import anyio
 import cv2
 import numpy as np
 from fastapi.responses import StreamingResponse
-from PIL import Image, ImageDraw
-
-try:
-    from picamera2 import Picamera2
-    from picamera2.encoders import MJPEGEncoder, H264Encoder
-    from picamera2.outputs import FileOutput
-except Exception:  # pragma: no cover - handled at runtime on Pi
-    Picamera2 = None  # type: ignore[assignment]
-    MJPEGEncoder = None  # type: ignore[assignment]
-    H264Encoder = None  # type: ignore[assignment]
-    FileOutput = object  # type: ignore[assignment]
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketDisconnect
+
+from services.camera_backends import CameraBackend, PicameraBackend
+from services.camera_broker import (
+    PRIORITY_MOTION,
+    PRIORITY_RECORD,
+    PRIORITY_STILL,
+    PRIORITY_STREAM,
+    CameraBroker,
+    CameraLease,
+)
+from services.clip_buffer import MotionClipBuffer
+from services.frame_ring import MJPEG_BOUNDARY, MJPEG_PART_HEADER, MJPEG_PART_TRAILER
+from services.hls import HLS_AVAILABLE, HlsSegmenter
+from services.placeholders import (
+    PLACEHOLDER_CAMERA_UNAVAILABLE,
+    PLACEHOLDER_DEBOUNCED,
+    PLACEHOLDER_NO_PICAMERA,
+    PLACEHOLDER_RECORDING,
+    PlaceholderCache,
+)
+from services.stream_hub import StreamHub
+from services.stream_profiles import StreamProfile, StreamProfileManager
+from services.ws_stream import WebSocketStreamClient
 
 
 class CameraService:
@@ -31,184 +44,256 @@ class CameraService:
         stream_debounce_sec: float,
         stream_warmup_sec: float,
         is_recording: Callable[[], bool],
+        stream_async: bool = True,
+        backend: Optional[CameraBackend] = None,
+        motion_wait_sec: float = 0.2,
+        snapshot_max_age_sec: float = 1.0,
+        snapshot_timeout_sec: float = 2.0,
+        hls_idle_sec: float = 30.0,
     ) -> None:
-        self.picamera_available = picamera_available
+        self.backend = backend or PicameraBackend()
+        self.picamera_available = picamera_available and self.backend.available
         self.stream_stale_sec = stream_stale_sec
         self.stream_debounce_sec = stream_debounce_sec
         self.stream_warmup_sec = stream_warmup_sec
         self.is_recording = is_recording
+        self.stream_async = stream_async
+        self.motion_wait_sec = motion_wait_sec
+        self.snapshot_max_age_sec = snapshot_max_age_sec
+        self.snapshot_timeout_sec = snapshot_timeout_sec
+        self.snapshot_lock = threading.Lock()
+        self.snapshot_cache: Optional[tuple[bytes, str, float]] = None
+        self.snapshot_captures = 0
+        self.broker = CameraBroker()
 
-        self.picam = None
         self.stream_active = False
-        self.stream_stop_requested = False
         self.last_stream_start_ts = 0.0
-        self.latest_stream_frame: Optional[np.ndarray] = None
         self.latest_stream_frame_ts = 0.0
-        self.latest_stream_lock = threading.Lock()
-
-    def placeholder_frame(self) -> bytes:
-        img = Image.new("RGB", (640, 480), color=(20, 20, 20))
-        draw = ImageDraw.Draw(img)
-        draw.text((20, 20), "Pi Camera Placeholder", fill=(200, 200, 200))
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=80)
-        return buf.getvalue()
-
-    def _update_latest_stream_frame(self, frame_bytes: bytes) -> None:
-        now = time.time()
-        if now - self.latest_stream_frame_ts < 0.2:
-            return
-        img = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR)
-        if img is None:
-            return
-        with self.latest_stream_lock:
-            self.latest_stream_frame = img
-            self.latest_stream_frame_ts = now
+        self.placeholders = PlaceholderCache()
+        self.clip_buffer: Optional[MotionClipBuffer] = None
+        self.stream_hub = StreamHub(
+            start_session=self._start_stream_session,
+            stop_session=self._stop_stream_session,
+        )
+        self.stream_profiles = StreamProfileManager(self.stream_hub.ring, source_width=self.backend.stream_width)
+        self.hls: Optional[HlsSegmenter] = HlsSegmenter() if HLS_AVAILABLE else None
+        self.hls_idle_sec = hls_idle_sec
+        self.hls_last_request = 0.0
+        self.ws_clients: dict[int, WebSocketStreamClient] = {}
+
+    def placeholder_frame(self, state: str = PLACEHOLDER_NO_PICAMERA, timestamp: bool = False) -> bytes:
+        return self.placeholders.jpeg(state, timestamp=timestamp)
 
     def close_camera(self) -> None:
-        if self.picam:
-            try:
-                self.picam.stop_recording()
-            except Exception:
-                pass
-            try:
-                self.picam.stop()
-            except Exception:
-                pass
-            try:
-                self.picam.close()
-            except Exception:
-                pass
-        self.picam = None
+        self.backend.close()
 
     def init_camera(self) -> None:
-        if not self.picamera_available or self.picam is not None or Picamera2 is None:
+        if self.picamera_available:
+            self.backend.open()
+
+    def session_stats(self) -> dict:
+        return {**self.backend.session_stats(), "broker": self.broker.metrics()}
+
+    def enable_motion_clips(self, clip_buffer: MotionClipBuffer) -> None:
+        self.clip_buffer = clip_buffer
+        self._ensure_packet_encoder()
+
+    @property
+    def hls_active(self) -> bool:
+        return self.hls is not None and time.monotonic() - self.hls_last_request < self.hls_idle_sec
+
+    def _ensure_packet_encoder(self) -> None:
+        """Start the shared lores H264 encoder if motion clips or HLS viewers need it."""
+        if not self.picamera_available or self.backend.packet_encoding:
+            return
+        if self.clip_buffer is None and not self.hls_active:
+            return
+        if self.clip_buffer is not None and self.clip_buffer.active:
+            self.clip_buffer.close_clip()
+        if self.hls is not None:
+            self.hls.reset()
+        self.backend.start_h264_packets(self._on_h264_packet)
+
+    def _stop_idle_packet_encoder(self) -> None:
+        def _stop() -> None:
+            if self.clip_buffer is None and not self.hls_active:
+                self.backend.stop_h264_packets()
+
+        self.broker.run(PRIORITY_STREAM, _stop)
+
+    def _on_h264_packet(self, data, keyframe: bool) -> None:
+        if self.clip_buffer is not None:
+            self.clip_buffer.add_packet(data, keyframe)
+        if self.hls is None or not self.hls_last_request:
+            return
+        if not self.hls_active:
+            # Last HLS viewer went away; stop the encoder from another thread (not from its own output).
+            self.hls_last_request = 0.0
+            self.hls.reset()
+            if self.clip_buffer is None:
+                threading.Thread(target=self._stop_idle_packet_encoder, daemon=True).start()
             return
         try:
-            self.picam = Picamera2()
-            config = self.picam.create_video_configuration(main={"size": (640, 480)})
-            self.picam.configure(config)
-            self.picam.start()
+            self.hls.add_packet(data, keyframe)
         except Exception as exc:
-            print(f"Camera initialization error: {exc}")
-            if self.picam:
-                try:
-                    self.picam.close()
-                except Exception:
-                    pass
-            self.picam = None
+            print(f"[PiCam] HLS: muxing failed, restarting segmenter: {exc}")
+            self.hls.reset()
+
+    def _touch_hls(self) -> bool:
+        if self.hls is None or not self.picamera_available:
+            return False
+        self.hls_last_request = time.monotonic()
+        self.broker.run(PRIORITY_STREAM, self._ensure_packet_encoder)
+        return self.backend.packet_encoding
+
+    def hls_playlist(self, wait_sec: float = 6.0) -> Optional[str]:
+        """Live HLS playlist; the first request starts the encoder and waits for a segment."""
+        if not self._touch_hls():
+            return None
+        self.hls.wait_ready(wait_sec)
+        return self.hls.playlist()
+
+    def hls_init_segment(self) -> Optional[bytes]:
+        if not self._touch_hls():
+            return None
+        return self.hls.init_segment()
+
+    def hls_segment(self, seq: int) -> Optional[bytes]:
+        if not self._touch_hls():
+            return None
+        return self.hls.segment(seq)
+
+    def trigger_motion_clip(self, path: Path) -> bool:
+        """Flush the pre-event buffer to ``path`` and keep recording; False if no clip was started."""
+        if self.clip_buffer is None or not self.backend.packet_encoding:
+            return False
+        return self.clip_buffer.trigger(path)
+
+    def _motion_capture(self, capture: Callable[[], Optional[np.ndarray]]) -> Optional[np.ndarray]:
+        def _run() -> Optional[np.ndarray]:
+            self._ensure_packet_encoder()
+            return capture()
+
+        try:
+            return self.broker.run(PRIORITY_MOTION, _run, timeout=self.motion_wait_sec)
+        except TimeoutError:
+            # Motion is the lowest-priority consumer; skip this frame rather than queue behind others.
+            return None
 
     def get_frame_array(self) -> Optional[np.ndarray]:
-        if self.stream_active:
-            with self.latest_stream_lock:
-                if self.latest_stream_frame is not None and (time.time() - self.latest_stream_frame_ts) <= 1.0:
-                    return self.latest_stream_frame.copy()
+        if self.picamera_available:
+            return self._motion_capture(self.backend.capture_array)
+        return self.placeholders.array(PLACEHOLDER_NO_PICAMERA)
 
+    def get_gray_frame(self) -> Optional[np.ndarray]:
+        """Return a grayscale frame from the backend's cheapest source (e.g. the lores Y plane)."""
         if self.picamera_available:
-            self.init_camera()
-            if self.picam is not None:
-                try:
-                    frame = self.picam.capture_array()
-                    return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                except Exception as exc:
-                    print(f"Frame capture error: {exc}")
-                    return None
-
-        placeholder = self.placeholder_frame()
-        return cv2.imdecode(np.frombuffer(placeholder, np.uint8), cv2.IMREAD_COLOR)
+            return self._motion_capture(self.backend.capture_gray)
+        return self.placeholders.gray(PLACEHOLDER_NO_PICAMERA)
+
+    def _capture_still(self, output_path: Path) -> bool:
+        if not self.backend.open():
+            return False
+        try:
+            self.backend.capture_file(output_path)
+        except Exception as exc:
+            # The broker still resumes the paused stream; the caller falls back to a placeholder.
+            print(f"Photo capture error: {exc}")
+            return False
+        return True
 
     def capture_photo(self, output_path: Path) -> None:
         if self.picamera_available:
-            self.init_camera()
-            if self.picam is not None:
-                self.picam.capture_file(str(output_path))
+            # With no encoder pinning the video configuration, pause the stream for a full-sensor still.
+            if self.broker.run(PRIORITY_STILL, self._capture_still, output_path, preempt=not self.backend.busy):
                 return
             print("Photo endpoint: Camera not available, using placeholder")
-        output_path.write_bytes(self.placeholder_frame())
-
-    def create_recording_camera(self):
-        if not self.picamera_available or Picamera2 is None:
-            return None
-        self.close_camera()
-        time.sleep(0.5)
-        self.picam = Picamera2()
-        video_config = self.picam.create_video_configuration(main={"size": (1920, 1080), "format": "RGB888"})
-        self.picam.configure(video_config)
-        self.picam.start()
-        return self.picam
-
-    def record_video(self, duration: int, media_dir: Path) -> Optional[Path]:
-        if not self.picamera_available or H264Encoder is None:
+            output_path.write_bytes(self.placeholder_frame(PLACEHOLDER_CAMERA_UNAVAILABLE, timestamp=True))
+            return
+        output_path.write_bytes(self.placeholder_frame(PLACEHOLDER_NO_PICAMERA, timestamp=True))
+
+    def _capture_snapshot_jpeg(self) -> bytes:
+        if not self.picamera_available:
+            return self.placeholder_frame(PLACEHOLDER_NO_PICAMERA)
+        frame = self.broker.run(PRIORITY_STILL, self.backend.capture_array, timeout=self.snapshot_timeout_sec)
+        if frame is None:
+            return self.placeholder_frame(PLACEHOLDER_CAMERA_UNAVAILABLE)
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if not ok:
+            return self.placeholder_frame(PLACEHOLDER_CAMERA_UNAVAILABLE)
+        return encoded.tobytes()
+
+    def snapshot(self) -> tuple[bytes, str]:
+        """Return (jpeg, etag) for the newest frame, touching the camera only if nothing fresh is cached.
+
+        Raises TimeoutError if the camera stays busy (e.g. a recording is starting)
+        and there is no earlier frame to fall back on.
+        """
+        ring = self.stream_hub.ring
+        view = ring.latest()
+        if view is not None and time.time() - view.timestamp <= self.snapshot_max_age_sec:
+            data = bytes(view.data)
+            if ring.is_current(view):
+                return data, f'"f{view.seq}"'
+
+        with self.snapshot_lock:
+            cached = self.snapshot_cache
+            if cached is not None and time.time() - cached[2] <= self.snapshot_max_age_sec:
+                return cached[0], cached[1]
+            try:
+                data = self._capture_snapshot_jpeg()
+            except TimeoutError:
+                # Serve the last frame we have, however old, rather than queueing pollers behind the job.
+                if view is not None:
+                    data = bytes(view.data)
+                    if ring.is_current(view):
+                        return data, f'"f{view.seq}"'
+                if cached is not None:
+                    return cached[0], cached[1]
+                raise
+            self.snapshot_captures += 1
+            self.snapshot_cache = (data, f'"c{self.snapshot_captures}"', time.time())
+            return data, self.snapshot_cache[1]
+
+    def capture_video(
+        self,
+        duration: int,
+        media_dir: Path,
+        on_started: Optional[Callable[[Path], None]] = None,
+    ) -> Optional[Path]:
+        """Record ``duration`` seconds; returns an .mp4, or raw .h264 the caller must remux.
+
+        ``on_started`` is called with the output path once the encoder is running.
+        """
+        if not self.picamera_available or not self.backend.supports_recording:
             print("Camera not available for recording")
             return None
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        video_path = media_dir / f"recording_{timestamp}.h264"
-        mp4_path = video_path.with_suffix(".mp4")
+        video_path = media_dir / f"recording_{timestamp}{self.backend.recording_suffix}"
 
-        picam = self.create_recording_camera()
-        if picam is None:
-            print("Camera unavailable for recording session")
+        # The H264 encoder runs alongside the stream and motion on the same camera session.
+        if not self.broker.run(PRIORITY_RECORD, self.backend.start_h264, video_path):
             return None
-
         try:
-            encoder = H264Encoder()
-            picam.start_recording(encoder, str(video_path))
-            print(f"Recording started: {video_path}")
+            if on_started is not None:
+                on_started(video_path)
             time.sleep(duration)
-            picam.stop_recording()
-            picam.stop()
-            try:
-                picam.close()
-            except Exception:
-                pass
-            print(f"Recording stopped: {video_path}")
-        except Exception as exc:
-            print(f"Recording capture error: {exc}")
-            return None
         finally:
-            self.picam = None
-
-        if shutil.which("ffmpeg"):
-            try:
-                subprocess.run(
-                    ["ffmpeg", "-i", str(video_path), "-c:v", "copy", str(mp4_path)],
-                    check=True,
-                    capture_output=True,
-                    text=True,
-                )
-                print(f"FFmpeg conversion successful: {mp4_path}")
-                video_path.unlink()
-                final_path = mp4_path
-            except Exception as convert_err:
-                print(f"FFmpeg conversion error: {convert_err}")
-                final_path = video_path
-        else:
-            print("FFmpeg not found; keeping raw h264 recording")
-            final_path = video_path
+            self.broker.run(PRIORITY_RECORD, self.backend.stop_h264)
+            print(f"Recording stopped: {video_path}")
 
-        if not final_path.exists():
-            print(f"ERROR: Video file not found: {final_path}")
+        if not video_path.exists():
+            print(f"ERROR: Video file not found: {video_path}")
             return None
 
-        print(f"Video saved successfully: {final_path}, size: {final_path.stat().st_size} bytes")
-        return final_path
+        print(f"Video captured: {video_path}, size: {video_path.stat().st_size} bytes")
+        return video_path
 
     def _ensure_stream_camera(self) -> bool:
-        if self.picam is not None:
-            return True
-        if not self.picamera_available or Picamera2 is None:
-            return False
-        try:
-            self.picam = Picamera2()
-            config = self.picam.create_video_configuration(main={"size": (640, 480)})
-            self.picam.configure(config)
-            self.picam.start()
-            return True
-        except Exception as exc:
-            print(f"Stream: Camera initialization failed: {exc}")
-            self.picam = None
+        if not self.picamera_available:
             return False
+        return self.backend.open()
 
     def _ensure_stream_camera_with_retry(self, attempts: int = 3, base_delay: float = 0.5) -> bool:
         for attempt in range(attempts):
@@ -217,99 +302,223 @@ class CameraService:
             time.sleep(base_delay * (attempt + 1))
         return False
 
-    def stream_response(self) -> StreamingResponse:
-        boundary = "frame"
+    def _resume_stream_encoder(self) -> None:
+        self.backend.start_mjpeg(self._on_stream_frame)
+
+    def _start_stream_session(self) -> bool:
+        if not self.picamera_available:
+            return False
+        return self.broker.run(PRIORITY_STREAM, self._start_stream_session_locked)
+
+    def _start_stream_session_locked(self) -> bool:
+        if not self._ensure_stream_camera_with_retry():
+            return False
+        if not self.backend.start_mjpeg(self._on_stream_frame):
+            self.close_camera()
+            return False
 
-        def frame_generator():
-            self.stream_active = False
-            self.stream_stop_requested = False
+        self.broker.register_lease(
+            CameraLease("stream", PRIORITY_STREAM, pause=self.backend.stop_mjpeg, resume=self._resume_stream_encoder)
+        )
+        self.stream_active = True
+        self.last_stream_start_ts = time.time()
+        return True
+
+    def _stop_stream_session(self) -> None:
+        # The camera stays open in preview mode so the next viewer, still or recording starts in milliseconds.
+        self.broker.release_lease("stream")
+        self.stream_active = False
+        self.broker.run(PRIORITY_STREAM, self.backend.stop_mjpeg)
+
+    def _on_stream_frame(self, frame) -> None:
+        self.stream_hub.publish(frame)
+        self.latest_stream_frame_ts = time.time()
+
+    @staticmethod
+    def _part(frame: bytes) -> bytes:
+        return MJPEG_PART_HEADER + frame + MJPEG_PART_TRAILER
+
+    def _degraded_placeholder(self) -> bytes:
+        state = PLACEHOLDER_RECORDING if self.is_recording() else PLACEHOLDER_CAMERA_UNAVAILABLE
+        return self.placeholder_frame(state, timestamp=True)
+
+    def _stream_debounced(self) -> bool:
+        return not self.stream_hub.is_running and time.time() - self.last_stream_start_ts < self.stream_debounce_sec
+
+    def _stream_stale(self, subscriber, joined_ts: float) -> bool:
+        now = time.time()
+        if (now - joined_ts) <= self.stream_warmup_sec:
+            return False
+        last_ts = subscriber.last_frame_ts or joined_ts
+        if (now - last_ts) > self.stream_stale_sec:
+            print("Stream stale: closing viewer to restore motion")
+            return True
+        return False
+
+    def _profile_reader(self, profile: Optional[StreamProfile], subscriber):
+        """Return (variant, reader): the shared variant for ``profile``, or the source stream itself."""
+        if profile is None:
+            return None, subscriber
+        joined = self.stream_profiles.subscribe(profile)
+        if joined is None:
+            print(f"[PiCam] Stream profile limit reached; serving {profile.key} the source stream")
+            return None, subscriber
+        return joined
+
+    def _sync_frame_generator(self, profile: Optional[StreamProfile] = None):
+        if self._stream_debounced():
+            yield self._part(self.placeholder_frame(PLACEHOLDER_DEBOUNCED))
+            return
 
-            if time.time() - self.last_stream_start_ts < self.stream_debounce_sec:
-                frame = self.placeholder_frame()
-                yield (b"--%b\r\nContent-Type: image/jpeg\r\n\r\n" % boundary.encode()) + frame + b"\r\n"
+        if not self.picamera_available:
+            while True:
+                yield self._part(self.placeholder_frame(PLACEHOLDER_NO_PICAMERA, timestamp=True))
+                time.sleep(0.1)
+
+        subscriber = self.stream_hub.subscribe()
+        variant = None
+        try:
+            if not self.stream_hub.is_running:
+                for _ in range(100):
+                    if subscriber.closed:
+                        return
+                    yield self._part(self.placeholder_frame(PLACEHOLDER_CAMERA_UNAVAILABLE, timestamp=True))
+                    time.sleep(0.5)
                 return
 
-            if self.is_recording():
-                while self.is_recording():
-                    frame = self.placeholder_frame()
-                    yield (b"--%b\r\nContent-Type: image/jpeg\r\n\r\n" % boundary.encode()) + frame + b"\r\n"
+            variant, reader = self._profile_reader(profile, subscriber)
+            joined_ts = time.time()
+            while not subscriber.closed and not reader.closed:
+                if not self.stream_hub.ensure_running():
+                    yield self._part(self._degraded_placeholder())
                     time.sleep(0.5)
+                    continue
+
+                view = reader.next_frame(timeout=1.0)
+                if view is not None:
+                    yield MJPEG_PART_HEADER
+                    yield view.data
+                    yield MJPEG_PART_TRAILER
+
+                if self._stream_stale(reader, joined_ts):
+                    break
+        finally:
+            if variant is not None:
+                self.stream_profiles.unsubscribe(variant, reader)
+            self.stream_hub.unsubscribe(subscriber)
+
+    async def _async_frame_generator(self, profile: Optional[StreamProfile] = None):
+        if self._stream_debounced():
+            yield self._part(self.placeholder_frame(PLACEHOLDER_DEBOUNCED))
+            return
+
+        if not self.picamera_available:
+            while True:
+                yield self._part(self.placeholder_frame(PLACEHOLDER_NO_PICAMERA, timestamp=True))
+                await asyncio.sleep(0.1)
+
+        # Opening the camera can take seconds, so only that step goes to a worker thread.
+        subscriber = await run_in_threadpool(self.stream_hub.subscribe)
+        variant = None
+        try:
+            if not self.stream_hub.is_running:
+                for _ in range(100):
+                    if subscriber.closed:
+                        return
+                    yield self._part(self.placeholder_frame(PLACEHOLDER_CAMERA_UNAVAILABLE, timestamp=True))
+                    await asyncio.sleep(0.5)
+                return
+
+            variant, reader = self._profile_reader(profile, subscriber)
+            joined_ts = time.time()
+            while not subscriber.closed and not reader.closed:
+                if not self.stream_hub.is_running and not await run_in_threadpool(self.stream_hub.ensure_running):
+                    yield self._part(self._degraded_placeholder())
+                    await asyncio.sleep(0.5)
+                    continue
+
+                view = await reader.next_frame_async(timeout=1.0)
+                if view is not None:
+                    yield MJPEG_PART_HEADER
+                    yield view.data
+                    yield MJPEG_PART_TRAILER
+
+                if self._stream_stale(reader, joined_ts):
+                    break
+        finally:
+            # Client disconnects arrive as cancellation; shield so the last viewer still closes the camera.
+            if variant is not None:
+                self.stream_profiles.unsubscribe(variant, reader)
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self.stream_hub.unsubscribe, subscriber)
+
+    def stream_response(
+        self,
+        width: Optional[int] = None,
+        fps: Optional[float] = None,
+        quality: Optional[int] = None,
+    ) -> StreamingResponse:
+        profile = self.stream_profiles.normalize(width, fps, quality)
+        if self.stream_async:
+            generator = self._async_frame_generator(profile)
+        else:
+            generator = self._sync_frame_generator(profile)
+        return StreamingResponse(generator, media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}")
+
+    async def stream_websocket(
+        self,
+        websocket,
+        width: Optional[int] = None,
+        fps: Optional[float] = None,
+        quality: Optional[int] = None,
+        window: int = 2,
+    ) -> None:
+        """Push frames to a WebSocket viewer with at most ``window`` unacknowledged frames in flight."""
+        await websocket.accept()
+        if not self.picamera_available:
+            await websocket.close(code=1011, reason="Camera not available")
+            return
+
+        client = WebSocketStreamClient(websocket, window=window)
+        self.ws_clients[client.id] = client
+        acks = asyncio.create_task(client.receive_acks())
+        subscriber = await run_in_threadpool(self.stream_hub.subscribe)
+        variant = None
+        try:
+            variant, reader = self._profile_reader(self.stream_profiles.normalize(width, fps, quality), subscriber)
+            while not client.closed and not subscriber.closed and not reader.closed:
+                if not self.stream_hub.is_running and not await run_in_threadpool(self.stream_hub.ensure_running):
+                    await asyncio.sleep(0.5)
+                    continue
+                if client.stalled:
+                    print(f"[PiCam] WebSocket viewer {client.id}: no acks for {client.ack_timeout}s, closing")
+                    break
+                if not await client.wait_for_window(timeout=1.0):
+                    continue
+                view = await reader.next_frame_async(timeout=1.0)
+                if view is not None:
+                    await client.offer(view.seq, view.timestamp, view.data)
+                    # offer() copied the frame; don't keep its slot pinned while waiting for acks.
+                    reader.release()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            acks.cancel()
+            self.ws_clients.pop(client.id, None)
+            if variant is not None:
+                self.stream_profiles.unsubscribe(variant, reader)
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self.stream_hub.unsubscribe, subscriber)
+            try:
+                await websocket.close()
+            except RuntimeError:
+                pass
 
-            if self.picamera_available and MJPEGEncoder is not None:
-                self.close_camera()
-                time.sleep(0.5)
-
-                if not self._ensure_stream_camera_with_retry():
-                    for _ in range(100):
-                        frame = self.placeholder_frame()
-                        yield (b"--%b\r\nContent-Type: image/jpeg\r\n\r\n" % boundary.encode()) + frame + b"\r\n"
-                        time.sleep(0.5)
-                    return
-
-                encoder = MJPEGEncoder()
-                output = io.BytesIO()
-
-                class _StreamOutput(FileOutput):
-                    def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=None):
-                        output.seek(0)
-                        output.write(frame)
-                        output.truncate()
-
-                stream_output = _StreamOutput()
-                if not self._ensure_stream_camera_with_retry():
-                    while True:
-                        frame = self.placeholder_frame()
-                        yield (b"--%b\r\nContent-Type: image/jpeg\r\n\r\n" % boundary.encode()) + frame + b"\r\n"
-                        time.sleep(0.5)
-
-                self.picam.start_recording(encoder, stream_output)
-                self.stream_active = True
-                self.last_stream_start_ts = time.time()
-                try:
-                    while True:
-                        if self.stream_stop_requested:
-                            break
-                        if self.picam is None and not self._ensure_stream_camera_with_retry():
-                            frame = self.placeholder_frame()
-                            yield (b"--%b\r\nContent-Type: image/jpeg\r\n\r\n" % boundary.encode()) + frame + b"\r\n"
-                            time.sleep(0.5)
-                            continue
-
-                        if self.is_recording():
-                            if self.picam:
-                                self.picam.stop_recording()
-                            while self.is_recording():
-                                frame = self.placeholder_frame()
-                                yield (b"--%b\r\nContent-Type: image/jpeg\r\n\r\n" % boundary.encode()) + frame + b"\r\n"
-                                time.sleep(0.5)
-                            if not self._ensure_stream_camera_with_retry():
-                                continue
-                            self.picam.start_recording(encoder, stream_output)
-
-                        frame = output.getvalue()
-                        if frame:
-                            self._update_latest_stream_frame(frame)
-                            yield (b"--%b\r\nContent-Type: image/jpeg\r\n\r\n" % boundary.encode()) + frame + b"\r\n"
-
-                        if self.latest_stream_frame_ts and (time.time() - self.last_stream_start_ts) > self.stream_warmup_sec:
-                            if (time.time() - self.latest_stream_frame_ts) > self.stream_stale_sec:
-                                print("Stream stale: closing camera to restore motion")
-                                break
-                        time.sleep(0.03)
-                finally:
-                    self.stream_active = False
-                    self.stream_stop_requested = False
-                    self.close_camera()
-            else:
-                while True:
-                    frame = self.placeholder_frame()
-                    yield (b"--%b\r\nContent-Type: image/jpeg\r\n\r\n" % boundary.encode()) + frame + b"\r\n"
-                    time.sleep(0.1)
-
-        return StreamingResponse(frame_generator(), media_type=f"multipart/x-mixed-replace; boundary={boundary}")
+    def ws_stats(self) -> list[dict]:
+        return [client.stats() for client in list(self.ws_clients.values())]
 
     def stop_stream(self) -> dict:
-        self.stream_stop_requested = True
+        self.stream_hub.close_all()
+        self.stream_profiles.close_all()
         self.stream_active = False
-        self.close_camera()
         return {"status": "stopped"}
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+MODE_CLOSED = "closed"
+MODE_PREVIEW = "preview"
+MODE_STREAM = "stream"
+MODE_STILL = "still"
+MODE_RECORD = "record"
+
+
+class CameraSession:
+    """Mode bookkeeping for a camera that stays open between consumers.
+
+    The backend wraps every open/close, encoder start/stop and still capture in
+    ``switching``; the session works out the resulting mode via ``resolve_mode``
+    and records the transition and how long it took.
+    """
+
+    def __init__(self, resolve_mode: Callable[[], str], history: int = 100) -> None:
+        self.resolve_mode = resolve_mode
+        self.lock = threading.Lock()
+        self.mode = MODE_CLOSED
+        self.transitions: Counter[str] = Counter()
+        self.switch_count = 0
+        self.opens = 0
+        self.latencies_ms: deque[float] = deque(maxlen=history)
+        self.last_switch_ms = 0.0
+
+    def _record(self, mode: str, elapsed_ms: Optional[float]) -> None:
+        with self.lock:
+            previous = self.mode
+            if mode == previous:
+                return
+            if previous == MODE_CLOSED:
+                self.opens += 1
+            self.mode = mode
+            self.transitions[f"{previous}->{mode}"] += 1
+            self.switch_count += 1
+            if elapsed_ms is not None:
+                self.latencies_ms.append(elapsed_ms)
+                self.last_switch_ms = elapsed_ms
+
+    @contextmanager
+    def switching(self, target: str = "") -> Iterator[None]:
+        """Time the wrapped operation; ``target`` names a transient mode (e.g. a still) to record too."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if target:
+                self._record(target, elapsed_ms)
+            self._record(self.resolve_mode(), None if target else elapsed_ms)
+
+    def stats(self) -> dict:
+        with self.lock:
+            latencies = list(self.latencies_ms)
+            return {
+                "mode": self.mode,
+                "opens": self.opens,
+                "switch_count": self.switch_count,
+                "transitions": dict(self.transitions),
+                "last_switch_ms": round(self.last_switch_ms, 2),
+                "avg_switch_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+                "max_switch_ms": round(max(latencies), 2) if latencies else 0.0,
+            }
@@ -0,0 +1,203 @@
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional
+
+
+class MotionClipBuffer:
+    """In-memory circular buffer of encoded H264 packets for pre-event clips.
+
+    Packets from a continuously running encoder are kept for roughly the last
+    ``pre_seconds`` (always starting on a keyframe) and never exceed
+    ``max_bytes``. ``trigger`` writes the buffered pre-roll to disk and keeps
+    appending live packets until ``post_seconds`` after the last trigger.
+    Disk writes happen on a per-clip writer thread, so a slow SD card never
+    stalls the encoder callback; ``on_clip_ready(path, fps)`` gets the packet
+    rate measured over the clip. Packets waiting for the writer are held to
+    ``max_bytes`` as well: past that, live packets are skipped up to the next
+    keyframe that fits.
+    """
+
+    def __init__(
+        self,
+        pre_seconds: float,
+        post_seconds: float,
+        max_bytes: int,
+        on_clip_ready: Optional[Callable[[Path, Optional[float]], None]] = None,
+    ) -> None:
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_bytes = max_bytes
+        self.on_clip_ready = on_clip_ready
+
+        self.lock = threading.Lock()
+        self.packets: deque[tuple[float, bool, bytes]] = deque()
+        self.buffered_bytes = 0
+        self.waiting_for_keyframe = True
+
+        self.clip_path: Optional[Path] = None
+        self.clip_queue: Optional[queue.Queue] = None
+        self.clip_deadline = 0.0
+        self.clip_first_ts = 0.0
+        self.clip_last_ts = 0.0
+        self.clip_packets = 0
+        self.clip_pending_bytes = 0
+        self.clip_skipping = False
+        self.clips_written = 0
+        self.clip_packets_skipped = 0
+        self.packets_dropped = 0
+
+    def _drop_gop_locked(self) -> None:
+        """Drop the oldest packet and everything up to the next keyframe."""
+        if not self.packets:
+            return
+        _, _, data = self.packets.popleft()
+        self.buffered_bytes -= len(data)
+        self.packets_dropped += 1
+        while self.packets and not self.packets[0][1]:
+            _, _, data = self.packets.popleft()
+            self.buffered_bytes -= len(data)
+            self.packets_dropped += 1
+        if not self.packets:
+            self.waiting_for_keyframe = True
+
+    def _second_keyframe_ts_locked(self) -> Optional[float]:
+        for index, (ts, keyframe, _) in enumerate(self.packets):
+            if index and keyframe:
+                return ts
+        return None
+
+    def _trim_locked(self, now: float) -> None:
+        while self.buffered_bytes > self.max_bytes:
+            self._drop_gop_locked()
+        cutoff = now - self.pre_seconds
+        while True:
+            next_keyframe_ts = self._second_keyframe_ts_locked()
+            if next_keyframe_ts is None or next_keyframe_ts > cutoff:
+                break
+            self._drop_gop_locked()
+
+    def add_packet(self, data: bytes, keyframe: bool, timestamp: Optional[float] = None) -> None:
+        now = timestamp if timestamp is not None else time.monotonic()
+        packet = bytes(data)
+        with self.lock:
+            if self.clip_queue is not None:
+                self._queue_clip_packet_locked(packet, keyframe, now)
+                if now >= self.clip_deadline:
+                    self._finish_clip_locked()
+
+            if self.waiting_for_keyframe and not keyframe:
+                return
+            self.waiting_for_keyframe = False
+            if len(packet) > self.max_bytes:
+                self.packets.clear()
+                self.buffered_bytes = 0
+                self.waiting_for_keyframe = True
+                return
+            self.packets.append((now, keyframe, packet))
+            self.buffered_bytes += len(packet)
+            self._trim_locked(now)
+
+    def _queue_clip_packet_locked(self, packet: bytes, keyframe: bool, now: float) -> None:
+        if self.clip_pending_bytes + len(packet) > self.max_bytes:
+            if not self.clip_skipping:
+                print(f"[PiCam] Motion clip writer behind ({self.clip_pending_bytes} bytes queued), skipping to the next keyframe")
+            self.clip_skipping = True
+        elif self.clip_skipping and keyframe:
+            self.clip_skipping = False
+        if self.clip_skipping:
+            self.clip_packets_skipped += 1
+            return
+        self.clip_queue.put(packet)
+        self.clip_pending_bytes += len(packet)
+        self.clip_last_ts = now
+        self.clip_packets += 1
+
+    def _finish_clip_locked(self) -> None:
+        """Hand the end-of-clip marker and measured frame rate to the writer thread."""
+        span = self.clip_last_ts - self.clip_first_ts
+        fps = (self.clip_packets - 1) / span if self.clip_packets > 1 and span > 0 else None
+        self.clip_queue.put((None, fps))
+        self.clip_queue = None
+        self.clip_path = None
+        self.clip_skipping = False
+
+    def _write_clip(self, path: Path, packets: queue.Queue) -> None:
+        fps = None
+        failed = False
+        try:
+            handle = open(path, "wb")
+        except OSError as exc:
+            print(f"[PiCam] Motion clip write failed for {path.name}: {exc}")
+            handle, failed = None, True
+        while True:
+            packet = packets.get()
+            if isinstance(packet, tuple):
+                fps = packet[1]
+                break
+            if handle is not None:
+                try:
+                    handle.write(packet)
+                except OSError as exc:
+                    print(f"[PiCam] Motion clip write failed for {path.name}: {exc}")
+                    handle.close()
+                    handle, failed = None, True
+            # Keep draining after a failure so the queued bytes are released from the budget.
+            with self.lock:
+                self.clip_pending_bytes -= len(packet)
+        if handle is not None:
+            handle.close()
+        if failed:
+            return
+        with self.lock:
+            self.clips_written += 1
+        if self.on_clip_ready is not None:
+            self.on_clip_ready(path, fps)
+
+    def trigger(self, path: Path, now: Optional[float] = None) -> bool:
+        """Start a clip at ``path`` (or extend the active one). Returns True if a new clip began."""
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            self.clip_deadline = now + self.post_seconds
+            if self.clip_queue is not None:
+                return False
+            self.clip_queue = queue.Queue()
+            self.clip_path = path
+            for _, _, data in self.packets:
+                self.clip_queue.put(data)
+                self.clip_pending_bytes += len(data)
+            self.clip_packets = len(self.packets)
+            self.clip_first_ts = self.packets[0][0] if self.packets else now
+            self.clip_last_ts = self.packets[-1][0] if self.packets else now
+            threading.Thread(target=self._write_clip, args=(path, self.clip_queue), daemon=True).start()
+            return True
+
+    def close_clip(self) -> None:
+        """Finish the active clip early, e.g. when the encoder feeding the buffer stops."""
+        with self.lock:
+            if self.clip_queue is not None:
+                self._finish_clip_locked()
+            self.packets.clear()
+            self.buffered_bytes = 0
+            self.waiting_for_keyframe = True
+
+    @property
+    def active(self) -> bool:
+        return self.clip_queue is not None
+
+    def stats(self) -> dict:
+        with self.lock:
+            span = self.packets[-1][0] - self.packets[0][0] if len(self.packets) > 1 else 0.0
+            return {
+                "buffered_bytes": self.buffered_bytes,
+                "max_bytes": self.max_bytes,
+                "buffered_seconds": round(span, 2),
+                "packets": len(self.packets),
+                "packets_dropped": self.packets_dropped,
+                "clip_active": self.clip_queue is not None,
+                "clips_written": self.clips_written,
+                "clip_pending_bytes": self.clip_pending_bytes,
+                "clip_packets_skipped": self.clip_packets_skipped,
+            }
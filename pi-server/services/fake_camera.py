@@ -0,0 +1,145 @@
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class FakeEncoder:
+    """Stand-in for picamera2's MJPEGEncoder/H264Encoder; FakePicamera2 ignores its settings."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.args = args
+        self.kwargs = kwargs
+
+
+class FakePicamera2:
+    """Minimal Picamera2 look-alike for running the camera pipeline off-Pi.
+
+    Produces a synthetic scene (a square sweeping across a gradient) for the
+    main RGB888 stream and a YUV420 lores stream, and runs any number of
+    encoders at once, feeding JPEG frames to their outputs so /stream,
+    recording and motion detection work without hardware.
+    """
+
+    def __init__(self, fps: float = 15.0) -> None:
+        self.fps = fps
+        self.config: Optional[dict] = None
+        self.started = False
+        self.closed = False
+        self.frame_index = 0
+        self.configure_calls = 0
+        self.encoders: dict[int, tuple[threading.Thread, threading.Event]] = {}
+
+    def create_video_configuration(self, main: Optional[dict] = None, lores: Optional[dict] = None, **kwargs) -> dict:
+        return {
+            "main": {"size": (640, 480), "format": "RGB888", **(main or {})},
+            "lores": dict(lores) if lores else None,
+            **kwargs,
+        }
+
+    def create_still_configuration(self, main: Optional[dict] = None, lores: Optional[dict] = None, **kwargs) -> dict:
+        return self.create_video_configuration(main=main, lores=lores, **kwargs)
+
+    def configure(self, config: dict) -> None:
+        self.config = config
+        self.configure_calls += 1
+
+    def start(self) -> None:
+        if self.config is None:
+            self.configure(self.create_video_configuration())
+        self.started = True
+
+    def stop(self) -> None:
+        self.started = False
+
+    def close(self) -> None:
+        self.stop_recording()
+        self.started = False
+        self.closed = True
+
+    def _scene(self, size: tuple[int, int]) -> np.ndarray:
+        width, height = size
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        frame[:, :, 1] = np.linspace(30, 90, width, dtype=np.uint8)[None, :]
+        box = max(8, width // 8)
+        x = (self.frame_index * max(1, width // 40)) % max(1, width - box)
+        y = (height - box) // 2
+        frame[y:y + box, x:x + box] = 230
+        return frame
+
+    def capture_array(self, name: str = "main") -> np.ndarray:
+        if not self.started:
+            raise RuntimeError("Camera not started")
+        self.frame_index += 1
+        stream = (self.config or {}).get(name)
+        if not stream:
+            raise RuntimeError(f"Stream {name!r} not configured")
+        rgb = self._scene(tuple(stream["size"]))
+        if stream.get("format") == "YUV420":
+            return cv2.cvtColor(rgb, cv2.COLOR_RGB2YUV_I420)
+        return rgb
+
+    def capture_jpeg(self, name: str = "main") -> bytes:
+        frame = self.capture_array(name)
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+        else:
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        ok, encoded = cv2.imencode(".jpg", frame)
+        if not ok:
+            raise RuntimeError("JPEG encode failed")
+        return encoded.tobytes()
+
+    def capture_file(self, path: str) -> None:
+        Path(path).write_bytes(self.capture_jpeg())
+
+    def switch_mode_and_capture_file(self, config: dict, path: str, **kwargs) -> None:
+        previous = self.config
+        self.configure(config)
+        try:
+            self.capture_file(path)
+        finally:
+            self.configure(previous)
+
+    def _emit_frames(self, name: str, output, stop: threading.Event) -> None:
+        interval = 1.0 / max(1.0, self.fps)
+        while not stop.wait(interval):
+            try:
+                frame = self.capture_jpeg(name)
+            except RuntimeError:
+                continue
+            if hasattr(output, "outputframe"):
+                output.outputframe(frame, True, time.time())
+            else:
+                with open(output, "ab") as handle:
+                    handle.write(frame)
+
+    def start_encoder(self, encoder, output, name: str = "main", **kwargs) -> None:
+        self.stop_encoder(encoder)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._emit_frames, args=(name, output, stop), daemon=True)
+        self.encoders[id(encoder)] = (thread, stop)
+        thread.start()
+
+    def stop_encoder(self, encoders=None) -> None:
+        if encoders is None:
+            targets = list(self.encoders)
+        else:
+            targets = [id(encoder) for encoder in (encoders if isinstance(encoders, (list, tuple)) else [encoders])]
+        for key in targets:
+            entry = self.encoders.pop(key, None)
+            if entry is None:
+                continue
+            thread, stop = entry
+            stop.set()
+            thread.join(timeout=2.0)
+
+    def start_recording(self, encoder, output, *args, **kwargs) -> None:
+        self.start()
+        self.start_encoder(encoder, output)
+
+    def stop_recording(self) -> None:
+        self.stop_encoder()
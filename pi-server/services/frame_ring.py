@@ -0,0 +1,181 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+MJPEG_BOUNDARY = "frame"
+MJPEG_PART_HEADER = b"--%b\r\nContent-Type: image/jpeg\r\n\r\n" % MJPEG_BOUNDARY.encode()
+MJPEG_PART_TRAILER = b"\r\n"
+
+
+@dataclass
+class FrameView:
+    seq: int
+    timestamp: float
+    data: memoryview
+
+
+class _Slot:
+    __slots__ = ("buffer", "length", "seq", "timestamp", "pins")
+
+    def __init__(self, capacity: int) -> None:
+        self.buffer = bytearray(capacity)
+        self.length = 0
+        self.seq = 0
+        self.timestamp = 0.0
+        self.pins = 0
+
+
+class FrameRing:
+    """Fixed ring of preallocated slots holding the most recent encoded frames.
+
+    The writer copies each frame into the next slot exactly once; readers get a
+    memoryview into the slot without copying. An unpinned view stays valid
+    until the writer laps the ring (``size`` frames later), which
+    ``is_current`` reports. A pinned view (``pin=True``, until ``release``)
+    is never overwritten: lapping a pinned slot swaps in a fresh buffer, so a
+    slow sender keeps its bytes intact.
+    """
+
+    def __init__(self, size: int = 16, slot_capacity: int = 128 * 1024) -> None:
+        self.size = max(2, size)
+        self.slots = [_Slot(slot_capacity) for _ in range(self.size)]
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.async_waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = set()
+        self.seq = 0
+        self.slot_grows = 0
+        self.pinned_swaps = 0
+
+    def write(self, frame, timestamp: Optional[float] = None) -> int:
+        length = len(frame)
+        with self.lock:
+            seq = self.seq + 1
+            slot = self.slots[seq % self.size]
+            if length > len(slot.buffer):
+                # Outstanding views pin the old buffer, so swap in a larger one instead of resizing.
+                slot.buffer = bytearray(max(length, len(slot.buffer) * 2))
+                self.slot_grows += 1
+            elif slot.pins:
+                # A reader is still sending this slot's frame; leave its bytes to it.
+                slot.buffer = bytearray(len(slot.buffer))
+                self.pinned_swaps += 1
+            slot.pins = 0
+            slot.seq = 0
+            slot.buffer[:length] = frame
+            slot.length = length
+            slot.timestamp = timestamp if timestamp is not None else time.time()
+            slot.seq = seq
+            self.seq = seq
+            self.condition.notify_all()
+            self._wake_async_locked()
+        return seq
+
+    @staticmethod
+    def _resolve(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+    def _wake_async_locked(self) -> None:
+        waiters = list(self.async_waiters)
+        self.async_waiters.clear()
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(self._resolve, future)
+            except RuntimeError:
+                # Event loop already closed; nothing left to wake.
+                pass
+
+    def _view(self, slot: _Slot, pin: bool = False) -> FrameView:
+        if pin:
+            slot.pins += 1
+        return FrameView(slot.seq, slot.timestamp, memoryview(slot.buffer)[: slot.length])
+
+    def get(self, seq: int, pin: bool = False) -> Optional[FrameView]:
+        if seq <= 0:
+            return None
+        with self.lock:
+            slot = self.slots[seq % self.size]
+            if slot.seq != seq:
+                return None
+            return self._view(slot, pin)
+
+    def release(self, view: FrameView) -> None:
+        """Unpin a view obtained with ``pin=True``."""
+        with self.lock:
+            slot = self.slots[view.seq % self.size]
+            # After a lap the slot has a new buffer and its pins were reset.
+            if slot.seq == view.seq and slot.pins:
+                slot.pins -= 1
+
+    def latest(self) -> Optional[FrameView]:
+        return self.get(self.seq)
+
+    def wait_newer(
+        self,
+        after_seq: int,
+        timeout: float,
+        cancelled: Optional[Callable[[], bool]] = None,
+        pin: bool = False,
+    ) -> Optional[FrameView]:
+        """Block until a frame newer than ``after_seq`` exists and return the newest one.
+
+        Readers that fall behind skip straight to the latest frame rather than
+        replaying a backlog. Returns None on timeout or when ``cancelled()`` is true.
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.seq > after_seq or (cancelled is not None and cancelled()),
+                timeout=timeout,
+            )
+            if self.seq <= after_seq or (cancelled is not None and cancelled()):
+                return None
+            return self._view(self.slots[self.seq % self.size], pin)
+
+    async def wait_newer_async(
+        self,
+        after_seq: int,
+        timeout: float,
+        cancelled: Optional[Callable[[], bool]] = None,
+        pin: bool = False,
+    ) -> Optional[FrameView]:
+        """Awaitable counterpart of ``wait_newer`` that never blocks a thread."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self.lock:
+                if cancelled is not None and cancelled():
+                    return None
+                if self.seq > after_seq:
+                    return self._view(self.slots[self.seq % self.size], pin)
+                waiter = (loop, loop.create_future())
+                self.async_waiters.add(waiter)
+            remaining = deadline - loop.time()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(waiter[1], remaining)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                with self.lock:
+                    self.async_waiters.discard(waiter)
+
+    def wake(self) -> None:
+        with self.condition:
+            self.condition.notify_all()
+            self._wake_async_locked()
+
+    def is_current(self, view: FrameView) -> bool:
+        return self.slots[view.seq % self.size].seq == view.seq
+
+    def stats(self) -> dict:
+        return {
+            "seq": self.seq,
+            "slots": self.size,
+            "slot_bytes": sum(len(slot.buffer) for slot in self.slots),
+            "slot_grows": self.slot_grows,
+            "pinned_swaps": self.pinned_swaps,
+        }
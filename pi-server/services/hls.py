@@ -0,0 +1,236 @@
+import io
+import math
+import struct
+import threading
+import time
+from collections import deque
+from fractions import Fraction
+from typing import Optional
+
+try:
+    import av
+except Exception:  # pragma: no cover - PyAV ships with picamera2 on the Pi
+    av = None  # type: ignore[assignment]
+
+
+HLS_AVAILABLE = av is not None
+
+_FRAGMENTED_MOVFLAGS = "frag_keyframe+empty_moov+default_base_moof"
+_TIMESCALE = 90000
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file object that hands the muxer's output to the segmenter."""
+
+    def __init__(self, on_write) -> None:
+        super().__init__()
+        self.on_write = on_write
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.on_write(data)
+        return len(data)
+
+
+class _Segment:
+    __slots__ = ("seq", "duration", "data", "discontinuity")
+
+    def __init__(self, seq: int, duration: float, data: bytes, discontinuity: bool) -> None:
+        self.seq = seq
+        self.duration = duration
+        self.data = data
+        self.discontinuity = discontinuity
+
+
+class HlsSegmenter:
+    """Packages a live H264 packet stream into fMP4 HLS segments held in memory.
+
+    Packets are muxed once with PyAV into a fragmented MP4 (one fragment per
+    GOP); the muxer output is split on top-level boxes into the init segment
+    (ftyp+moov) and moof+mdat fragments, which are grouped into segments of at
+    least ``target_duration`` seconds. Only the newest ``max_segments``
+    segments (and at most ``max_bytes``) are kept, and every viewer is served
+    the same bytes.
+    """
+
+    def __init__(
+        self,
+        target_duration: float = 2.0,
+        max_segments: int = 6,
+        max_bytes: int = 8 * 1024 * 1024,
+        fps: float = 30,
+    ) -> None:
+        if av is None:
+            raise RuntimeError("PyAV is not installed")
+        self.target_duration = target_duration
+        self.max_segments = max(2, max_segments)
+        self.max_bytes = max_bytes
+        self.fps = fps
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+
+        self.container = None
+        self.stream = None
+        self.pending = bytearray()
+        self.init_parts: list[bytes] = []
+        self.init: Optional[bytes] = None
+        self.open_segment = bytearray()
+        self.open_duration = 0.0
+        self.fragment_start: Optional[float] = None
+        self.first_ts = 0.0
+        self.last_pts = -1
+
+        self.segments: deque[_Segment] = deque()
+        self.buffered_bytes = 0
+        self.next_seq = 0
+        self.generation = 0
+        self.discontinuity_pending = False
+        self.discontinuities_evicted = 0
+        self.segments_evicted = 0
+
+    def _on_write(self, data) -> None:
+        self.pending += data
+        self._parse_boxes_locked()
+
+    def _parse_boxes_locked(self) -> None:
+        offset = 0
+        while len(self.pending) - offset >= 8:
+            size, kind = struct.unpack_from(">I4s", self.pending, offset)
+            header = 8
+            if size == 1:
+                if len(self.pending) - offset < 16:
+                    break
+                size = struct.unpack_from(">Q", self.pending, offset + 8)[0]
+                header = 16
+            if size < header or len(self.pending) - offset < size:
+                break
+            box = bytes(self.pending[offset:offset + size])
+            offset += size
+            if kind in (b"ftyp", b"moov"):
+                self.init_parts.append(box)
+                if kind == b"moov":
+                    self.init = b"".join(self.init_parts)
+                    self.init_parts = []
+            elif kind in (b"moof", b"mdat"):
+                self.open_segment += box
+        del self.pending[:offset]
+
+    def _open_locked(self, now: float) -> None:
+        self.container = av.open(_Sink(self._on_write), "w", format="mp4", options={"movflags": _FRAGMENTED_MOVFLAGS})
+        self.stream = self.container.add_stream("h264", rate=Fraction(self.fps).limit_denominator(1000))
+        self.stream.time_base = Fraction(1, _TIMESCALE)
+        self.first_ts = now
+        self.last_pts = -1
+
+    def add_packet(self, data, keyframe: bool, timestamp: Optional[float] = None) -> None:
+        now = timestamp if timestamp is not None else time.monotonic()
+        with self.lock:
+            if self.container is None:
+                if not keyframe:
+                    return
+                self._open_locked(now)
+            pts = max(int((now - self.first_ts) * _TIMESCALE), self.last_pts + 1)
+            self.last_pts = pts
+            packet = av.Packet(bytes(data))
+            packet.stream = self.stream
+            packet.time_base = self.stream.time_base
+            packet.pts = packet.dts = pts
+            packet.is_keyframe = bool(keyframe)
+            # Muxing a keyframe flushes the previous GOP as one moof+mdat fragment.
+            self.container.mux(packet)
+            if not keyframe:
+                return
+            if self.fragment_start is not None:
+                self.open_duration += now - self.fragment_start
+            self.fragment_start = now
+            if self.open_duration >= self.target_duration and self.open_segment:
+                self._close_segment_locked()
+
+    def _close_segment_locked(self) -> None:
+        segment = _Segment(self.next_seq, self.open_duration, bytes(self.open_segment), self.discontinuity_pending)
+        self.next_seq += 1
+        self.discontinuity_pending = False
+        self.open_segment = bytearray()
+        self.open_duration = 0.0
+        self.segments.append(segment)
+        self.buffered_bytes += len(segment.data)
+        while len(self.segments) > self.max_segments or (self.buffered_bytes > self.max_bytes and len(self.segments) > 1):
+            evicted = self.segments.popleft()
+            self.buffered_bytes -= len(evicted.data)
+            self.segments_evicted += 1
+            if evicted.discontinuity:
+                self.discontinuities_evicted += 1
+        self.ready.notify_all()
+
+    def reset(self) -> None:
+        """Drop the current muxer (e.g. the encoder restarted); the next keyframe starts a new init segment."""
+        with self.lock:
+            if self.container is not None:
+                try:
+                    self.container.close()
+                except Exception:
+                    pass
+                self.generation += 1
+                self.discontinuity_pending = True
+            self.container = None
+            self.stream = None
+            self.pending = bytearray()
+            self.init_parts = []
+            self.init = None
+            self.open_segment = bytearray()
+            self.open_duration = 0.0
+            self.fragment_start = None
+            for segment in self.segments:
+                if segment.discontinuity:
+                    self.discontinuities_evicted += 1
+            self.segments_evicted += len(self.segments)
+            self.segments.clear()
+            self.buffered_bytes = 0
+
+    def wait_ready(self, timeout: float) -> bool:
+        with self.ready:
+            return self.ready.wait_for(lambda: bool(self.segments) and self.init is not None, timeout=timeout)
+
+    def init_segment(self) -> Optional[bytes]:
+        return self.init
+
+    def segment(self, seq: int) -> Optional[bytes]:
+        with self.lock:
+            for segment in self.segments:
+                if segment.seq == seq:
+                    return segment.data
+        return None
+
+    def playlist(self) -> Optional[str]:
+        with self.lock:
+            if self.init is None or not self.segments:
+                return None
+            segments = list(self.segments)
+            lines = [
+                "#EXTM3U",
+                "#EXT-X-VERSION:7",
+                f"#EXT-X-TARGETDURATION:{math.ceil(max(segment.duration for segment in segments))}",
+                f"#EXT-X-MEDIA-SEQUENCE:{segments[0].seq}",
+                f"#EXT-X-DISCONTINUITY-SEQUENCE:{self.discontinuities_evicted}",
+                "#EXT-X-INDEPENDENT-SEGMENTS",
+                f'#EXT-X-MAP:URI="init.mp4?g={self.generation}"',
+            ]
+            for segment in segments:
+                if segment.discontinuity:
+                    lines.append("#EXT-X-DISCONTINUITY")
+                lines.append(f"#EXTINF:{segment.duration:.3f},")
+                lines.append(f"segment_{segment.seq}.m4s")
+            return "\n".join(lines) + "\n"
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "segments": len(self.segments),
+                "buffered_bytes": self.buffered_bytes,
+                "max_bytes": self.max_bytes,
+                "next_seq": self.next_seq,
+                "generation": self.generation,
+                "segments_evicted": self.segments_evicted,
+            }
@@ -0,0 +1,297 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional
+
+
+@dataclass(frozen=True)
+class BlobProperties:
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[float] = None
+
+
+class CacheFill:
+    """A cache copy written from chunks the caller is already streaming to a client.
+
+    ``write`` each chunk in order, then ``finish`` to install the copy or
+    ``abort`` to discard it; a failed write just stops the fill.
+    """
+
+    def __init__(self, cache: "BlobMediaCache", blob_name: str, key: str, props: BlobProperties, part: Path) -> None:
+        self.cache = cache
+        self.blob_name = blob_name
+        self.key = key
+        self.props = props
+        self.part = part
+        self.handle: Optional[BinaryIO] = open(part, "wb")
+
+    def write(self, data: bytes) -> None:
+        if self.handle is None:
+            return
+        try:
+            self.handle.write(data)
+        except OSError as exc:
+            print(f"[PiCam] Media cache fill failed for {self.blob_name}: {exc}")
+            self.abort()
+
+    def finish(self) -> None:
+        if self.handle is None:
+            return
+        self.handle.close()
+        self.handle = None
+        self.cache._install_fill(self.blob_name, self.key, self.props, self.part)
+
+    def abort(self) -> None:
+        if self.handle is None:
+            return
+        self.handle.close()
+        self.handle = None
+        self.part.unlink(missing_ok=True)
+        self.cache._release_fill(self.key)
+
+
+class BlobMediaCache:
+    """Read-through cache in front of blob downloads for ``/azure/media``.
+
+    Blob properties are remembered for ``props_ttl`` seconds. Content is
+    served, in order of preference, from the original file in ``media_dir``
+    (when its size still matches the blob), from a whole-blob copy in
+    ``cache_dir`` (when its size and ETag still match), or from Azure. A
+    full-body Azure miss is teed into the disk copy as it streams
+    (``begin_fill``); a range miss fills it in the background (``fill_async``),
+    so the next request (e.g. a seek while scrubbing) is local. Blobs over
+    ``max_fill_bytes`` are never kept. Disk copies are evicted
+    least-recently-used once they exceed ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int,
+        fetch_properties: Callable[[str], BlobProperties],
+        download: Callable[[str, BinaryIO], None],
+        media_dir: Optional[Path] = None,
+        props_ttl: float = 300.0,
+        max_fill_bytes: Optional[int] = None,
+        max_props: int = 4096,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fetch_properties = fetch_properties
+        self.download = download
+        self.media_dir = media_dir
+        self.props_ttl = props_ttl
+        self.max_fill_bytes = min(max_bytes, max_fill_bytes if max_fill_bytes is not None else max_bytes // 4)
+        self.max_props = max(1, max_props)
+        self.lock = threading.Lock()
+        self.props: OrderedDict[str, tuple[BlobProperties, float]] = OrderedDict()
+        # Blob names of copies filled by this process, so evicting one also drops its properties.
+        self.entry_names: dict[str, str] = {}
+        # key -> (size, etag) of the copy on disk; the etag is kept in a ``.etag`` sidecar across restarts.
+        self.entries: OrderedDict[str, tuple[int, Optional[str]]] = OrderedDict()
+        self.total_bytes = 0
+        self.filling: set[str] = set()
+        # Fills still downloading when their blob was invalidated; their result is discarded.
+        self.stale_fills: set[str] = set()
+        self.counters = {
+            "local_hits": 0,
+            "cache_hits": 0,
+            "misses": 0,
+            "props_hits": 0,
+            "props_misses": 0,
+            "fills": 0,
+            "evictions": 0,
+        }
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Rebuild the LRU order from the previous run, oldest access first.
+        existing = [path for path in self.cache_dir.glob("*.blob")]
+        for path in sorted(existing, key=lambda item: item.stat().st_mtime):
+            try:
+                etag = self._etag_path(path.stem).read_text(encoding="utf-8") or None
+            except OSError:
+                # A copy we cannot validate is worse than a miss.
+                path.unlink(missing_ok=True)
+                continue
+            size = path.stat().st_size
+            self.entries[path.stem] = (size, etag)
+            self.total_bytes += size
+        for path in self.cache_dir.glob("*.part"):
+            path.unlink(missing_ok=True)
+        for path in self.cache_dir.glob("*.etag"):
+            if path.stem not in self.entries:
+                path.unlink(missing_ok=True)
+        self._evict_locked()
+
+    @staticmethod
+    def _key(blob_name: str) -> str:
+        return hashlib.sha1(blob_name.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.blob"
+
+    def _etag_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.etag"
+
+    def _remove_locked(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+        self._etag_path(key).unlink(missing_ok=True)
+
+    def cached_properties(self, blob_name: str) -> Optional[BlobProperties]:
+        """Properties still within their TTL, or None (counted as a miss) if they must be fetched."""
+        with self.lock:
+            cached = self.props.get(blob_name)
+            if cached is not None and time.monotonic() - cached[1] < self.props_ttl:
+                self.counters["props_hits"] += 1
+                return cached[0]
+            self.counters["props_misses"] += 1
+        return None
+
+    def remember_properties(self, blob_name: str, props: BlobProperties) -> None:
+        with self.lock:
+            self.props[blob_name] = (props, time.monotonic())
+            self.props.move_to_end(blob_name)
+            while len(self.props) > self.max_props:
+                self.props.popitem(last=False)
+
+    def properties(self, blob_name: str) -> BlobProperties:
+        props = self.cached_properties(blob_name)
+        if props is None:
+            props = self.fetch_properties(blob_name)
+            self.remember_properties(blob_name, props)
+        return props
+
+    def open(self, blob_name: str, props: BlobProperties) -> Optional[BinaryIO]:
+        """An open local file holding exactly this blob, or None if Azure has to serve it."""
+        if self.media_dir is not None:
+            local = self.media_dir / Path(blob_name).name
+            try:
+                if local.stat().st_size == props.size:
+                    handle = open(local, "rb")
+                    with self.lock:
+                        self.counters["local_hits"] += 1
+                    return handle
+            except OSError:
+                pass
+        key = self._key(blob_name)
+        with self.lock:
+            if self.entries.get(key) == (props.size, props.etag):
+                # Opened under the lock so a concurrent eviction cannot unlink it first.
+                path = self._path(key)
+                handle = open(path, "rb")
+                os.utime(path)
+                self.entries.move_to_end(key)
+                self.counters["cache_hits"] += 1
+                return handle
+            self.counters["misses"] += 1
+        return None
+
+    def _reserve_fill(self, blob_name: str, props: BlobProperties) -> Optional[str]:
+        """The cache key to fill, or None if the blob is too big or already being filled."""
+        if props.size > self.max_fill_bytes:
+            return None
+        key = self._key(blob_name)
+        with self.lock:
+            if key in self.filling:
+                return None
+            self.filling.add(key)
+        return key
+
+    def _release_fill(self, key: str) -> None:
+        with self.lock:
+            self.filling.discard(key)
+            self.stale_fills.discard(key)
+
+    def begin_fill(self, blob_name: str, props: BlobProperties) -> Optional[CacheFill]:
+        """Start a copy fed from a full-body stream, or None if this blob is not to be kept now."""
+        key = self._reserve_fill(blob_name, props)
+        if key is None:
+            return None
+        try:
+            return CacheFill(self, blob_name, key, props, self.cache_dir / f"{key}.part")
+        except OSError as exc:
+            print(f"[PiCam] Media cache fill failed for {blob_name}: {exc}")
+            self._release_fill(key)
+            return None
+
+    def fill_async(self, blob_name: str, props: BlobProperties) -> None:
+        """Download the whole blob into the cache in the background (once per blob)."""
+        key = self._reserve_fill(blob_name, props)
+        if key is not None:
+            threading.Thread(target=self._fill, args=(blob_name, key, props), daemon=True).start()
+
+    def _fill(self, blob_name: str, key: str, props: BlobProperties) -> None:
+        part = self.cache_dir / f"{key}.part"
+        try:
+            with open(part, "wb") as handle:
+                self.download(blob_name, handle)
+        except Exception as exc:
+            part.unlink(missing_ok=True)
+            print(f"[PiCam] Media cache fill failed for {blob_name}: {exc}")
+            self._release_fill(key)
+            return
+        self._install_fill(blob_name, key, props, part)
+
+    def _install_fill(self, blob_name: str, key: str, props: BlobProperties, part: Path) -> None:
+        """Move a completed ``.part`` into place and release the fill reservation."""
+        try:
+            size = part.stat().st_size
+            if size != props.size:
+                raise ValueError(f"expected {props.size} bytes, got {size}")
+            with self.lock:
+                if key in self.stale_fills:
+                    # invalidate() ran mid-download: this copy may predate the new blob.
+                    part.unlink(missing_ok=True)
+                    return
+                self._etag_path(key).write_text(props.etag or "", encoding="utf-8")
+                os.replace(part, self._path(key))
+                previous = self.entries.pop(key, None)
+                self.total_bytes += size - (previous[0] if previous else 0)
+                self.entries[key] = (size, props.etag)
+                self.entry_names[key] = blob_name
+                self.counters["fills"] += 1
+                self._evict_locked()
+        except Exception as exc:
+            part.unlink(missing_ok=True)
+            print(f"[PiCam] Media cache fill failed for {blob_name}: {exc}")
+        finally:
+            self._release_fill(key)
+
+    def _evict_locked(self) -> None:
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, (size, _) = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.counters["evictions"] += 1
+            blob_name = self.entry_names.pop(key, None)
+            if blob_name is not None:
+                self.props.pop(blob_name, None)
+            # Readers that already opened the file keep reading it until they close it.
+            self._remove_locked(key)
+
+    def invalidate(self, blob_name: str) -> None:
+        key = self._key(blob_name)
+        with self.lock:
+            self.props.pop(blob_name, None)
+            if key in self.filling:
+                self.stale_fills.add(key)
+            self.entry_names.pop(key, None)
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[0]
+                self._remove_locked(key)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "max_fill_bytes": self.max_fill_bytes,
+                "properties": len(self.props),
+            }
@@ -7,6 +7,9 @@ import cv2
 import numpy as np
 
 
+MOTION_REFERENCE_SIZE = (640, 480)
+
+
 class MotionService:
     def __init__(
         self,
@@ -17,8 +20,12 @@ class MotionService:
         min_area: int,
         cooldown: int,
         warmup_sec: float,
+        get_gray_frame: Optional[Callable[[], Optional[np.ndarray]]] = None,
+        on_motion: Optional[Callable[[], None]] = None,
     ) -> None:
         self.get_frame_array = get_frame_array
+        self.get_gray_frame = get_gray_frame
+        self.on_motion = on_motion
         self.send_push_notification_sync = send_push_notification_sync
         self.add_notification = add_notification
 
@@ -153,68 +160,84 @@ class MotionService:
         self.add_notification("Motion test - notification sent", "motion")
         return {"status": "sent"}
 
-    def loop(self) -> None:
-        while True:
-            if not self.motion_enabled:
-                time.sleep(0.5)
-                continue
-
-            frame = self.get_frame_array()
-            if frame is None:
-                time.sleep(0.5)
-                continue
-
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (21, 21), 0)
-
-            if self.motion_enabled_since and (time.time() - self.motion_enabled_since) < self.warmup_sec:
-                self.background_frame = gray
-                time.sleep(0.1)
-                continue
-
-            if self.background_frame is None:
-                self.background_frame = gray
-                time.sleep(0.1)
-                continue
-
-            delta = cv2.absdiff(self.background_frame, gray)
-            self.motion_metrics["last_delta_mean"] = float(delta.mean())
-            self.motion_metrics["last_delta_max"] = float(delta.max())
-            thresh = cv2.threshold(delta, self.threshold, 255, cv2.THRESH_BINARY)[1]
-            thresh = cv2.dilate(thresh, None, iterations=2)
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            self.motion_metrics["last_contour_count"] = len(contours)
-            self.motion_metrics["last_contour_area"] = max((cv2.contourArea(contour) for contour in contours), default=0.0)
-            self.motion_metrics["last_frame_ts"] = time.time()
-
-            motion_detected = any(cv2.contourArea(contour) >= self.min_area for contour in contours)
-
-            if motion_detected:
-                self.last_motion_ts = time.time()
-                self.quiet_frame_count = 0
-
-                if not self.motion_event_active:
-                    current_time = time.time()
-                    if self.last_notification_time is None or (current_time - self.last_notification_time) >= self.cooldown:
-                        threading.Thread(
-                            target=self.send_push_notification_sync,
-                            args=(
-                                "Motion Detected",
-                                "RetrosPiCam detected motion. Tap to start recording.",
-                                {"type": "motion_detected"},
-                            ),
-                            daemon=True,
-                        ).start()
-                        self.last_notification_time = current_time
-                        self.add_notification("Motion detected - notification sent", "motion")
-                self.motion_event_active = True
-            else:
-                self.quiet_frame_count += 1
-                if self.quiet_frame_count >= self.quiet_frames_to_rearm:
-                    self.motion_event_active = False
+    def _next_gray_frame(self) -> Optional[np.ndarray]:
+        if self.get_gray_frame is not None:
+            return self.get_gray_frame()
+        frame = self.get_frame_array()
+        if frame is None:
+            return None
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def step(self) -> float:
+        """Run one detection pass and return how long the loop should sleep."""
+        if not self.motion_enabled:
+            return 0.5
+
+        gray = self._next_gray_frame()
+        if gray is None:
+            return 0.5
+
+        # Thresholds are tuned for 640x480; scale them to the analysed resolution (e.g. lores).
+        area_scale = (gray.shape[0] * gray.shape[1]) / float(MOTION_REFERENCE_SIZE[0] * MOTION_REFERENCE_SIZE[1])
+        blur_size = max(3, int(21 * gray.shape[1] / MOTION_REFERENCE_SIZE[0]) | 1)
+        gray = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
+
+        if self.motion_enabled_since and (time.time() - self.motion_enabled_since) < self.warmup_sec:
+            self.background_frame = gray
+            return 0.1
 
+        if self.background_frame is None or self.background_frame.shape != gray.shape:
             self.background_frame = gray
-            time.sleep(0.2)
+            return 0.1
+
+        delta = cv2.absdiff(self.background_frame, gray)
+        self.motion_metrics["last_delta_mean"] = float(delta.mean())
+        self.motion_metrics["last_delta_max"] = float(delta.max())
+        thresh = cv2.threshold(delta, self.threshold, 255, cv2.THRESH_BINARY)[1]
+        thresh = cv2.dilate(thresh, None, iterations=2)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        largest_area = max((cv2.contourArea(contour) for contour in contours), default=0.0) / area_scale
+        self.motion_metrics["last_contour_count"] = len(contours)
+        self.motion_metrics["last_contour_area"] = largest_area
+        self.motion_metrics["last_frame_ts"] = time.time()
+
+        motion_detected = largest_area >= self.min_area
+
+        if motion_detected:
+            self.last_motion_ts = time.time()
+            self.quiet_frame_count = 0
+            if self.on_motion is not None:
+                try:
+                    self.on_motion()
+                except Exception as exc:
+                    print(f"[PiCam] Motion callback failed: {exc}")
+
+            if not self.motion_event_active:
+                current_time = time.time()
+                if self.last_notification_time is None or (current_time - self.last_notification_time) >= self.cooldown:
+                    threading.Thread(
+                        target=self.send_push_notification_sync,
+                        args=(
+                            "Motion Detected",
+                            "RetrosPiCam detected motion. Tap to start recording.",
+                            {"type": "motion_detected"},
+                        ),
+                        daemon=True,
+                    ).start()
+                    self.last_notification_time = current_time
+                    self.add_notification("Motion detected - notification sent", "motion")
+            self.motion_event_active = True
+        else:
+            self.quiet_frame_count += 1
+            if self.quiet_frame_count >= self.quiet_frames_to_rearm:
+                self.motion_event_active = False
+
+        self.background_frame = gray
+        return 0.2
+
+    def loop(self) -> None:
+        while True:
+            time.sleep(self.step())
 
     def start_thread(self) -> None:
         if self.motion_thread and self.motion_thread.is_alive():
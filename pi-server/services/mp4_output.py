@@ -0,0 +1,97 @@
+import threading
+import time
+from fractions import Fraction
+from pathlib import Path
+from typing import Optional
+
+try:
+    import av
+except Exception:  # pragma: no cover - PyAV ships with picamera2 on the Pi
+    av = None  # type: ignore[assignment]
+
+try:
+    from picamera2.outputs import Output
+except Exception:  # pragma: no cover - handled at runtime on Pi
+    Output = object  # type: ignore[assignment,misc]
+
+
+MP4_MUXER_AVAILABLE = av is not None
+
+# Fragmented MP4: each keyframe starts a self-contained fragment, so the file is
+# playable while it is still being written and nothing is rewritten at close.
+FRAGMENTED_MOVFLAGS = "frag_keyframe+empty_moov+default_base_moof"
+
+
+class Mp4Output(Output):
+    """Picamera2 encoder output that muxes H264 packets straight into an MP4 file.
+
+    Packets are remuxed in-process with PyAV as they arrive, so the file is
+    complete (and uploadable) the moment the encoder stops - no raw .h264
+    intermediate and no second FFmpeg pass. Timestamps are the encoder's
+    microsecond frame timestamps; leading packets before the first keyframe
+    are dropped.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fps: float = 30,
+        size: Optional[tuple[int, int]] = None,
+        fragmented: bool = True,
+    ) -> None:
+        if av is None:
+            raise RuntimeError("PyAV is not installed")
+        super().__init__()
+        self.path = Path(path)
+        self.fps = fps
+        self.size = size
+        self.fragmented = fragmented
+        self.lock = threading.Lock()
+        self.container = None
+        self.stream = None
+        self.first_ts: Optional[int] = None
+        self.last_pts = -1
+        self.packets_written = 0
+        self.bytes_written = 0
+
+    def _open_locked(self) -> None:
+        options = {"movflags": FRAGMENTED_MOVFLAGS} if self.fragmented else {}
+        self.container = av.open(str(self.path), "w", format="mp4", options=options)
+        self.stream = self.container.add_stream("h264", rate=Fraction(self.fps).limit_denominator(1000))
+        if self.size is not None:
+            self.stream.width, self.stream.height = self.size
+        self.stream.time_base = Fraction(1, 1_000_000)
+
+    def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=None) -> None:
+        if audio:
+            return
+        ts = int(timestamp) if timestamp is not None else int(time.monotonic() * 1_000_000)
+        with self.lock:
+            if self.container is None:
+                if not keyframe:
+                    return
+                self._open_locked()
+                self.first_ts = ts
+            pts = max(ts - self.first_ts, self.last_pts + 1)
+            self.last_pts = pts
+            out = av.Packet(bytes(frame))
+            out.stream = self.stream
+            out.time_base = self.stream.time_base
+            out.pts = out.dts = pts
+            out.is_keyframe = bool(keyframe)
+            self.container.mux(out)
+            self.packets_written += 1
+            self.bytes_written += len(frame)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        with self.lock:
+            if self.container is not None:
+                self.container.close()
+            self.container = None
+            self.stream = None
+
+    def close(self) -> None:
+        self.stop()
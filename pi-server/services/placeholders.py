@@ -0,0 +1,112 @@
+import io
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+PLACEHOLDER_DEBOUNCED = "debounced"
+PLACEHOLDER_RECORDING = "recording"
+PLACEHOLDER_CAMERA_UNAVAILABLE = "camera_unavailable"
+PLACEHOLDER_NO_PICAMERA = "no_picamera"
+
+PLACEHOLDER_MESSAGES = {
+    PLACEHOLDER_DEBOUNCED: "Stream restarting - reconnect in a moment",
+    PLACEHOLDER_RECORDING: "Recording in progress",
+    PLACEHOLDER_CAMERA_UNAVAILABLE: "Camera unavailable",
+    PLACEHOLDER_NO_PICAMERA: "No Pi camera detected",
+}
+
+
+class PlaceholderCache:
+    """Pre-rendered placeholder frames for every degraded stream state.
+
+    Each state is rendered and JPEG-encoded once; the decoded BGR array is kept
+    alongside for consumers that need pixels. The timestamped variant is
+    re-rendered at most once per second per state and shared by all callers.
+    """
+
+    def __init__(self, size: tuple[int, int] = (640, 480), quality: int = 80) -> None:
+        self.size = size
+        self.quality = quality
+        self.lock = threading.Lock()
+        self.images: dict[str, Image.Image] = {}
+        self.jpegs: dict[str, bytes] = {}
+        self.arrays: dict[str, np.ndarray] = {}
+        self.grays: dict[str, np.ndarray] = {}
+        self.stamped: dict[str, tuple[int, bytes]] = {}
+        self.renders = 0
+
+    def _encode(self, img: Image.Image) -> bytes:
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=self.quality)
+        self.renders += 1
+        return buf.getvalue()
+
+    def _image_locked(self, state: str) -> Image.Image:
+        img = self.images.get(state)
+        if img is None:
+            img = Image.new("RGB", self.size, color=(20, 20, 20))
+            draw = ImageDraw.Draw(img)
+            draw.text((20, 20), "Pi Camera Placeholder", fill=(200, 200, 200))
+            draw.text((20, 44), PLACEHOLDER_MESSAGES.get(state, state), fill=(160, 160, 160))
+            self.images[state] = img
+        return img
+
+    def jpeg(self, state: str, timestamp: bool = False) -> bytes:
+        if timestamp:
+            return self._stamped_jpeg(state)
+        cached = self.jpegs.get(state)
+        if cached is not None:
+            return cached
+        with self.lock:
+            if state not in self.jpegs:
+                self.jpegs[state] = self._encode(self._image_locked(state))
+            return self.jpegs[state]
+
+    def _stamped_jpeg(self, state: str, now: Optional[float] = None) -> bytes:
+        second = int(now if now is not None else time.time())
+        cached = self.stamped.get(state)
+        if cached is not None and cached[0] == second:
+            return cached[1]
+        with self.lock:
+            cached = self.stamped.get(state)
+            if cached is not None and cached[0] == second:
+                return cached[1]
+            img = self._image_locked(state).copy()
+            ImageDraw.Draw(img).text(
+                (20, self.size[1] - 30),
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second)),
+                fill=(200, 200, 200),
+            )
+            jpeg = self._encode(img)
+            self.stamped[state] = (second, jpeg)
+            return jpeg
+
+    def array(self, state: str) -> np.ndarray:
+        cached = self.arrays.get(state)
+        if cached is not None:
+            return cached
+        jpeg = self.jpeg(state)
+        with self.lock:
+            if state not in self.arrays:
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                # Shared between callers, so guard against in-place edits.
+                frame.setflags(write=False)
+                self.arrays[state] = frame
+            return self.arrays[state]
+
+    def gray(self, state: str) -> np.ndarray:
+        cached = self.grays.get(state)
+        if cached is not None:
+            return cached
+        frame = self.array(state)
+        with self.lock:
+            if state not in self.grays:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                gray.setflags(write=False)
+                self.grays[state] = gray
+            return self.grays[state]
@@ -0,0 +1,88 @@
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Optional
+
+
+class ProgressiveUpload:
+    """Stages a file as blob blocks while it is still being written.
+
+    Only valid for append-only files such as the fragmented MP4 recordings
+    written by ``Mp4Output``: a worker polls the file and stages each full
+    ``block_size`` chunk as soon as it exists. ``finish`` stages the tail and
+    commits the block list, so only the last partial block is left to send
+    once capture stops.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        stage_block: Callable[[str, bytes], None],
+        commit: Callable[[list[str]], None],
+        block_size: int = 4 * 1024 * 1024,
+        poll_sec: float = 0.5,
+    ) -> None:
+        self.path = path
+        self.stage_block = stage_block
+        self.commit = commit
+        self.block_size = max(1, block_size)
+        self.poll_sec = poll_sec
+        # Fresh IDs per upload: blocks left over from an aborted attempt are never reused.
+        self.tag = uuid.uuid4().hex[:12]
+        self.block_ids: list[str] = []
+        self.offset = 0
+        self.blocks_during_capture = 0
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "ProgressiveUpload":
+        self.thread.start()
+        return self
+
+    def _stage_next(self, handle, limit: int) -> None:
+        handle.seek(self.offset)
+        data = handle.read(min(self.block_size, limit - self.offset))
+        block_id = f"{self.tag}-{len(self.block_ids):06d}"
+        self.stage_block(block_id, data)
+        self.block_ids.append(block_id)
+        self.offset += len(data)
+
+    def _run(self) -> None:
+        try:
+            while not self.done.wait(self.poll_sec):
+                try:
+                    size = self.path.stat().st_size
+                except FileNotFoundError:
+                    continue
+                if size - self.offset < self.block_size:
+                    continue
+                with open(self.path, "rb") as handle:
+                    while size - self.offset >= self.block_size and not self.done.is_set():
+                        self._stage_next(handle, size)
+                        self.blocks_during_capture += 1
+        except Exception as exc:
+            self.error = exc
+
+    def abort(self) -> None:
+        self.done.set()
+        self.thread.join()
+
+    def finish(self) -> dict:
+        """Stage whatever is left and commit; raises if any block failed to stage."""
+        self.abort()
+        if self.error is not None:
+            raise self.error
+        started = time.perf_counter()
+        size = self.path.stat().st_size
+        with open(self.path, "rb") as handle:
+            while self.offset < size:
+                self._stage_next(handle, size)
+        self.commit(self.block_ids)
+        return {
+            "bytes": size,
+            "blocks": len(self.block_ids),
+            "blocks_during_capture": self.blocks_during_capture,
+            "finish_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
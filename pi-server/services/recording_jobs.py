@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+
+PHASE_QUEUED = "queued"
+PHASE_CAPTURING = "capturing"
+PHASE_REMUXING = "remuxing"
+PHASE_UPLOADING = "uploading"
+PHASE_DONE = "done"
+PHASE_FAILED = "failed"
+
+
+@dataclass
+class RecordingJob:
+    id: str
+    duration: int
+    source: str
+    phase: str = PHASE_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    path: Optional[Path] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "duration": self.duration,
+            "source": self.source,
+            "phase": self.phase,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "filename": self.path.name if self.path else None,
+            "error": self.error,
+        }
+
+
+class RecordingJobQueue:
+    """Queued recording pipeline: capture -> remux -> upload.
+
+    Captures run one at a time on a worker thread. Each finished capture is
+    handed to an asyncio loop that remuxes it in an FFmpeg subprocess and then
+    runs the upload/notify step, so the next capture can start immediately.
+    ``finalize`` returns True when the upload continues in the background; the
+    job then stays ``uploading`` until ``upload_finished`` is called.
+    """
+
+    def __init__(
+        self,
+        capture: Callable[[RecordingJob], Optional[Path]],
+        remux: Callable[[Path], "asyncio.Future"],
+        finalize: Callable[[RecordingJob, Path], Optional[bool]],
+        on_capture_state: Optional[Callable[[Optional[RecordingJob]], None]] = None,
+        max_pending: int = 5,
+        history_size: int = 50,
+    ) -> None:
+        self.capture = capture
+        self.remux = remux
+        self.finalize = finalize
+        self.on_capture_state = on_capture_state
+        self.max_pending = max_pending
+        self.history_size = history_size
+
+        self.jobs: dict[str, RecordingJob] = {}
+        self.pending: "queue.Queue[RecordingJob]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.counter = itertools.count(1)
+        self.capturing: Optional[RecordingJob] = None
+        self.worker: Optional[threading.Thread] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.loop_thread.start()
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._capture_loop, daemon=True)
+            self.worker.start()
+
+    @property
+    def busy(self) -> bool:
+        return self.capturing is not None or not self.pending.empty()
+
+    def submit(self, duration: int, source: str = "api") -> Optional[RecordingJob]:
+        with self.lock:
+            if self.pending.qsize() >= self.max_pending:
+                return None
+            job = RecordingJob(id=f"rec-{int(time.time())}-{next(self.counter)}", duration=duration, source=source)
+            self.jobs[job.id] = job
+            self._prune_locked()
+            self._ensure_started()
+            self.pending.put(job)
+        return job
+
+    def _prune_locked(self) -> None:
+        finished = [job for job in self.jobs.values() if job.phase in (PHASE_DONE, PHASE_FAILED)]
+        excess = len(self.jobs) - self.history_size
+        for job in sorted(finished, key=lambda item: item.created_at)[: max(0, excess)]:
+            self.jobs.pop(job.id, None)
+
+    def get(self, job_id: str) -> Optional[RecordingJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> list[dict]:
+        return [job.to_dict() for job in sorted(self.jobs.values(), key=lambda item: item.created_at, reverse=True)]
+
+    def _fail(self, job: RecordingJob, error: str) -> None:
+        job.phase = PHASE_FAILED
+        job.error = error
+        job.finished_at = time.time()
+
+    def upload_finished(self, job: RecordingJob, error: Optional[str] = None) -> None:
+        if error is not None:
+            self._fail(job, error)
+            return
+        job.phase = PHASE_DONE
+        job.finished_at = time.time()
+
+    def _capture_loop(self) -> None:
+        while True:
+            job = self.pending.get()
+            job.phase = PHASE_CAPTURING
+            job.started_at = time.time()
+            self.capturing = job
+            if self.on_capture_state is not None:
+                self.on_capture_state(job)
+            try:
+                raw_path = self.capture(job)
+            except Exception as exc:
+                print(f"Recording error: {exc}")
+                raw_path = None
+            finally:
+                self.capturing = None
+                if self.on_capture_state is not None:
+                    self.on_capture_state(None)
+
+            if raw_path is None:
+                self._fail(job, "capture failed")
+                continue
+            job.path = raw_path
+            asyncio.run_coroutine_threadsafe(self._post_process(job, raw_path), self.loop)
+
+    async def _post_process(self, job: RecordingJob, raw_path: Path) -> None:
+        try:
+            final_path = raw_path
+            if raw_path.suffix == ".h264":
+                job.phase = PHASE_REMUXING
+                final_path = await self.remux(raw_path)
+                job.path = final_path
+            job.phase = PHASE_UPLOADING
+            if await asyncio.get_running_loop().run_in_executor(None, self.finalize, job, final_path):
+                return
+            self.upload_finished(job)
+        except Exception as exc:
+            print(f"Recording post-processing error: {exc}")
+            self._fail(job, str(exc))
@@ -0,0 +1,144 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from services.frame_ring import FrameRing, FrameView
+
+
+class StreamSubscriber:
+    """One reader of a FrameRing. The returned frame stays pinned until the next call or ``release``."""
+
+    def __init__(self, ring: FrameRing, start_seq: int) -> None:
+        self.ring = ring
+        self.last_seq = start_seq
+        self.view: Optional[FrameView] = None
+        self.closed = False
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.last_frame_ts = 0.0
+
+    def next_frame(self, timeout: float) -> Optional[FrameView]:
+        self.release()
+        return self._advance(self.ring.wait_newer(self.last_seq, timeout, cancelled=lambda: self.closed, pin=True))
+
+    async def next_frame_async(self, timeout: float) -> Optional[FrameView]:
+        self.release()
+        view = await self.ring.wait_newer_async(self.last_seq, timeout, cancelled=lambda: self.closed, pin=True)
+        return self._advance(view)
+
+    def release(self) -> None:
+        view, self.view = self.view, None
+        if view is not None:
+            self.ring.release(view)
+
+    def _advance(self, view: Optional[FrameView]) -> Optional[FrameView]:
+        if view is None:
+            return None
+        if self.closed:
+            self.ring.release(view)
+            return None
+        self.view = view
+        if self.frames_sent:
+            self.frames_skipped += view.seq - self.last_seq - 1
+        self.last_seq = view.seq
+        self.frames_sent += 1
+        self.last_frame_ts = time.time()
+        return view
+
+    def close(self) -> None:
+        self.closed = True
+        self.release()
+        self.ring.wake()
+
+
+class StreamHub:
+    """Fans a single encoder session out to any number of stream subscribers.
+
+    The session is started when the first subscriber joins and stopped when the
+    last one leaves, so concurrent viewers share one camera/encoder.
+    """
+
+    def __init__(
+        self,
+        start_session: Callable[[], bool],
+        stop_session: Callable[[], None],
+        ring_size: int = 16,
+    ) -> None:
+        self.start_session = start_session
+        self.stop_session = stop_session
+        self.ring = FrameRing(size=ring_size)
+
+        self.subscribers: set[StreamSubscriber] = set()
+        self.lock = threading.Lock()
+        self.running = False
+        self.session_starts = 0
+        self.frames_published = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self.running
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self.subscribers)
+
+    def _start_locked(self) -> None:
+        if self.running:
+            return
+        if self.start_session():
+            self.running = True
+            self.session_starts += 1
+
+    def _stop_locked(self) -> None:
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.stop_session()
+        except Exception as exc:
+            print(f"[PiCam] Stream hub: stop failed: {exc}")
+
+    def subscribe(self) -> StreamSubscriber:
+        with self.lock:
+            # Joining a live session gets the current frame immediately; a fresh
+            # session must not replay whatever the previous one left in the ring.
+            start_seq = self.ring.seq - 1 if self.running else self.ring.seq
+            subscriber = StreamSubscriber(self.ring, max(0, start_seq))
+            self.subscribers.add(subscriber)
+            self._start_locked()
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        subscriber.release()
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            if not self.subscribers:
+                self._stop_locked()
+
+    def ensure_running(self) -> bool:
+        with self.lock:
+            if self.subscribers:
+                self._start_locked()
+            return self.running
+
+    def publish(self, frame) -> int:
+        self.frames_published += 1
+        return self.ring.write(frame)
+
+    def close_all(self) -> None:
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.subscribers.clear()
+            self._stop_locked()
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "subscribers": len(self.subscribers),
+            "session_starts": self.session_starts,
+            "frames_published": self.frames_published,
+            "frames_skipped": sum(subscriber.frames_skipped for subscriber in list(self.subscribers)),
+            "ring": self.ring.stats(),
+        }
@@ -0,0 +1,224 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from services.frame_ring import FrameRing
+from services.stream_hub import StreamSubscriber
+from utils import clamp
+
+
+@dataclass(frozen=True)
+class StreamProfile:
+    """Requested output for a /stream client; ``None`` fields keep the source value."""
+
+    width: Optional[int] = None
+    fps: Optional[float] = None
+    quality: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.width or 'src'}w-{self.fps or 'src'}fps-q{self.quality or 'src'}"
+
+    @property
+    def transcodes(self) -> bool:
+        return self.width is not None or self.quality is not None
+
+
+class ProfileVariant:
+    """One shared output of a profile: a worker that re-encodes source frames into its own ring."""
+
+    def __init__(
+        self,
+        profile: StreamProfile,
+        source: FrameRing,
+        source_width: int,
+        default_quality: int,
+        idle_sec: float,
+        on_idle: Callable[["ProfileVariant"], None],
+        ring_size: int = 4,
+    ) -> None:
+        self.profile = profile
+        self.source = source
+        self.source_width = source_width
+        self.default_quality = default_quality
+        self.idle_sec = idle_sec
+        self.on_idle = on_idle
+        self.ring = FrameRing(size=ring_size, slot_capacity=64 * 1024)
+        self.readers: set[StreamSubscriber] = set()
+        self.last_used = time.monotonic()
+        self.stopped = False
+        self.frames_in = 0
+        self.frames_out = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _reduced_flag(self) -> int:
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the target is that small.
+        ratio = self.source_width / max(1, self.profile.width or self.source_width)
+        if ratio >= 8:
+            return cv2.IMREAD_REDUCED_COLOR_8
+        if ratio >= 4:
+            return cv2.IMREAD_REDUCED_COLOR_4
+        if ratio >= 2:
+            return cv2.IMREAD_REDUCED_COLOR_2
+        return cv2.IMREAD_COLOR
+
+    def _transcode(self, jpeg) -> Optional[bytes]:
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), self._reduced_flag())
+        if frame is None:
+            return None
+        width = self.profile.width
+        if width and frame.shape[1] != width:
+            height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        quality = self.profile.quality or self.default_quality
+        ok, out = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return out.tobytes() if ok else None
+
+    def _run(self) -> None:
+        interval = 1.0 / self.profile.fps if self.profile.fps else 0.0
+        last_seq = self.source.seq
+        next_due = 0.0
+        while not self.stopped:
+            view = self.source.wait_newer(last_seq, timeout=1.0, cancelled=lambda: self.stopped)
+            now = time.monotonic()
+            if view is not None:
+                # Consume the frame even when idle so the next wait blocks instead of returning at once.
+                last_seq = view.seq
+            if not self.readers:
+                # Nobody is watching: do no encoding work, and hand back to the manager once idle long enough.
+                if now - self.last_used >= self.idle_sec:
+                    self.on_idle(self)
+                continue
+            if view is None:
+                continue
+            if now < next_due:
+                continue
+            next_due = max(next_due + interval, now) if interval else now
+            self.frames_in += 1
+            try:
+                frame = self._transcode(view.data) if self.profile.transcodes else bytes(view.data)
+            except Exception as exc:
+                print(f"[PiCam] Stream profile {self.profile.key}: transcode failed: {exc}")
+                continue
+            # The slot may have been overwritten while we were copying or encoding; the source frame is then stale.
+            if frame is not None and self.source.is_current(view):
+                self.ring.write(frame, view.timestamp)
+                self.frames_out += 1
+
+    def _subscribe(self) -> StreamSubscriber:
+        reader = StreamSubscriber(self.ring, max(0, self.ring.seq - 1))
+        self.readers.add(reader)
+        self.last_used = time.monotonic()
+        return reader
+
+    def _unsubscribe(self, reader: StreamSubscriber) -> None:
+        reader.release()
+        self.readers.discard(reader)
+        self.last_used = time.monotonic()
+
+    def stop(self) -> None:
+        self.stopped = True
+        self.source.wake()
+        for reader in list(self.readers):
+            reader.close()
+
+
+class StreamProfileManager:
+    """Shares one encoded variant per distinct stream profile across all clients.
+
+    A variant is started on first use and evicted by its own worker once it
+    has had no readers for ``idle_sec``.
+    """
+
+    def __init__(
+        self,
+        source: FrameRing,
+        source_width: int = 640,
+        default_quality: int = 70,
+        idle_sec: float = 30.0,
+        max_variants: int = 4,
+    ) -> None:
+        self.source = source
+        self.source_width = source_width
+        self.default_quality = default_quality
+        self.idle_sec = idle_sec
+        self.max_variants = max_variants
+        self.lock = threading.Lock()
+        self.variants: dict[StreamProfile, ProfileVariant] = {}
+        self.evictions = 0
+
+    def normalize(
+        self,
+        width: Optional[int] = None,
+        fps: Optional[float] = None,
+        quality: Optional[int] = None,
+    ) -> Optional[StreamProfile]:
+        """Clamp a request to supported values; None means the client gets the source stream as-is."""
+        if width is not None:
+            # Even widths only, and never upscale past the source.
+            width = int(clamp(width, 80, self.source_width)) & ~1
+            if width >= self.source_width:
+                width = None
+        if fps is not None:
+            fps = round(float(clamp(fps, 1, 30)), 1)
+        if quality is not None:
+            quality = int(clamp(quality, 10, 95))
+        if width is None and fps is None and quality is None:
+            return None
+        return StreamProfile(width=width, fps=fps, quality=quality)
+
+    def _evict_if_idle(self, variant: ProfileVariant) -> None:
+        with self.lock:
+            if variant.readers or time.monotonic() - variant.last_used < self.idle_sec:
+                return
+            variant.stop()
+            if self.variants.get(variant.profile) is variant:
+                del self.variants[variant.profile]
+                self.evictions += 1
+
+    def subscribe(self, profile: StreamProfile) -> Optional[tuple[ProfileVariant, StreamSubscriber]]:
+        """Join the shared variant for ``profile``; None if too many distinct profiles are live."""
+        with self.lock:
+            variant = self.variants.get(profile)
+            if variant is None:
+                if len(self.variants) >= self.max_variants:
+                    return None
+                variant = ProfileVariant(
+                    profile,
+                    self.source,
+                    self.source_width,
+                    self.default_quality,
+                    self.idle_sec,
+                    on_idle=self._evict_if_idle,
+                )
+                self.variants[profile] = variant
+                variant.thread.start()
+            return variant, variant._subscribe()
+
+    def unsubscribe(self, variant: ProfileVariant, reader: StreamSubscriber) -> None:
+        with self.lock:
+            variant._unsubscribe(reader)
+
+    def close_all(self) -> None:
+        with self.lock:
+            for variant in self.variants.values():
+                variant.stop()
+            self.variants.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "evictions": self.evictions,
+                "profiles": {
+                    variant.profile.key: {
+                        "readers": len(variant.readers),
+                        "frames_in": variant.frames_in,
+                        "frames_out": variant.frames_out,
+                    }
+                    for variant in self.variants.values()
+                },
+            }
@@ -0,0 +1,276 @@
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+
+@dataclass(order=True)
+class UploadTask:
+    next_at: float
+    order: int
+    id: str = field(compare=False)
+    path: Path = field(compare=False)
+    blob_name: str = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+    created_at: float = field(default_factory=time.time, compare=False)
+    last_error: Optional[str] = field(default=None, compare=False)
+
+
+class UploadQueue:
+    """Background uploads that survive restarts.
+
+    Every state change is appended to a JSON-lines journal (``add`` when a file
+    is queued, ``retry`` after a failed attempt, ``done``/``drop`` when it
+    leaves the queue); on start the journal is replayed and compacted to the
+    tasks still pending. ``workers`` threads upload concurrently and failed
+    uploads are retried with jittered exponential backoff up to
+    ``max_attempts``. ``on_uploaded``/``on_dropped`` are called from the worker
+    once a task has left the queue.
+    """
+
+    def __init__(
+        self,
+        upload: Callable[[Path, str], None],
+        journal_path: Path,
+        workers: int = 2,
+        max_attempts: int = 10,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        on_uploaded: Optional[Callable[[UploadTask], None]] = None,
+        on_dropped: Optional[Callable[[UploadTask], None]] = None,
+    ) -> None:
+        self.upload = upload
+        self.journal_path = journal_path
+        self.worker_count = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_uploaded = on_uploaded
+        self.on_dropped = on_dropped
+
+        self.cond = threading.Condition()
+        self.heap: list[UploadTask] = []
+        self.tasks: dict[str, UploadTask] = {}
+        self.in_progress: set[str] = set()
+        self.counter = itertools.count()
+        self.journal_lock = threading.Lock()
+        self.threads: list[threading.Thread] = []
+        self.stopped = False
+
+        self.completed = 0
+        self.dropped = 0
+        self.failed_attempts = 0
+        self.bytes_uploaded = 0
+        self.recent: deque[tuple[float, int]] = deque()
+
+        self._replay_journal()
+
+    def _append(self, record: dict, sync: bool = False) -> None:
+        with self.journal_lock:
+            with open(self.journal_path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(record) + "\n")
+                if sync:
+                    handle.flush()
+                    os.fsync(handle.fileno())
+
+    def _replay_journal(self) -> None:
+        if not self.journal_path.exists():
+            return
+        pending: dict[str, dict] = {}
+        try:
+            lines = self.journal_path.read_text(encoding="utf-8").splitlines()
+        except OSError as exc:
+            print(f"[PiCam] Upload journal unreadable: {exc}")
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash mid-write; everything before it is intact.
+                continue
+            op = record.get("op")
+            if op == "add":
+                pending[record["id"]] = record
+            elif op == "retry" and record.get("id") in pending:
+                pending[record["id"]]["attempts"] = record.get("attempts", 0)
+            elif op in ("done", "drop"):
+                pending.pop(record.get("id"), None)
+
+        now = time.time()
+        for record in pending.values():
+            task = UploadTask(
+                next_at=now,
+                order=next(self.counter),
+                id=record["id"],
+                path=Path(record["path"]),
+                blob_name=record["blob_name"],
+                attempts=record.get("attempts", 0),
+                created_at=record.get("created_at", now),
+            )
+            self.tasks[task.id] = task
+            heapq.heappush(self.heap, task)
+        self._compact()
+        if pending:
+            print(f"[PiCam] Upload queue: resumed {len(pending)} pending upload(s)")
+
+    def _compact(self) -> None:
+        tmp_path = self.journal_path.with_suffix(".tmp")
+        # Snapshot under journal_lock: an enqueue either registered its task
+        # before this point or appends to the new journal once we are done.
+        with self.journal_lock:
+            with self.cond:
+                tasks = list(self.tasks.values())
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                for task in tasks:
+                    handle.write(json.dumps(self._add_record(task)) + "\n")
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    @staticmethod
+    def _add_record(task: UploadTask) -> dict:
+        return {
+            "op": "add",
+            "id": task.id,
+            "path": str(task.path),
+            "blob_name": task.blob_name,
+            "attempts": task.attempts,
+            "created_at": task.created_at,
+        }
+
+    def start(self) -> None:
+        with self.cond:
+            if self.threads:
+                return
+            for index in range(self.worker_count):
+                thread = threading.Thread(target=self._worker, name=f"upload-{index}", daemon=True)
+                self.threads.append(thread)
+                thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        # Let a worker finish its journal write before another queue opens the same file.
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def enqueue(self, path: Path, blob_name: Optional[str] = None) -> UploadTask:
+        task = UploadTask(
+            next_at=time.time(),
+            order=next(self.counter),
+            id=uuid.uuid4().hex,
+            path=path,
+            blob_name=blob_name or path.name,
+        )
+        with self.cond:
+            # Registered before journaling so a concurrent compaction keeps it.
+            self.tasks[task.id] = task
+        # Journaled before a worker can see it: once enqueue returns, the upload happens even if we crash.
+        self._append(self._add_record(task), sync=True)
+        with self.cond:
+            heapq.heappush(self.heap, task)
+            self.cond.notify()
+        return task
+
+    def _next_task(self) -> Optional[UploadTask]:
+        with self.cond:
+            while not self.stopped:
+                now = time.time()
+                if self.heap and self.heap[0].next_at <= now:
+                    task = heapq.heappop(self.heap)
+                    self.in_progress.add(task.id)
+                    return task
+                self.cond.wait(self.heap[0].next_at - now if self.heap else None)
+            return None
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _worker(self) -> None:
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            if not task.path.exists():
+                print(f"[PiCam] Upload dropped, file missing: {task.path.name}")
+                self._finish(task, "drop")
+                continue
+            try:
+                size = task.path.stat().st_size
+                self.upload(task.path, task.blob_name)
+            except Exception as exc:
+                self._retry(task, exc)
+                continue
+            with self.cond:
+                self.bytes_uploaded += size
+                self.recent.append((time.time(), size))
+            print(f"[PiCam] Azure upload ok: {task.blob_name}")
+            self._finish(task, "done")
+
+    def _finish(self, task: UploadTask, op: str) -> None:
+        self._append({"op": op, "id": task.id})
+        with self.cond:
+            self.tasks.pop(task.id, None)
+            self.in_progress.discard(task.id)
+            if op == "done":
+                self.completed += 1
+            else:
+                self.dropped += 1
+            compact = not self.tasks
+        if compact:
+            # Idle: shrink the journal back to nothing.
+            self._compact()
+        callback = self.on_uploaded if op == "done" else self.on_dropped
+        if callback is not None:
+            try:
+                callback(task)
+            except Exception as exc:
+                print(f"[PiCam] Upload callback failed for {task.blob_name}: {exc}")
+
+    def _retry(self, task: UploadTask, exc: Exception) -> None:
+        task.attempts += 1
+        task.last_error = str(exc)
+        with self.cond:
+            self.failed_attempts += 1
+        if task.attempts >= self.max_attempts:
+            print(f"[PiCam] Azure upload gave up after {task.attempts} attempts: {task.blob_name}: {exc}")
+            self._finish(task, "drop")
+            return
+        delay = self._backoff(task.attempts)
+        print(f"[PiCam] Azure upload failed for {task.blob_name} (attempt {task.attempts}), retrying in {delay:.0f}s: {exc}")
+        self._append({"op": "retry", "id": task.id, "attempts": task.attempts})
+        with self.cond:
+            task.next_at = time.time() + delay
+            task.order = next(self.counter)
+            self.in_progress.discard(task.id)
+            heapq.heappush(self.heap, task)
+            self.cond.notify()
+
+    def stats(self, window_sec: float = 60.0) -> dict:
+        with self.cond:
+            cutoff = time.time() - window_sec
+            while self.recent and self.recent[0][0] < cutoff:
+                self.recent.popleft()
+            recent_bytes = sum(size for _, size in self.recent)
+            return {
+                "depth": len(self.tasks),
+                "in_progress": len(self.in_progress),
+                "waiting_retry": sum(1 for task in self.tasks.values() if task.attempts and task.id not in self.in_progress),
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "failed_attempts": self.failed_attempts,
+                "bytes_uploaded": self.bytes_uploaded,
+                "uploads_last_min": len(self.recent),
+                "throughput_bps": round(recent_bytes / window_sec, 1),
+                "workers": self.worker_count,
+            }
@@ -0,0 +1,116 @@
+import asyncio
+import itertools
+import json
+import struct
+import time
+from collections import deque
+from typing import Optional
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from utils import clamp
+
+
+# version (1), 3 reserved bytes, frame sequence number, capture timestamp in microseconds.
+WS_FRAME_HEADER = struct.Struct("!B3xIQ")
+WS_FRAME_VERSION = 1
+WS_MAX_WINDOW = 8
+
+_client_ids = itertools.count(1)
+
+
+class WebSocketStreamClient:
+    """Flow-controlled binary frame sender for one WebSocket viewer.
+
+    Each message is ``WS_FRAME_HEADER`` followed by the JPEG. The client answers
+    with ``{"ack": <seq>}`` (cumulative); at most ``window`` frames are ever
+    unacknowledged. The sender waits for the window to open and then sends
+    the newest frame, so frames produced meanwhile are skipped, not queued.
+    """
+
+    def __init__(self, websocket: WebSocket, window: int = 2, ack_timeout: float = 10.0) -> None:
+        self.id = next(_client_ids)
+        self.websocket = websocket
+        self.window = int(clamp(window, 1, WS_MAX_WINDOW))
+        self.ack_timeout = ack_timeout
+        self.in_flight: dict[int, float] = {}
+        self.window_open = asyncio.Event()
+        self.window_open.set()
+        self.closed = False
+        self.last_seq: Optional[int] = None
+        self.connected_at = time.time()
+        self.frames_sent = 0
+        self.frames_acked = 0
+        self.frames_dropped = 0
+        self.rtts_ms: deque[float] = deque(maxlen=50)
+
+    def _ack(self, seq: int) -> None:
+        now = time.perf_counter()
+        for sent_seq in [sent_seq for sent_seq in self.in_flight if sent_seq <= seq]:
+            sent_at = self.in_flight.pop(sent_seq)
+            self.frames_acked += 1
+            if sent_seq == seq:
+                self.rtts_ms.append((now - sent_at) * 1000)
+        if len(self.in_flight) < self.window:
+            self.window_open.set()
+
+    async def receive_acks(self) -> None:
+        try:
+            while True:
+                message = await self.websocket.receive_text()
+                try:
+                    seq = int(json.loads(message)["ack"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._ack(seq)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            self.closed = True
+            self.window_open.set()
+
+    @property
+    def stalled(self) -> bool:
+        """True when the oldest unacknowledged frame is older than ``ack_timeout``."""
+        if not self.in_flight:
+            return False
+        return time.perf_counter() - min(self.in_flight.values()) > self.ack_timeout
+
+    async def offer(self, seq: int, timestamp: float, jpeg) -> bool:
+        """Send the frame if the window allows; returns False if it was dropped."""
+        if len(self.in_flight) >= self.window:
+            self.frames_dropped += 1
+            return False
+        if self.last_seq is not None:
+            # Frames skipped while waiting for the window count as dropped.
+            self.frames_dropped += max(0, seq - self.last_seq - 1)
+        self.last_seq = seq
+        header = WS_FRAME_HEADER.pack(WS_FRAME_VERSION, seq & 0xFFFFFFFF, int(timestamp * 1_000_000))
+        self.in_flight[seq & 0xFFFFFFFF] = time.perf_counter()
+        if len(self.in_flight) >= self.window:
+            self.window_open.clear()
+        await self.websocket.send_bytes(header + bytes(jpeg))
+        self.frames_sent += 1
+        return True
+
+    async def wait_for_window(self, timeout: float) -> bool:
+        """Wait until another frame may be sent; False on timeout or once the viewer is gone."""
+        try:
+            await asyncio.wait_for(self.window_open.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return not self.closed
+
+    def stats(self) -> dict:
+        rtts = list(self.rtts_ms)
+        return {
+            "id": self.id,
+            "window": self.window,
+            "in_flight": len(self.in_flight),
+            "frames_sent": self.frames_sent,
+            "frames_acked": self.frames_acked,
+            "frames_dropped": self.frames_dropped,
+            "rtt_ms": round(rtts[-1], 2) if rtts else None,
+            "avg_rtt_ms": round(sum(rtts) / len(rtts), 2) if rtts else None,
+            "connected_sec": round(time.time() - self.connected_at, 1),
+        }
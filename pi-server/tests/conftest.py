@@ -6,7 +6,7 @@ Raspberry Pi.
 """
 import sys
 from pathlib import Path
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 # ── Add pi-server root to sys.path ────────────────────────────────────────────
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -62,10 +62,16 @@ def camera_client() -> TestClient:
     app.include_router(
         create_camera_router(
             health_fn=_handler({"status": "ok", "camera": "mock"}),
-            stream_fn=_handler({"status": "streaming"}),
+            stream_fn=lambda **profile: {"status": "streaming", "profile": profile},
             stop_stream_fn=_handler({"status": "stopped"}),
             photo_fn=_handler({"filename": "photo_test.jpg"}),
             record_start_fn=_handler({"status": "recording", "duration": 30}),
+            record_status_fn=lambda job_id: {"id": job_id, "phase": "remuxing"},
+            camera_session_fn=_handler({"mode": "preview", "switch_count": 2}),
+            snapshot_fn=_handler((b"\xff\xd8jpeg\xff\xd9", '"f42"')),
+            hls_playlist_fn=_handler("#EXTM3U\n#EXT-X-MEDIA-SEQUENCE:7\n"),
+            hls_init_fn=_handler(b"ftypmoov"),
+            hls_segment_fn=lambda seq: b"moofmdat" if seq == 7 else None,
         )
     )
     return TestClient(app)
@@ -136,9 +142,13 @@ def azure_client_configured(monkeypatch) -> TestClient:
 
     mock_svc = MagicMock()
     mock_svc.is_configured = True
-    mock_svc.list_blobs.return_value = [
-        {"name": "photo_001.jpg", "size": 1234, "last_modified": "2026-01-01T00:00:00Z"}
-    ]
+    mock_svc.indexing = False
+    mock_svc.query_blobs_async = AsyncMock(
+        return_value=(
+            [{"name": "photo_001.jpg", "size": 1234, "last_modified": "2026-01-01T00:00:00Z"}],
+            None,
+        )
+    )
     monkeypatch.setattr(azure_module, "azure_service", mock_svc)
 
     app = FastAPI()
@@ -0,0 +1,88 @@
+"""Tests for AzureService on the shared aio client, against the benchmark's fake Blob endpoint."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from bench_azure_upload import FakeBlobStore, make_service, start_fake_endpoint  # noqa: E402
+from services.blob_index import BlobIndex  # noqa: E402
+
+
+@pytest.fixture
+def endpoint():
+    store = FakeBlobStore(rtt=0.0, conn_bytes_per_sec=1 << 30)
+    server = start_fake_endpoint(store)
+    yield store, server.server_address[1]
+    server.shutdown()
+
+
+def test_uploads_listing_and_range_reads_share_one_pool(tmp_path: Path, endpoint):
+    store, port = endpoint
+    service = make_service(port, tmp_path / "state", use_aio=True)
+    service.index = BlobIndex(tmp_path / "index.sqlite3", "bench")
+    service.block_size = 1024
+    service.chunked_threshold = 4096
+    small = tmp_path / "photo_1.jpg"
+    small.write_bytes(b"jpeg" * 100)
+    large = tmp_path / "recording_1.mp4"
+    large.write_bytes(bytes(index % 251 for index in range(10 * 1024 + 17)))
+
+    try:
+        service.upload_path(small)
+        service.upload_path(large, "recordings/recording_1.mp4")
+        assert store.blobs["photo_1.jpg"] == small.read_bytes()
+        assert store.blobs["recordings/recording_1.mp4"] == large.read_bytes()
+
+        service.sync_index()
+        blobs, _ = service.query_blobs()
+        assert sorted(blob["name"] for blob in blobs) == ["photo_1.jpg", "recordings/recording_1.mp4"]
+
+        async def read(range_header):
+            chunks, content_type, status, headers = await service.get_blob_stream_async(
+                "recordings/recording_1.mp4", {"range": range_header} if range_header else {}
+            )
+            return b"".join([chunk async for chunk in chunks]), status, headers
+
+        connections = store.connections
+        body, status, headers = asyncio.run(read("bytes=100-2147"))
+        assert (status, headers["Content-Range"]) == (206, f"bytes 100-2147/{10 * 1024 + 17}")
+        assert body == large.read_bytes()[100:2148]
+        body, status, _ = asyncio.run(read(None))
+        assert (status, body) == (200, large.read_bytes())
+        # The pooled connections opened by the uploads are reused for the reads.
+        assert store.connections == connections
+    finally:
+        service.aio.close()
+
+
+def test_download_chunks_closes_the_stream_when_the_consumer_stops(tmp_path: Path, endpoint):
+    store, port = endpoint
+    service = make_service(port, tmp_path / "state", use_aio=True)
+    store.blobs["clip.mp4"] = b"x" * 4096
+    opened = []
+    open_download = service.aio._open_download
+
+    async def spy(*args):
+        chunks = await open_download(*args)
+        opened.append(chunks)
+        return chunks
+
+    service.aio._open_download = spy
+
+    async def read_one():
+        stream = service.aio.download_chunks("clip.mp4")
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    try:
+        assert asyncio.run(read_one()) == b"x" * 4096
+        service.aio.run(asyncio.sleep, 0)
+        assert opened and opened[0].ag_frame is None
+    finally:
+        service.aio.close()
@@ -43,13 +43,13 @@ def test_list_blobs_custom_limit(azure_client_configured: TestClient):
 def test_list_blobs_error_propagated(monkeypatch):
     """Azure SDK exception surfaces as a 500 with error detail."""
     import routers.azure as azure_module
-    from unittest.mock import MagicMock
+    from unittest.mock import AsyncMock, MagicMock
     from fastapi import FastAPI
     from routers import azure_router as _router
 
     mock_svc = MagicMock()
     mock_svc.is_configured = True
-    mock_svc.list_blobs.side_effect = RuntimeError("connection refused")
+    mock_svc.query_blobs_async = AsyncMock(side_effect=RuntimeError("connection refused"))
     monkeypatch.setattr(azure_module, "azure_service", mock_svc)
 
     app = FastAPI()
@@ -59,3 +59,59 @@ def test_list_blobs_error_propagated(monkeypatch):
     resp = client.get("/azure/blobs")
     assert resp.status_code == 500
     assert "error" in resp.json()
+
+
+def test_list_blobs_passes_filters_and_next_cursor(azure_client_configured: TestClient):
+    import routers.azure as azure_module
+
+    azure_module.azure_service.query_blobs_async.return_value = (
+        [{"name": "recordings/recording_1.mp4", "size": 10, "last_modified": "2026-01-02T00:00:00+00:00"}],
+        "next-page",
+    )
+    resp = azure_client_configured.get(
+        "/azure/blobs?limit=1&cursor=abc&prefix=recordings/&since=2026-01-01T00:00:00Z&until=1767484800"
+    )
+    assert resp.status_code == 200
+    assert resp.headers["x-next-cursor"] == "next-page"
+    assert resp.json()[0]["name"] == "recordings/recording_1.mp4"
+    azure_module.azure_service.query_blobs_async.assert_called_once_with(
+        limit=1, cursor="abc", prefix="recordings/", since=1767225600.0, until=1767484800.0
+    )
+
+    assert "x-indexing" not in resp.headers
+
+
+def test_list_blobs_flags_an_unfinished_index(azure_client_configured: TestClient):
+    import routers.azure as azure_module
+
+    azure_module.azure_service.indexing = True
+    resp = azure_client_configured.get("/azure/blobs")
+    assert resp.status_code == 200
+    assert resp.headers["x-indexing"] == "true"
+
+def test_list_blobs_rejects_bad_time_filter(azure_client_configured: TestClient):
+    resp = azure_client_configured.get("/azure/blobs?since=yesterday")
+    assert resp.status_code == 400
+
+
+def test_sas_url_endpoint(azure_client_configured: TestClient):
+    from datetime import datetime, timezone
+
+    import routers.azure as azure_module
+
+    expires = datetime(2026, 1, 1, 0, 15, tzinfo=timezone.utc)
+    azure_module.azure_service.sas_url.return_value = ("https://acct.blob.core.windows.net/images/a.jpg?sig=x", expires)
+    resp = azure_client_configured.get("/azure/url/recordings/a.mp4")
+    assert resp.status_code == 200
+    assert resp.json()["url"].endswith("?sig=x")
+    assert resp.json()["expires_at"] == "2026-01-01T00:15:00+00:00"
+    azure_module.azure_service.sas_url.assert_called_once_with("recordings/a.mp4")
+
+
+def test_list_blobs_with_sas_urls(azure_client_configured: TestClient):
+    import routers.azure as azure_module
+
+    azure_module.azure_service.with_sas_urls.side_effect = lambda blobs: [{**blob, "url": "signed"} for blob in blobs]
+    resp = azure_client_configured.get("/azure/blobs?sas=1")
+    assert resp.status_code == 200
+    assert resp.json()[0]["url"] == "signed"
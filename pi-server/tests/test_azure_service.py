@@ -0,0 +1,327 @@
+"""Tests for AzureService block uploads, run against an in-memory fake blob client."""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from azure.storage.blob import BlobBlock
+
+from services.azure_service import AzureService
+from services.blob_index import BlobIndex
+
+
+class FakeBlobClient:
+    def __init__(self, fail_after: int = -1) -> None:
+        self.lock = threading.Lock()
+        self.uncommitted: dict[str, bytes] = {}
+        self.committed: bytes = b""
+        self.content_type = None
+        self.stage_calls = 0
+        self.fail_after = fail_after
+
+    def stage_block(self, block_id: str, data: bytes, length=None) -> None:
+        with self.lock:
+            if self.fail_after >= 0 and self.stage_calls >= self.fail_after:
+                raise ConnectionError("uplink dropped")
+            self.stage_calls += 1
+            self.uncommitted[block_id] = bytes(data)
+
+    def get_block_list(self, block_list_type: str = "committed"):
+        return [], [BlobBlock(block_id=block_id) for block_id in self.uncommitted]
+
+    def commit_block_list(self, block_list, content_settings=None) -> None:
+        self.committed = b"".join(self.uncommitted[block.id] for block in block_list)
+        self.uncommitted.clear()
+        self.content_type = content_settings.content_type
+
+
+class FakeContainerClient:
+    def __init__(self, blob: FakeBlobClient) -> None:
+        self.blob = blob
+        self.single_uploads = []
+
+    def get_blob_client(self, name: str) -> FakeBlobClient:
+        return self.blob
+
+    def upload_blob(self, name, data, overwrite, content_settings) -> None:
+        self.single_uploads.append(name)
+
+
+def _service(tmp_path: Path, blob: FakeBlobClient) -> AzureService:
+    service = AzureService()
+    service.container_client = FakeContainerClient(blob)
+    service.resume_dir = tmp_path / "upload_state"
+    service.block_size = 1024
+    service.chunked_threshold = 4096
+    return service
+
+
+def _recording(tmp_path: Path, size: int) -> Path:
+    path = tmp_path / "recording_1.mp4"
+    path.write_bytes(bytes(index % 251 for index in range(size)))
+    return path
+
+
+def test_large_files_upload_as_parallel_blocks(tmp_path: Path):
+    blob = FakeBlobClient()
+    service = _service(tmp_path, blob)
+    path = _recording(tmp_path, 10 * 1024 + 17)
+
+    service.upload_path(path, "recordings/recording_1.mp4")
+
+    assert blob.committed == path.read_bytes()
+    assert blob.stage_calls == 11
+    assert blob.content_type == "video/mp4"
+    assert service.container_client.single_uploads == []
+    assert list(service.resume_dir.iterdir()) == []
+
+
+def test_small_files_use_a_single_upload(tmp_path: Path):
+    blob = FakeBlobClient()
+    service = _service(tmp_path, blob)
+    path = _recording(tmp_path, 1000)
+
+    service.upload_path(path)
+
+    assert service.container_client.single_uploads == ["recording_1.mp4"]
+    assert blob.stage_calls == 0
+
+
+def test_interrupted_upload_resumes_from_staged_blocks(tmp_path: Path):
+    blob = FakeBlobClient(fail_after=6)
+    service = _service(tmp_path, blob)
+    path = _recording(tmp_path, 10 * 1024)
+
+    with pytest.raises(ConnectionError):
+        service.upload_path_chunked(path, max_concurrency=1)
+    assert len(list(service.resume_dir.glob("*.json"))) == 1
+
+    blob.fail_after = -1
+    blob.stage_calls = 0
+    result = service.upload_path_chunked(path, max_concurrency=3)
+
+    assert result == {"blocks": 10, "staged": 4, "resumed": 6, "bytes": 10 * 1024}
+    assert blob.stage_calls == 4
+    assert blob.committed == path.read_bytes()
+
+
+def test_resume_restages_blocks_azure_no_longer_holds(tmp_path: Path):
+    blob = FakeBlobClient(fail_after=6)
+    service = _service(tmp_path, blob)
+    path = _recording(tmp_path, 10 * 1024)
+    with pytest.raises(ConnectionError):
+        service.upload_path_chunked(path, max_concurrency=1)
+
+    # Uncommitted blocks were garbage-collected on the service side.
+    blob.uncommitted.clear()
+    blob.fail_after = -1
+    result = service.upload_path_chunked(path)
+
+    assert result["resumed"] == 0
+    assert result["staged"] == 10
+    assert blob.committed == path.read_bytes()
+
+
+class FakePager:
+    def __init__(self, pages: list[list]) -> None:
+        self.pages = pages
+        self.continuation_token = None
+
+    def by_page(self, continuation_token=None):
+        start = int(continuation_token or 0)
+        pager = self
+
+        def _iter():
+            for offset, page in enumerate(pager.pages[start:], start=start):
+                pager.continuation_token = str(offset + 1) if offset + 1 < len(pager.pages) else None
+                yield page
+
+        return _PageIterator(_iter(), self)
+
+
+class _PageIterator:
+    def __init__(self, pages, pager: FakePager) -> None:
+        self.pages = pages
+        self.pager = pager
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.pages)
+
+    @property
+    def continuation_token(self):
+        return self.pager.continuation_token
+
+
+def test_blob_listing_is_served_from_the_index(tmp_path: Path):
+    def blob(name: str, ts: float):
+        return SimpleNamespace(name=name, size=1, last_modified=datetime.fromtimestamp(ts, tz=timezone.utc))
+
+    blob_client = FakeBlobClient()
+    service = _service(tmp_path, blob_client)
+    service.index = BlobIndex(tmp_path / "index.sqlite3", "images")
+    pager = FakePager([[blob("photo_1.jpg", 100)], [blob("recordings/recording_1.mp4", 200)]])
+    release = threading.Event()
+
+    def list_blobs(results_per_page=None):
+        release.wait(2.0)
+        return pager
+
+    service.container_client.list_blobs = list_blobs
+
+    # The first query answers from the (still empty) index and leaves the pass to a background sync.
+    assert service.query_blobs(limit=1) == ([], None)
+    assert service.indexing
+    release.set()
+    deadline = time.monotonic() + 2.0
+    while service.indexing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    blobs, cursor = service.query_blobs(limit=1)
+    assert [item["name"] for item in blobs] == ["recordings/recording_1.mp4"]
+    assert cursor is not None
+    # Once synced, queries never touch the listing.
+    service.container_client.list_blobs = None
+
+    path = _recording(tmp_path, 10)
+    service.upload_path(path, "photo_2.jpg")
+    blobs, _ = service.query_blobs(prefix="photo_")
+    assert [item["name"] for item in blobs] == ["photo_2.jpg", "photo_1.jpg"]
+
+
+def test_async_listing_queries_the_index_off_the_event_loop(tmp_path: Path):
+    service = _service(tmp_path, FakeBlobClient())
+    service.index = BlobIndex(tmp_path / "index.sqlite3", "images")
+    service.container_client.list_blobs = lambda results_per_page=None: FakePager([[]])
+    service.sync_index()
+    query = service.index.query
+    threads = []
+
+    def recording_query(**kwargs):
+        threads.append(threading.get_ident())
+        return query(**kwargs)
+
+    service.index.query = recording_query
+
+    async def listing():
+        return threading.get_ident(), await service.query_blobs_async(limit=10)
+
+    loop_thread, (blobs, cursor) = asyncio.run(listing())
+    assert (blobs, cursor) == ([], None)
+    assert threads and threads[0] != loop_thread
+
+
+def _media_service(tmp_path: Path, content: bytes, downloads: list) -> AzureService:
+    from services.media_cache import BlobMediaCache
+
+    class Download:
+        def __init__(self, data: bytes) -> None:
+            self.data = data
+
+        def chunks(self):
+            for start in range(0, len(self.data), 512):
+                yield self.data[start:start + 512]
+
+        def readinto(self, handle) -> int:
+            handle.write(self.data)
+            return len(self.data)
+
+    class Client:
+        def get_blob_properties(self):
+            return SimpleNamespace(
+                size=len(content), etag='"v1"', last_modified=datetime(2026, 1, 1, tzinfo=timezone.utc)
+            )
+
+        def download_blob(self, offset=0, length=None, max_concurrency=1):
+            downloads.append((offset, length))
+            end = len(content) if length is None else offset + length
+            return Download(content[offset:end])
+
+    service = _service(tmp_path, FakeBlobClient())
+    service.container_client.get_blob_client = lambda name: Client()
+    service.media_cache = BlobMediaCache(
+        tmp_path / "cache", 1 << 20, service._fetch_properties, service._download_into
+    )
+    return service
+
+
+def test_repeated_range_requests_stop_hitting_azure(tmp_path: Path):
+    content = bytes(range(256)) * 8
+    downloads = []
+    service = _media_service(tmp_path, content, downloads)
+
+    chunks, content_type, status, headers = service.get_blob_stream("recordings/a.mp4", {"range": "bytes=100-199"})
+    assert (status, headers["Content-Range"], content_type) == (206, "bytes 100-199/2048", "video/mp4")
+    assert b"".join(chunks) == content[100:200]
+    deadline = time.monotonic() + 2.0
+    while not service.media_cache.entries and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    for start in (0, 500, 1500):
+        chunks, _, status, headers = service.get_blob_stream("recordings/a.mp4", {"range": f"bytes={start}-{start + 99}"})
+        assert b"".join(chunks) == content[start:start + 100]
+    chunks, _, status, headers = service.get_blob_stream("recordings/a.mp4", {})
+    assert (status, headers["Content-Length"]) == (200, "2048")
+    assert b"".join(chunks) == content
+    chunks, _, status, headers = service.get_blob_stream("recordings/a.mp4", {"range": "bytes=-48"})
+    assert (status, headers["Content-Range"], b"".join(chunks)) == (206, "bytes 2000-2047/2048", content[-48:])
+    _, _, status, headers = service.get_blob_stream("recordings/a.mp4", {"if-none-match": '"v1"'})
+    assert (status, headers["ETag"]) == (304, '"v1"')
+    # One ranged pass-through plus the background fill (which may start first);
+    # everything after came from disk.
+    assert sorted(downloads, key=str) == [(0, None), (100, 100)]
+
+
+
+def test_full_download_is_teed_into_the_cache(tmp_path: Path):
+    content = bytes(range(256)) * 8
+    downloads = []
+    service = _media_service(tmp_path, content, downloads)
+
+    # A client that disconnects mid-body leaves no copy behind.
+    chunks, _, status, _ = service.get_blob_stream("recordings/a.mp4", {})
+    assert status == 200
+    next(chunks)
+    chunks.close()
+    assert not service.media_cache.entries
+    assert not list((tmp_path / "cache").glob("*.part"))
+
+    chunks, _, _, _ = service.get_blob_stream("recordings/a.mp4", {})
+    assert b"".join(chunks) == content
+    chunks, _, _, _ = service.get_blob_stream("recordings/a.mp4", {"range": "bytes=0-99"})
+    assert b"".join(chunks) == content[:100]
+    # Each full GET downloaded the blob once, with no separate fill, and the second one stuck.
+    assert downloads == [(None, None), (None, None)]
+    assert service.media_cache.stats()["fills"] == 1
+
+def test_sas_urls_are_signed_locally_and_cached(tmp_path: Path):
+    import base64
+    from urllib.parse import parse_qs, urlparse
+
+    from azure.storage.blob import BlobServiceClient
+
+    service = AzureService()
+    service.blob_service = BlobServiceClient.from_connection_string(
+        "DefaultEndpointsProtocol=https;AccountName=acct;"
+        f"AccountKey={base64.b64encode(b'k' * 32).decode()};EndpointSuffix=core.windows.net"
+    )
+    service.container_client = service.blob_service.get_container_client("images")
+    service.sas_ttl = 900
+
+    url, expires_at = service.sas_url("recordings/recording 1.mp4")
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    assert parsed.netloc == "acct.blob.core.windows.net"
+    assert parsed.path == "/images/recordings/recording%201.mp4"
+    assert query["sp"] == ["r"]
+    assert 890 < (expires_at - datetime.now(timezone.utc)).total_seconds() <= 900
+    assert service.sas_url("recordings/recording 1.mp4") == (url, expires_at)
+
+    # Close to expiry the URL is re-signed.
+    stale = datetime.now(timezone.utc) + timedelta(seconds=60)
+    service.sas_cache["recordings/recording 1.mp4"] = (url, stale)
+    assert service.sas_url("recordings/recording 1.mp4")[1] > stale + timedelta(seconds=600)
@@ -0,0 +1,61 @@
+"""Tests for the local SQLite index behind GET /azure/blobs."""
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from services.blob_index import BlobIndex
+
+
+def _blob(name: str, ts: float, size: int = 1):
+    return SimpleNamespace(name=name, size=size, last_modified=datetime.fromtimestamp(ts, tz=timezone.utc))
+
+
+def test_cursor_pages_newest_first_with_filters(tmp_path: Path):
+    index = BlobIndex(tmp_path / "index.sqlite3", "images")
+    for n in range(5):
+        index.upsert(f"photo_{n}.jpg", 10, 1000.0 + n)
+        index.upsert(f"recordings/recording_{n}.mp4", 20, 1000.0 + n)
+
+    page, cursor = index.query(limit=3, prefix="recordings/")
+    assert [blob["name"] for blob in page] == [f"recordings/recording_{n}.mp4" for n in (4, 3, 2)]
+    page, cursor = index.query(limit=3, prefix="recordings/", cursor=cursor)
+    assert [blob["name"] for blob in page] == ["recordings/recording_1.mp4", "recordings/recording_0.mp4"]
+    assert cursor is None
+
+    page, _ = index.query(prefix="photo_", since=1001.0, until=1003.0)
+    assert [blob["name"] for blob in page] == ["photo_2.jpg", "photo_1.jpg"]
+    assert page[0]["last_modified"] == "1970-01-01T00:16:42+00:00"
+
+    with pytest.raises(ValueError):
+        index.query(cursor="not-a-cursor")
+
+
+def test_reconcile_pass_applies_pages_and_drops_deleted_blobs(tmp_path: Path):
+    index = BlobIndex(tmp_path / "index.sqlite3", "images")
+    assert not index.synced
+    assert not index.reconcile_page([_blob("a.jpg", 1), _blob("b.jpg", 2)], "page-2")
+    assert index.marker() == "page-2"
+    assert index.reconcile_page([_blob("c.jpg", 3)], None)
+    assert index.synced
+    assert index.stats()["blobs"] == 3
+
+    # Next pass: b.jpg was deleted in Azure, d.jpg was uploaded by us mid-pass.
+    index.reconcile_page([_blob("a.jpg", 1)], "page-2")
+    index.upsert("d.jpg", 5, 4)
+    index.reconcile_page([_blob("c.jpg", 3)], None)
+    page, _ = index.query()
+    assert [blob["name"] for blob in page] == ["d.jpg", "c.jpg", "a.jpg"]
+
+
+def test_index_survives_reopen_but_not_a_container_change(tmp_path: Path):
+    path = tmp_path / "index.sqlite3"
+    index = BlobIndex(path, "images")
+    index.reconcile_page([_blob("a.jpg", 1)], None)
+    index.db.close()
+
+    assert BlobIndex(path, "images").stats()["blobs"] == 1
+    other = BlobIndex(path, "videos")
+    assert other.stats()["blobs"] == 0
+    assert not other.synced
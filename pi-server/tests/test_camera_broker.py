@@ -0,0 +1,76 @@
+"""Tests for the priority-ordered camera broker."""
+import threading
+import time
+
+import pytest
+
+from services.camera_broker import (
+    PRIORITY_MOTION,
+    PRIORITY_RECORD,
+    PRIORITY_STILL,
+    PRIORITY_STREAM,
+    CameraBroker,
+    CameraLease,
+)
+
+
+def _hold(broker: CameraBroker, release: threading.Event) -> threading.Thread:
+    started = threading.Event()
+
+    def _job():
+        started.set()
+        release.wait(2.0)
+
+    thread = threading.Thread(target=broker.run, args=(PRIORITY_STREAM, _job), daemon=True)
+    thread.start()
+    assert started.wait(1.0)
+    return thread
+
+
+def test_waiting_jobs_are_granted_by_priority():
+    broker = CameraBroker()
+    release = threading.Event()
+    holder = _hold(broker, release)
+
+    order = []
+    threads = []
+    for priority in (PRIORITY_MOTION, PRIORITY_STREAM, PRIORITY_RECORD, PRIORITY_STILL):
+        thread = threading.Thread(target=broker.run, args=(priority, order.append, priority), daemon=True)
+        thread.start()
+        threads.append(thread)
+    deadline = time.monotonic() + 1.0
+    while broker.metrics()["queue_depth"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join(2.0)
+    assert order == [PRIORITY_RECORD, PRIORITY_STILL, PRIORITY_STREAM, PRIORITY_MOTION]
+    assert broker.metrics()["consumers"]["motion"]["max_wait_ms"] > 0
+
+
+def test_preempting_job_pauses_and_resumes_lower_priority_leases():
+    broker = CameraBroker()
+    events = []
+    broker.register_lease(CameraLease("stream", PRIORITY_STREAM, lambda: events.append("pause"), lambda: events.append("resume")))
+    broker.register_lease(CameraLease("record", PRIORITY_RECORD, lambda: events.append("bad"), lambda: events.append("bad")))
+
+    assert broker.run(PRIORITY_STILL, lambda: events.append("still") or "ok", preempt=True) == "ok"
+    assert events == ["pause", "still", "resume"]
+    assert broker.metrics()["preemptions"] == {"stream": 1}
+
+
+def test_timeout_is_counted_and_nested_calls_run_inline():
+    broker = CameraBroker()
+    release = threading.Event()
+    holder = _hold(broker, release)
+    try:
+        with pytest.raises(TimeoutError):
+            broker.run(PRIORITY_MOTION, lambda: None, timeout=0.05)
+    finally:
+        release.set()
+        holder.join(2.0)
+    assert broker.metrics()["consumers"]["motion"]["timeouts"] == 1
+    assert broker.metrics()["queue_depth"] == 0
+
+    assert broker.run(PRIORITY_RECORD, lambda: broker.run(PRIORITY_MOTION, lambda: "inner")) == "inner"
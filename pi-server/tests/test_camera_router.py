@@ -1,4 +1,4 @@
-"""Tests for camera endpoints: /health, /stream, /stream/stop, /photo, /record/start."""
+"""Tests for camera endpoints: /health, /stream, /stream/stop, /photo, /record/start, /record/{id}, /camera/session, /snapshot.jpg, /hls/*."""
 from fastapi.testclient import TestClient
 
 
@@ -14,6 +14,12 @@ def test_stream_returns_status(camera_client: TestClient):
     assert "status" in resp.json()
 
 
+def test_stream_passes_profile_query(camera_client: TestClient):
+    resp = camera_client.get("/stream", params={"width": 320, "fps": 5, "quality": 50})
+    assert resp.status_code == 200
+    assert resp.json()["profile"] == {"width": 320, "fps": 5.0, "quality": 50}
+
+
 def test_stop_stream(camera_client: TestClient):
     resp = camera_client.post("/stream/stop")
     assert resp.status_code == 200
@@ -41,3 +47,56 @@ def test_record_start_invalid_body(camera_client: TestClient):
     """Non-integer duration should fail Pydantic validation."""
     resp = camera_client.post("/record/start", json={"duration": "not-a-number"})
     assert resp.status_code == 422
+
+
+def test_record_status_reports_phase(camera_client: TestClient):
+    resp = camera_client.get("/record/rec-1-1")
+    assert resp.status_code == 200
+    assert resp.json() == {"id": "rec-1-1", "phase": "remuxing"}
+
+
+def test_camera_session_reports_mode(camera_client: TestClient):
+    resp = camera_client.get("/camera/session")
+    assert resp.status_code == 200
+    assert resp.json()["mode"] == "preview"
+
+
+def test_snapshot_returns_jpeg_with_cache_headers(camera_client: TestClient):
+    resp = camera_client.get("/snapshot.jpg")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/jpeg"
+    assert resp.headers["etag"] == '"f42"'
+    assert resp.headers["cache-control"] == "max-age=1"
+    assert resp.content.startswith(b"\xff\xd8")
+
+
+def test_snapshot_not_modified_for_matching_etag(camera_client: TestClient):
+    resp = camera_client.get("/snapshot.jpg", headers={"If-None-Match": '"f41", "f42"'})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+
+def test_snapshot_is_503_while_camera_is_busy():
+    from fastapi import FastAPI
+
+    from routers import create_camera_router
+
+    def busy():
+        raise TimeoutError("Camera busy")
+
+    app = FastAPI()
+    noop = lambda *args, **kwargs: {}  # noqa: E731
+    app.include_router(create_camera_router(noop, noop, noop, noop, noop, snapshot_fn=busy))
+    resp = TestClient(app).get("/snapshot.jpg")
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+
+
+def test_hls_playlist_and_segments(camera_client: TestClient):
+    resp = camera_client.get("/hls/stream.m3u8")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/vnd.apple.mpegurl"
+    assert resp.text.startswith("#EXTM3U")
+    assert camera_client.get("/hls/init.mp4").content == b"ftypmoov"
+    assert camera_client.get("/hls/segment_7.m4s").content == b"moofmdat"
+    assert camera_client.get("/hls/segment_3.m4s").status_code == 404
@@ -0,0 +1,307 @@
+"""CameraService tests driven by the off-Pi fake and replay camera backends."""
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from services.camera_backends import PicameraBackend, ReplayBackend
+from services.camera_service import CameraService
+from services.fake_camera import FakeEncoder, FakePicamera2
+from services.motion_service import MotionService
+
+
+@pytest.fixture()
+def camera() -> CameraService:
+    service = CameraService(
+        picamera_available=True,
+        stream_stale_sec=30,
+        stream_debounce_sec=0,
+        stream_warmup_sec=10,
+        is_recording=lambda: False,
+        backend=PicameraBackend(
+            camera_factory=FakePicamera2,
+            mjpeg_encoder_factory=FakeEncoder,
+            h264_encoder_factory=FakeEncoder,
+        ),
+    )
+    yield service
+    service.close_camera()
+
+
+def _motion(camera: CameraService, notifications: list) -> MotionService:
+    return MotionService(
+        get_frame_array=camera.get_frame_array,
+        send_push_notification_sync=lambda *args: None,
+        add_notification=lambda message, kind: notifications.append(kind),
+        threshold=25,
+        min_area=500,
+        cooldown=60,
+        warmup_sec=0,
+        get_gray_frame=camera.get_gray_frame,
+    )
+
+
+def test_camera_configures_yuv420_lores_stream(camera: CameraService):
+    camera.init_camera()
+    lores = camera.backend.picam.config["lores"]
+    assert lores == {"size": (640, 480), "format": "YUV420"}
+    assert camera.backend.picam.config["main"] == {"size": (1920, 1080), "format": "YUV420"}
+
+
+def test_yuv420_conversion_ignores_row_padding():
+    from services.camera_backends import yuv420_to_bgr
+
+    bgr = np.zeros((48, 64, 3), dtype=np.uint8)
+    bgr[:, :32] = (200, 60, 20)
+    i420 = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)
+    # Re-lay the planes out with 128-byte rows, as the ISP does for widths that are not aligned.
+    stride = 128
+    y, u, v = i420[:48], i420[48:60].reshape(24, 32), i420[60:].reshape(24, 32)
+    padded = np.zeros((72, stride), dtype=np.uint8)
+    padded[:48, :64] = y
+    chroma = padded.reshape(-1)[48 * stride:]
+    chroma[: 24 * 64].reshape(24, 64)[:, :32] = u
+    chroma[24 * 64:].reshape(24, 64)[:, :32] = v
+
+    assert np.array_equal(yuv420_to_bgr(padded, (64, 48)), cv2.cvtColor(i420, cv2.COLOR_YUV2BGR_I420))
+
+
+def test_gray_frame_is_strided_lores_y_plane(camera: CameraService):
+    gray = camera.get_gray_frame()
+    assert gray.shape == (240, 320)
+    assert gray.dtype == np.uint8
+
+
+def test_motion_size_must_divide_the_stream_size():
+    PicameraBackend(camera_factory=FakePicamera2, stream_size=(640, 480), motion_size=(160, 120))
+    for motion_size in [(300, 240), (320, 120), (0, 0)]:
+        with pytest.raises(ValueError):
+            PicameraBackend(camera_factory=FakePicamera2, stream_size=(640, 480), motion_size=motion_size)
+
+
+def test_gray_frame_without_camera_uses_placeholder():
+    service = CameraService(
+        picamera_available=False,
+        stream_stale_sec=30,
+        stream_debounce_sec=0,
+        stream_warmup_sec=10,
+        is_recording=lambda: False,
+    )
+    assert service.get_gray_frame().ndim == 2
+
+
+def test_motion_detects_moving_object_on_lores(camera: CameraService):
+    notifications: list = []
+    motion = _motion(camera, notifications)
+    motion.step()
+    motion.step()
+    assert motion.last_motion_ts is not None
+    assert motion.motion_metrics["last_contour_area"] >= 500
+    assert notifications == ["motion"]
+
+
+def test_stream_session_publishes_encoder_frames(camera: CameraService):
+    viewer = camera.stream_hub.subscribe()
+    try:
+        view = viewer.next_frame(timeout=2.0)
+        assert view is not None
+        assert bytes(view.data[:2]) == b"\xff\xd8"
+        assert camera.stream_active
+    finally:
+        camera.stream_hub.unsubscribe(viewer)
+    assert not camera.stream_active
+
+
+def test_replay_backend_forwards_jpeg_without_reencoding(tmp_path):
+    from services.fake_camera import FakePicamera2 as _Scene
+
+    scene = _Scene()
+    scene.start()
+    mjpeg = tmp_path / "clip.mjpeg"
+    mjpeg.write_bytes(scene.capture_jpeg() + scene.capture_jpeg())
+
+    backend = ReplayBackend(source=mjpeg, fps=50)
+    received: list = []
+    try:
+        assert backend.start_mjpeg(received.append)
+        assert backend.capture_gray().ndim == 2
+        deadline = time.monotonic() + 2.0
+        while not received and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        backend.close()
+    assert received
+    assert set(received) <= set(backend.frames)
+    assert len(backend.frames) == 2
+
+
+def test_jpeg_source_backend_requires_its_source_hooks():
+    from services.camera_backends import _JpegSourceBackend
+
+    class NoReader(_JpegSourceBackend):
+        def _open_source(self) -> bool:
+            return True
+
+    with pytest.raises(TypeError):
+        NoReader(fps=10)
+
+
+def test_replay_backend_synthetic_source_drives_stream():
+    service = CameraService(
+        picamera_available=True,
+        stream_stale_sec=30,
+        stream_debounce_sec=0,
+        stream_warmup_sec=10,
+        is_recording=lambda: False,
+        backend=ReplayBackend(fps=50),
+    )
+    viewer = service.stream_hub.subscribe()
+    try:
+        assert viewer.next_frame(timeout=2.0) is not None
+        assert service.get_frame_array().shape == (480, 640, 3)
+    finally:
+        service.stream_hub.unsubscribe(viewer)
+    assert service.capture_video(5, None) is None
+
+
+def test_stream_profiles_use_backend_stream_width():
+    service = CameraService(
+        picamera_available=True,
+        stream_stale_sec=30,
+        stream_debounce_sec=0,
+        stream_warmup_sec=10,
+        is_recording=lambda: False,
+        backend=ReplayBackend(fps=50, size=(1280, 720)),
+    )
+    assert service.stream_profiles.source_width == 1280
+    assert service.stream_profiles.normalize(width=960).width == 960
+
+
+def test_recording_runs_alongside_stream_without_reconfiguring(camera: CameraService, tmp_path):
+    viewer = camera.stream_hub.subscribe()
+    try:
+        assert viewer.next_frame(timeout=2.0) is not None
+        picam = camera.backend.picam
+        configure_calls = picam.configure_calls
+
+        clip = tmp_path / "clip.h264"
+        assert camera.backend.start_h264(clip)
+        assert camera.backend.recording
+        assert camera.get_gray_frame() is not None
+        before = viewer.last_seq
+        assert viewer.next_frame(timeout=2.0).seq > before
+        deadline = time.monotonic() + 2.0
+        while not clip.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        camera.backend.stop_h264()
+
+        assert camera.backend.picam is picam
+        assert picam.configure_calls == configure_calls
+        assert camera.stream_hub.is_running
+        assert clip.exists()
+    finally:
+        camera.stream_hub.unsubscribe(viewer)
+
+
+def test_session_stays_open_and_tracks_mode_switches(camera: CameraService, tmp_path):
+    viewer = camera.stream_hub.subscribe()
+    assert viewer.next_frame(timeout=2.0) is not None
+    assert camera.session_stats()["mode"] == "stream"
+    picam = camera.backend.picam
+    camera.stream_hub.unsubscribe(viewer)
+
+    stats = camera.session_stats()
+    assert stats["mode"] == "preview"
+    assert camera.backend.picam is picam
+
+    camera.capture_photo(tmp_path / "still.jpg")
+    assert (tmp_path / "still.jpg").exists()
+    stats = camera.session_stats()
+    assert stats["mode"] == "preview"
+    assert stats["opens"] == 1
+    assert stats["transitions"]["preview->still"] == 1
+    assert stats["transitions"]["still->preview"] == 1
+    assert stats["transitions"]["stream->preview"] == 1
+    assert stats["switch_count"] == 5
+    assert stats["max_switch_ms"] >= stats["avg_switch_ms"] > 0
+
+
+def test_photo_during_stream_preempts_and_resumes_stream(camera: CameraService, tmp_path):
+    viewer = camera.stream_hub.subscribe()
+    try:
+        assert viewer.next_frame(timeout=2.0) is not None
+        camera.capture_photo(tmp_path / "still.jpg")
+        assert (tmp_path / "still.jpg").exists()
+        stats = camera.session_stats()
+        assert stats["transitions"]["preview->still"] == 1
+        assert stats["broker"]["preemptions"] == {"stream": 1}
+        assert stats["mode"] == "stream"
+        before = viewer.last_seq
+        assert viewer.next_frame(timeout=2.0).seq > before
+    finally:
+        camera.stream_hub.unsubscribe(viewer)
+
+
+def test_failed_photo_resumes_stream_and_writes_placeholder(camera: CameraService, tmp_path, monkeypatch):
+    viewer = camera.stream_hub.subscribe()
+    try:
+        assert viewer.next_frame(timeout=2.0) is not None
+
+        def broken(path):
+            raise RuntimeError("ISP timeout")
+
+        monkeypatch.setattr(camera.backend, "capture_file", broken)
+        camera.capture_photo(tmp_path / "still.jpg")
+        assert (tmp_path / "still.jpg").read_bytes().startswith(b"\xff\xd8")
+        assert camera.session_stats()["mode"] == "stream"
+        before = viewer.last_seq
+        assert viewer.next_frame(timeout=2.0).seq > before
+    finally:
+        camera.stream_hub.unsubscribe(viewer)
+
+
+def test_snapshot_does_not_queue_behind_a_long_camera_job(camera: CameraService):
+    import threading
+
+    from services.camera_broker import PRIORITY_RECORD
+
+    camera.snapshot_timeout_sec = 0.1
+    camera.snapshot_max_age_sec = 0
+    first, _ = camera.snapshot()
+    holding, release = threading.Event(), threading.Event()
+
+    def long_job():
+        holding.set()
+        release.wait(5.0)
+
+    worker = threading.Thread(target=camera.broker.run, args=(PRIORITY_RECORD, long_job))
+    worker.start()
+    try:
+        assert holding.wait(2.0)
+        started = time.monotonic()
+        assert camera.snapshot()[0] == first
+        assert time.monotonic() - started < 1.0
+        camera.snapshot_cache = None
+        with pytest.raises(TimeoutError):
+            camera.snapshot()
+    finally:
+        release.set()
+        worker.join()
+
+
+def test_snapshot_uses_stream_frame_and_caches_camera_captures(camera: CameraService):
+    data, etag = camera.snapshot()
+    assert data.startswith(b"\xff\xd8")
+    assert camera.snapshot() == (data, etag)
+    assert camera.snapshot_captures == 1
+    assert camera.session_stats()["broker"]["consumers"]["still"]["jobs"] == 1
+
+    viewer = camera.stream_hub.subscribe()
+    try:
+        assert viewer.next_frame(timeout=2.0) is not None
+        data, etag = camera.snapshot()
+        assert etag.startswith('"f')
+        assert camera.snapshot_captures == 1
+    finally:
+        camera.stream_hub.unsubscribe(viewer)
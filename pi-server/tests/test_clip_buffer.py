@@ -0,0 +1,134 @@
+"""Tests for the pre-event H264 circular buffer used for motion clips."""
+import threading
+import time
+from pathlib import Path
+
+from services.clip_buffer import MotionClipBuffer
+
+
+def _feed(buffer: MotionClipBuffer, start: float, seconds: int, fps: int = 10, gop: int = 10) -> float:
+    """Feed ``seconds`` of fake packets (keyframe every ``gop`` packets); returns the next timestamp."""
+    ts = start
+    for index in range(seconds * fps):
+        buffer.add_packet(b"K" if index % gop == 0 else b"p", index % gop == 0, ts)
+        ts += 1.0 / fps
+    return ts
+
+
+def test_buffer_keeps_only_pre_event_window_starting_on_keyframe():
+    buffer = MotionClipBuffer(pre_seconds=2, post_seconds=1, max_bytes=10_000)
+    _feed(buffer, 0.0, 10)
+    assert buffer.packets[0][1] is True
+    assert buffer.packets[-1][0] - buffer.packets[0][0] <= 3.0
+    assert buffer.stats()["buffered_seconds"] >= 2.0
+
+
+def test_buffer_respects_memory_budget():
+    buffer = MotionClipBuffer(pre_seconds=60, post_seconds=1, max_bytes=25)
+    _feed(buffer, 0.0, 10)
+    assert buffer.buffered_bytes <= 25
+    assert buffer.packets[0][1] is True
+
+
+def test_trigger_writes_pre_roll_and_post_trigger_packets(tmp_path: Path):
+    ready = []
+    done = threading.Event()
+
+    def on_clip_ready(path: Path, fps) -> None:
+        ready.append((path, fps))
+        done.set()
+
+    buffer = MotionClipBuffer(pre_seconds=2, post_seconds=1, max_bytes=10_000, on_clip_ready=on_clip_ready)
+    ts = _feed(buffer, 0.0, 5)
+    pre_roll = b"".join(packet for _, _, packet in buffer.packets)
+
+    clip = tmp_path / "motion_test.h264"
+    assert buffer.trigger(clip, now=ts) is True
+    assert buffer.trigger(clip, now=ts) is False
+    _feed(buffer, ts, 2)
+
+    assert not buffer.active
+    assert done.wait(2.0)
+    data = clip.read_bytes()
+    assert data.startswith(pre_roll)
+    assert len(data) > len(pre_roll)
+    assert buffer.clips_written == 1
+    assert ready[0][0] == clip
+    assert round(ready[0][1]) == 10
+
+
+def test_slow_disk_does_not_block_the_encoder_callback(tmp_path: Path, monkeypatch):
+    import builtins
+
+    real_open = builtins.open
+
+    class SlowFile:
+        def __init__(self, *args) -> None:
+            self.handle = real_open(*args)
+
+        def write(self, data: bytes) -> int:
+            time.sleep(0.05)
+            return self.handle.write(data)
+
+        def close(self) -> None:
+            self.handle.close()
+
+    monkeypatch.setattr("services.clip_buffer.open", SlowFile, raising=False)
+    done = threading.Event()
+    buffer = MotionClipBuffer(pre_seconds=2, post_seconds=1, max_bytes=10_000, on_clip_ready=lambda *_: done.set())
+    ts = _feed(buffer, 0.0, 3)
+    buffer.trigger(tmp_path / "motion_slow.h264", now=ts)
+
+    started = time.perf_counter()
+    _feed(buffer, ts, 2)
+    assert time.perf_counter() - started < 0.5
+    assert done.wait(5.0)
+    assert buffer.clips_written == 1
+
+
+def test_close_clip_finishes_active_clip(tmp_path: Path):
+    buffer = MotionClipBuffer(pre_seconds=2, post_seconds=30, max_bytes=10_000)
+    ts = _feed(buffer, 0.0, 3)
+    buffer.trigger(tmp_path / "motion_test.h264", now=ts)
+    buffer.close_clip()
+    assert not buffer.active
+    assert buffer.buffered_bytes == 0
+
+
+def test_stalled_writer_skips_to_a_keyframe_instead_of_growing(tmp_path: Path, monkeypatch):
+    import builtins
+
+    real_open = builtins.open
+    unblock = threading.Event()
+
+    class StuckFile:
+        def __init__(self, *args) -> None:
+            self.handle = real_open(*args)
+
+        def write(self, data: bytes) -> int:
+            unblock.wait(5.0)
+            return self.handle.write(data)
+
+        def close(self) -> None:
+            self.handle.close()
+
+    monkeypatch.setattr("services.clip_buffer.open", StuckFile, raising=False)
+    done = threading.Event()
+    buffer = MotionClipBuffer(pre_seconds=1, post_seconds=30, max_bytes=40, on_clip_ready=lambda *_: done.set())
+    ts = _feed(buffer, 0.0, 1)
+    buffer.trigger(tmp_path / "motion_stuck.h264", now=ts)
+    ts = _feed(buffer, ts, 10)
+    assert buffer.clip_pending_bytes <= 40
+    assert buffer.stats()["clip_packets_skipped"] > 0
+
+    unblock.set()
+    # Once the writer catches up, the clip resumes on a keyframe.
+    deadline = time.monotonic() + 2.0
+    while buffer.clip_pending_bytes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    skipped = buffer.clip_packets_skipped
+    _feed(buffer, ts, 2)
+    assert buffer.clip_packets_skipped - skipped < 10
+    buffer.close_clip()
+    assert done.wait(2.0)
+    assert buffer.clip_pending_bytes == 0
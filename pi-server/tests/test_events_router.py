@@ -35,6 +35,17 @@ def test_events_includes_photos_and_motion(tmp_media: Path):
     assert "motion_002.jpg" in names
 
 
+def test_events_includes_motion_clips(tmp_media: Path):
+    (tmp_media / "motion_20260101_120000.mp4").write_bytes(b"fake-mp4")
+    (tmp_media / "motion_20260101_120500.h264").write_bytes(b"in-progress")
+
+    app = FastAPI()
+    app.include_router(create_events_router(tmp_media, list_recordings_fn=lambda: []))
+    names = [item["filename"] for item in TestClient(app).get("/events").json()]
+    assert "motion_20260101_120000.mp4" in names
+    assert "motion_20260101_120500.h264" not in names
+
+
 def test_events_sorted_by_timestamp_descending(tmp_media: Path):
     """Latest file should appear first in the events list."""
     import time
@@ -94,3 +105,22 @@ def test_recordings_includes_injected_files(tmp_media: Path):
 
     names = [item["filename"] for item in client.get("/recordings").json()]
     assert "recording_001.mp4" in names
+
+
+def test_media_ranges_and_revalidation(tmp_media: Path):
+    clip = tmp_media / "recording_001.mp4"
+    clip.write_bytes(bytes(range(256)) * 4)
+    app = FastAPI()
+    app.include_router(create_events_router(tmp_media, list_recordings_fn=lambda: []))
+    client = TestClient(app)
+
+    full = client.get("/media/recording_001.mp4")
+    assert (full.status_code, full.headers["content-type"], full.content) == (200, "video/mp4", clip.read_bytes())
+    etag = full.headers["etag"]
+
+    assert client.get("/media/recording_001.mp4", headers={"If-None-Match": etag}).status_code == 304
+    tail = client.get("/media/recording_001.mp4", headers={"Range": "bytes=-24"})
+    assert (tail.status_code, tail.headers["content-range"]) == (206, "bytes 1000-1023/1024")
+    assert tail.content == clip.read_bytes()[-24:]
+    out_of_bounds = client.get("/media/recording_001.mp4", headers={"Range": "bytes=4096-"})
+    assert (out_of_bounds.status_code, out_of_bounds.headers["content-range"]) == (416, "bytes */1024")
@@ -0,0 +1,83 @@
+"""Tests for the preallocated encoded-frame ring buffer."""
+from services.frame_ring import MJPEG_PART_HEADER, FrameRing
+
+
+def test_write_returns_increasing_sequence_numbers():
+    ring = FrameRing(size=4, slot_capacity=16)
+    assert [ring.write(b"a"), ring.write(b"b"), ring.write(b"c")] == [1, 2, 3]
+    assert ring.latest().seq == 3
+
+
+def test_reader_view_is_zero_copy():
+    ring = FrameRing(size=4, slot_capacity=16)
+    seq = ring.write(b"jpeg", timestamp=12.5)
+    view = ring.get(seq)
+    assert isinstance(view.data, memoryview)
+    assert bytes(view.data) == b"jpeg"
+    assert view.timestamp == 12.5
+    assert view.data.obj is ring.slots[seq % ring.size].buffer
+
+
+def test_lapped_frames_are_no_longer_readable():
+    ring = FrameRing(size=2, slot_capacity=16)
+    first = ring.write(b"one")
+    view = ring.get(first)
+    ring.write(b"two")
+    ring.write(b"three")
+    assert ring.get(first) is None
+    assert not ring.is_current(view)
+
+
+def test_pinned_view_survives_being_lapped():
+    ring = FrameRing(size=2, slot_capacity=16)
+    first = ring.write(b"one")
+    view = ring.wait_newer(0, timeout=0.1, pin=True)
+    for frame in (b"two", b"THREE", b"four", b"FIVE"):
+        ring.write(frame)
+    # The slow sender still holds the original bytes; the writer moved to a fresh buffer.
+    assert view.seq == first
+    assert bytes(view.data) == b"one"
+    assert ring.pinned_swaps == 1
+    ring.release(view)
+
+    unpinned = ring.get(ring.seq)
+    ring.write(b"six")
+    ring.write(b"seven")
+    # Unpinned readers keep the old in-place behaviour and must check is_current.
+    assert ring.pinned_swaps == 1
+    assert unpinned.data.obj is ring.slots[ring.seq % ring.size].buffer
+    assert not ring.is_current(unpinned)
+
+
+def test_oversized_frame_grows_slot():
+    ring = FrameRing(size=2, slot_capacity=4)
+    seq = ring.write(b"0123456789")
+    assert bytes(ring.get(seq).data) == b"0123456789"
+    assert ring.slot_grows == 1
+
+
+def test_part_header_is_precomputed():
+    assert MJPEG_PART_HEADER == b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+
+
+def test_async_wait_is_woken_by_writer_thread():
+    import asyncio
+    import threading
+
+    ring = FrameRing(size=4, slot_capacity=16)
+
+    async def _wait():
+        threading.Timer(0.05, ring.write, args=(b"async",)).start()
+        return await ring.wait_newer_async(0, timeout=2.0)
+
+    view = asyncio.run(_wait())
+    assert bytes(view.data) == b"async"
+    assert not ring.async_waiters
+
+
+def test_async_wait_times_out_without_frames():
+    import asyncio
+
+    ring = FrameRing(size=4, slot_capacity=16)
+    assert asyncio.run(ring.wait_newer_async(0, timeout=0.05)) is None
+    assert not ring.async_waiters
@@ -0,0 +1,67 @@
+"""Tests for the in-memory fMP4/HLS live segmenter."""
+import io
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+av = pytest.importorskip("av")
+
+from services.hls import HlsSegmenter
+
+
+def _h264_packets(count: int, keyint: int = 10, size: tuple[int, int] = (160, 120)) -> list[tuple[bytes, bool]]:
+    codec = av.CodecContext.create("libx264", "w")
+    codec.width, codec.height = size
+    codec.pix_fmt = "yuv420p"
+    codec.time_base = Fraction(1, 10)
+    codec.options = {"tune": "zerolatency", "x264-params": f"keyint={keyint}:repeat-headers=1"}
+    packets = []
+    for index in range(count):
+        image = np.full((size[1], size[0], 3), index * 8 % 255, dtype=np.uint8)
+        frame = av.VideoFrame.from_ndarray(image, format="rgb24").reformat(format="yuv420p")
+        frame.pts = index
+        packets += [(bytes(packet), packet.is_keyframe) for packet in codec.encode(frame)]
+    return packets
+
+
+def _feed(segmenter: HlsSegmenter, packets, fps: float = 10, start: float = 0.0) -> None:
+    for index, (data, keyframe) in enumerate(packets):
+        segmenter.add_packet(data, keyframe, timestamp=start + index / fps)
+
+
+def test_packets_become_fmp4_segments_and_playlist():
+    segmenter = HlsSegmenter(target_duration=2.0, max_segments=3)
+    _feed(segmenter, _h264_packets(101))
+
+    playlist = segmenter.playlist()
+    init = segmenter.init_segment()
+    assert init[4:8] == b"ftyp" and b"moov" in init
+    assert "#EXT-X-MAP:URI=\"init.mp4?g=0\"" in playlist
+    assert "#EXTINF:2.000," in playlist
+    # 10 s of 1 s GOPs at a 2 s target: 4 closed segments, of which the newest 3 are kept.
+    assert segmenter.stats()["segments_evicted"] == 1
+    assert "#EXT-X-MEDIA-SEQUENCE:1" in playlist
+    assert segmenter.segment(0) is None
+    media = segmenter.segment(3)
+    assert media[4:8] == b"moof"
+
+    # What a player fetches (init + the listed segments) decodes as one continuous stream.
+    fetched = init + segmenter.segment(1) + segmenter.segment(2) + media
+    with av.open(io.BytesIO(fetched)) as container:
+        assert sum(1 for _ in container.decode(video=0)) >= 60
+
+
+def test_reset_starts_new_generation_with_discontinuity():
+    segmenter = HlsSegmenter(target_duration=1.0)
+    packets = _h264_packets(31)
+    _feed(segmenter, packets)
+    assert segmenter.playlist() is not None
+
+    segmenter.reset()
+    assert segmenter.playlist() is None
+    _feed(segmenter, packets, start=10.0)
+    playlist = segmenter.playlist()
+    assert 'init.mp4?g=1"' in playlist
+    assert playlist.count("#EXT-X-DISCONTINUITY\n") == 1
+    assert segmenter.wait_ready(0.1)
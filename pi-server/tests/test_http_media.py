@@ -0,0 +1,85 @@
+"""Tests for the shared range / conditional-request layer used by the media endpoints."""
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from utils import RangeNotSatisfiable, parse_range, plan_media_response
+from utils.http_media import MediaFileResponse, plan_chunks
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-99", [(0, 99)]),
+        ("bytes=900-", [(900, 999)]),
+        ("bytes=-100", [(900, 999)]),
+        ("bytes=-5000", [(0, 999)]),
+        ("bytes=500-5000", [(500, 999)]),
+        ("bytes=0-9, 20-29", [(0, 9), (20, 29)]),
+        ("bytes=50-99,0-60,100-120", [(0, 120)]),
+        ("bytes=0-9,2000-3000", [(0, 9)]),
+        (None, None),
+        ("items=0-9", None),
+        ("bytes=9-0", None),
+        ("bytes=abc", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+def test_conditional_requests():
+    etag = '"abc"'
+    assert plan_media_response({"if-none-match": '"x", W/"abc"'}, 10, "video/mp4", etag).status == 304
+    assert plan_media_response({"if-none-match": '"x"'}, 10, "video/mp4", etag).status == 200
+    since = "Thu, 01 Jan 2026 00:00:00 GMT"
+    assert plan_media_response({"if-modified-since": since}, 10, "video/mp4", etag, 1767225600.0).status == 304
+    assert plan_media_response({"if-modified-since": since}, 10, "video/mp4", etag, 1767225601.0).status == 200
+
+    # A stale If-Range validator turns the range request into a full response.
+    ranged = {"range": "bytes=0-4", "if-range": etag}
+    assert plan_media_response(ranged, 10, "video/mp4", etag).status == 206
+    assert plan_media_response({**ranged, "if-range": '"old"'}, 10, "video/mp4", etag).status == 200
+
+    plan = plan_media_response({"range": "bytes=20-"}, 10, "video/mp4", etag)
+    assert (plan.status, plan.headers["Content-Range"], plan.parts) == (416, "bytes */10", [])
+
+
+def test_multipart_body_matches_content_length():
+    content = bytes(range(100))
+    plan = plan_media_response({"range": "bytes=0-9,-10"}, len(content), "video/mp4")
+    body = b"".join(plan_chunks(plan, lambda start, length: [content[start:start + length]]))
+
+    boundary = plan.headers["Content-Type"].split("boundary=")[1]
+    assert len(body) == int(plan.headers["Content-Length"])
+    assert body.startswith(f"--{boundary}\r\nContent-Type: video/mp4\r\nContent-Range: bytes 0-9/100\r\n\r\n".encode())
+    assert content[:10] + f"\r\n--{boundary}\r\n".encode() in body
+    assert body.endswith(content[90:] + f"\r\n--{boundary}--\r\n".encode())
+
+
+def test_file_response_uses_zero_copy_extensions(tmp_path: Path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"0123456789")
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    def serve(headers, extensions):
+        sent.clear()
+        plan = plan_media_response(headers, 10, "video/mp4")
+        scope = {"type": "http", "method": "GET", "extensions": extensions}
+        asyncio.run(MediaFileResponse(path, plan, "video/mp4")(scope, None, send))
+        return sent[1:]
+
+    assert serve({}, {"http.response.pathsend": {}}) == [{"type": "http.response.pathsend", "path": str(path)}]
+    spans = serve({"range": "bytes=2-4"}, {"http.response.zerocopysend": {}})
+    assert (spans[0]["type"], spans[0]["offset"], spans[0]["count"]) == ("http.response.zerocopysend", 2, 3)
+    assert [message["body"] for message in serve({"range": "bytes=2-4"}, {})] == [b"234", b""]
@@ -0,0 +1,180 @@
+"""Tests for the read-through /azure/media cache."""
+import threading
+import time
+from pathlib import Path
+
+from services.media_cache import BlobMediaCache, BlobProperties
+
+
+class FakeUpstream:
+    def __init__(self, blobs: dict[str, bytes]) -> None:
+        self.blobs = blobs
+        self.props_calls = 0
+        self.downloads = 0
+
+    def properties(self, name: str) -> BlobProperties:
+        self.props_calls += 1
+        return BlobProperties(size=len(self.blobs[name]), etag=f'"{name}"')
+
+    def download(self, name: str, handle) -> None:
+        self.downloads += 1
+        handle.write(self.blobs[name])
+
+
+def _cache(tmp_path: Path, upstream: FakeUpstream, max_bytes: int = 4000, media_dir=None) -> BlobMediaCache:
+    return BlobMediaCache(
+        tmp_path / "cache",
+        max_bytes=max_bytes,
+        fetch_properties=upstream.properties,
+        download=upstream.download,
+        media_dir=media_dir,
+    )
+
+
+def _fill(cache: BlobMediaCache, name: str) -> None:
+    cache.fill_async(name, cache.properties(name))
+    deadline = time.monotonic() + 2.0
+    while cache._key(name) in cache.filling and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_filled_blobs_are_served_locally_and_properties_cached(tmp_path: Path):
+    upstream = FakeUpstream({"recordings/a.mp4": b"a" * 500})
+    cache = _cache(tmp_path, upstream)
+    props = cache.properties("recordings/a.mp4")
+    assert cache.open("recordings/a.mp4", props) is None
+
+    _fill(cache, "recordings/a.mp4")
+    for _ in range(3):
+        with cache.open("recordings/a.mp4", cache.properties("recordings/a.mp4")) as handle:
+            assert handle.read() == b"a" * 500
+
+    assert upstream.downloads == 1
+    assert upstream.props_calls == 1
+    stats = cache.stats()
+    assert (stats["cache_hits"], stats["misses"], stats["fills"]) == (3, 1, 1)
+
+
+def test_least_recently_used_blob_is_evicted(tmp_path: Path):
+    upstream = FakeUpstream({name: name.encode() * 240 for name in "abcde"})
+    cache = _cache(tmp_path, upstream, max_bytes=1000)
+    for name in "abcd":
+        _fill(cache, name)
+    cache.open("a", cache.properties("a")).close()
+    _fill(cache, "e")
+
+    assert cache.open("b", cache.properties("b")) is None
+    assert cache.open("a", cache.properties("a")) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 960
+
+    # The LRU survives a restart.
+    reopened = _cache(tmp_path, upstream, max_bytes=1000)
+    assert reopened.stats()["entries"] == 4
+
+
+def test_local_media_is_preferred_when_sizes_match(tmp_path: Path):
+    media = tmp_path / "media"
+    media.mkdir()
+    (media / "recording_1.mp4").write_bytes(b"x" * 100)
+    upstream = FakeUpstream({"recordings/recording_1.mp4": b"x" * 100, "photo_1.jpg": b"y" * 50})
+    (media / "photo_1.jpg").write_bytes(b"y" * 10)
+    cache = _cache(tmp_path, upstream, media_dir=media)
+
+    with cache.open("recordings/recording_1.mp4", cache.properties("recordings/recording_1.mp4")) as handle:
+        assert handle.read() == b"x" * 100
+    # A local file that differs from the blob is not trusted.
+    assert cache.open("photo_1.jpg", cache.properties("photo_1.jpg")) is None
+    assert cache.stats()["local_hits"] == 1
+
+
+def test_oversized_blobs_are_streamed_but_not_kept(tmp_path: Path):
+    upstream = FakeUpstream({"big.mp4": b"z" * 2000})
+    cache = _cache(tmp_path, upstream, max_bytes=4000)
+    _fill(cache, "big.mp4")
+    assert upstream.downloads == 0
+
+    # The admission cap is its own setting, never above the cache size.
+    roomy = BlobMediaCache(
+        tmp_path / "roomy", 4000, upstream.properties, upstream.download, max_fill_bytes=3000
+    )
+    _fill(roomy, "big.mp4")
+    assert upstream.downloads == 1
+    assert roomy.stats()["entries"] == 1
+
+
+def test_properties_are_pruned_with_their_copies(tmp_path: Path):
+    upstream = FakeUpstream({name: name.encode() * 400 for name in "abc"})
+    cache = BlobMediaCache(
+        tmp_path / "cache", 1000, upstream.properties, upstream.download, max_fill_bytes=1000, max_props=3
+    )
+    _fill(cache, "a")
+    _fill(cache, "b")
+    _fill(cache, "c")
+    # Filling "c" evicted "a" and its properties with it.
+    assert list(cache.props) == ["b", "c"]
+    cache.invalidate("c")
+    assert list(cache.props) == ["b"]
+    for name in ["x", "y", "z"]:
+        cache.remember_properties(name, BlobProperties(size=1, etag=None))
+    assert list(cache.props) == ["x", "y", "z"]
+
+
+def test_streamed_fill_is_installed_only_when_complete(tmp_path: Path):
+    upstream = FakeUpstream({"a.jpg": b"a" * 100})
+    cache = _cache(tmp_path, upstream)
+    props = cache.properties("a.jpg")
+
+    fill = cache.begin_fill("a.jpg", props)
+    assert cache.begin_fill("a.jpg", props) is None
+    fill.write(b"a" * 50)
+    fill.abort()
+    assert cache.open("a.jpg", props) is None
+
+    fill = cache.begin_fill("a.jpg", props)
+    fill.write(b"a" * 100)
+    fill.finish()
+    with cache.open("a.jpg", props) as handle:
+        assert handle.read() == b"a" * 100
+    assert upstream.downloads == 0
+
+
+def test_cached_copy_is_not_served_after_the_blob_changes(tmp_path: Path):
+    upstream = FakeUpstream({"a.jpg": b"a" * 100})
+    cache = _cache(tmp_path, upstream)
+    _fill(cache, "a.jpg")
+    props = cache.properties("a.jpg")
+    cache.open("a.jpg", props).close()
+
+    # Same size, new content: only the ETag tells them apart, also after a restart.
+    replaced = BlobProperties(size=100, etag='"a.jpg-v2"')
+    assert cache.open("a.jpg", replaced) is None
+    reopened = _cache(tmp_path, upstream)
+    assert reopened.open("a.jpg", replaced) is None
+    reopened.open("a.jpg", props).close()
+
+
+def test_fill_racing_an_invalidate_is_discarded(tmp_path: Path):
+    upstream = FakeUpstream({"a.jpg": b"a" * 100})
+    started, release = threading.Event(), threading.Event()
+    download = upstream.download
+
+    def slow_download(name: str, handle) -> None:
+        started.set()
+        release.wait(2.0)
+        download(name, handle)
+
+    upstream.download = slow_download
+    cache = _cache(tmp_path, upstream)
+    props = cache.properties("a.jpg")
+    cache.fill_async("a.jpg", props)
+    assert started.wait(2.0)
+    cache.invalidate("a.jpg")
+    release.set()
+    deadline = time.monotonic() + 2.0
+    while cache.filling and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert cache.open("a.jpg", props) is None
+    assert cache.stats()["fills"] == 0
+    assert not list((tmp_path / "cache").iterdir())
@@ -0,0 +1,53 @@
+"""Tests for the in-process MP4 muxer used for recordings."""
+from fractions import Fraction
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+av = pytest.importorskip("av")
+
+from services.mp4_output import Mp4Output
+
+
+def _h264_packets(count: int = 30, size: tuple[int, int] = (160, 120)) -> list[tuple[bytes, bool]]:
+    """Encode ``count`` synthetic frames to Annex-B H264 packets, like the Pi encoder emits."""
+    codec = av.CodecContext.create("libx264", "w")
+    codec.width, codec.height = size
+    codec.pix_fmt = "yuv420p"
+    codec.time_base = Fraction(1, 30)
+    codec.options = {"tune": "zerolatency", "x264-params": "keyint=10:repeat-headers=1"}
+    packets = []
+    for index in range(count):
+        image = np.full((size[1], size[0], 3), index * 8 % 255, dtype=np.uint8)
+        frame = av.VideoFrame.from_ndarray(image, format="rgb24").reformat(format="yuv420p")
+        frame.pts = index
+        packets += [(bytes(packet), packet.is_keyframe) for packet in codec.encode(frame)]
+    packets += [(bytes(packet), packet.is_keyframe) for packet in codec.encode(None)]
+    return packets
+
+
+def test_packets_are_muxed_into_playable_mp4(tmp_path: Path):
+    path = tmp_path / "recording_test.mp4"
+    output = Mp4Output(path, fps=30, size=(160, 120))
+    output.start()
+    for index, (data, keyframe) in enumerate(_h264_packets()):
+        output.outputframe(data, keyframe, timestamp=index * 33_333)
+    output.stop()
+
+    assert output.packets_written == 30
+    with av.open(str(path)) as container:
+        stream = container.streams.video[0]
+        assert stream.codec_context.name == "h264"
+        assert (stream.codec_context.width, stream.codec_context.height) == (160, 120)
+        assert sum(1 for _ in container.decode(stream)) == 30
+
+
+def test_leading_non_keyframes_are_dropped(tmp_path: Path):
+    packets = _h264_packets()
+    output = Mp4Output(tmp_path / "late.mp4", fps=30)
+    output.outputframe(packets[1][0], False, timestamp=0)
+    assert output.container is None
+    output.outputframe(packets[0][0], True, timestamp=33_333)
+    output.stop()
+    assert output.packets_written == 1
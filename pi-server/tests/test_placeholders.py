@@ -0,0 +1,38 @@
+"""Tests for the pre-encoded placeholder frame cache."""
+from services.placeholders import (
+    PLACEHOLDER_CAMERA_UNAVAILABLE,
+    PLACEHOLDER_MESSAGES,
+    PLACEHOLDER_RECORDING,
+    PlaceholderCache,
+)
+
+
+def test_jpeg_rendered_once_per_state():
+    cache = PlaceholderCache()
+    first = cache.jpeg(PLACEHOLDER_RECORDING)
+    assert first.startswith(b"\xff\xd8")
+    assert cache.jpeg(PLACEHOLDER_RECORDING) is first
+    assert cache.renders == 1
+
+
+def test_states_render_distinct_frames():
+    cache = PlaceholderCache()
+    frames = {cache.jpeg(state) for state in PLACEHOLDER_MESSAGES}
+    assert len(frames) == len(PLACEHOLDER_MESSAGES)
+
+
+def test_array_is_decoded_once_and_read_only():
+    cache = PlaceholderCache(size=(320, 240))
+    frame = cache.array(PLACEHOLDER_CAMERA_UNAVAILABLE)
+    assert frame.shape == (240, 320, 3)
+    assert not frame.flags.writeable
+    assert cache.array(PLACEHOLDER_CAMERA_UNAVAILABLE) is frame
+
+
+def test_timestamp_overlay_rerendered_once_per_second():
+    cache = PlaceholderCache()
+    first = cache._stamped_jpeg(PLACEHOLDER_RECORDING, now=1000.1)
+    assert cache._stamped_jpeg(PLACEHOLDER_RECORDING, now=1000.9) is first
+    second = cache._stamped_jpeg(PLACEHOLDER_RECORDING, now=1001.0)
+    assert second != first
+    assert cache.renders == 2
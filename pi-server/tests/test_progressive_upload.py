@@ -0,0 +1,66 @@
+"""Tests for staging a recording as blob blocks while it is still being written."""
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from services.progressive_upload import ProgressiveUpload
+
+
+class FakeBlob:
+    def __init__(self, fail: bool = False) -> None:
+        self.blocks: dict[str, bytes] = {}
+        self.committed = None
+        self.fail = fail
+
+    def stage_block(self, block_id: str, data: bytes) -> None:
+        if self.fail:
+            raise ConnectionError("uplink dropped")
+        self.blocks[block_id] = data
+
+    def commit(self, block_ids: list[str]) -> None:
+        self.committed = b"".join(self.blocks[block_id] for block_id in block_ids)
+
+
+def _write_slowly(path: Path, chunks: int, chunk: bytes, delay: float) -> threading.Thread:
+    def _writer():
+        with open(path, "ab") as handle:
+            for _ in range(chunks):
+                handle.write(chunk)
+                handle.flush()
+                time.sleep(delay)
+
+    thread = threading.Thread(target=_writer, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_blocks_are_staged_while_the_file_grows(tmp_path: Path):
+    path = tmp_path / "recording_1.mp4"
+    path.touch()
+    blob = FakeBlob()
+    upload = ProgressiveUpload(path, blob.stage_block, blob.commit, block_size=1000, poll_sec=0.01).start()
+
+    writer = _write_slowly(path, chunks=20, chunk=bytes(range(250)), delay=0.01)
+    writer.join(2.0)
+    result = upload.finish()
+
+    assert blob.committed == path.read_bytes()
+    assert result["bytes"] == 5000
+    assert result["blocks"] == 5
+    assert result["blocks_during_capture"] >= 3
+
+
+def test_staging_errors_surface_on_finish(tmp_path: Path):
+    path = tmp_path / "recording_2.mp4"
+    path.write_bytes(b"x" * 3000)
+    blob = FakeBlob(fail=True)
+    upload = ProgressiveUpload(path, blob.stage_block, blob.commit, block_size=1000, poll_sec=0.01).start()
+    deadline = time.monotonic() + 1.0
+    while upload.error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    with pytest.raises(ConnectionError):
+        upload.finish()
+    assert blob.committed is None
@@ -0,0 +1,155 @@
+"""Tests for the queued recording pipeline (capture -> remux -> upload)."""
+import asyncio
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from services.backend_service import BackendService
+from services.recording_jobs import (
+    PHASE_DONE,
+    PHASE_FAILED,
+    PHASE_REMUXING,
+    PHASE_UPLOADING,
+    RecordingJob,
+    RecordingJobQueue,
+)
+from services.upload_queue import UploadQueue
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_next_capture_starts_while_previous_clip_is_remuxing(tmp_path: Path):
+    captured = []
+    finished = []
+    release_remux = threading.Event()
+
+    def capture(job):
+        path = tmp_path / f"{job.id}.h264"
+        path.write_bytes(b"h264")
+        captured.append(job.id)
+        return path
+
+    async def remux(path: Path) -> Path:
+        while not release_remux.is_set():
+            await asyncio.sleep(0.01)
+        return path.with_suffix(".mp4")
+
+    jobs = RecordingJobQueue(capture, remux, lambda job, path: finished.append(path.name))
+    first = jobs.submit(5, source="button")
+    second = jobs.submit(5, source="button")
+
+    assert _wait_for(lambda: len(captured) == 2)
+    assert first.phase == PHASE_REMUXING
+    release_remux.set()
+    assert _wait_for(lambda: second.phase == PHASE_DONE)
+    assert first.phase == PHASE_DONE
+    assert sorted(finished) == sorted([f"{first.id}.mp4", f"{second.id}.mp4"])
+    assert jobs.get(first.id).to_dict()["filename"] == f"{first.id}.mp4"
+
+
+def test_failed_capture_marks_job_failed_and_queue_keeps_running(tmp_path: Path):
+    states = []
+
+    def capture(job):
+        if job.source == "broken":
+            raise RuntimeError("camera busy")
+        path = tmp_path / "ok.mp4"
+        path.write_bytes(b"mp4")
+        return path
+
+    async def remux(path: Path) -> Path:
+        raise AssertionError("mp4 output should not be remuxed")
+
+    jobs = RecordingJobQueue(capture, remux, lambda job, path: None, on_capture_state=states.append)
+    broken = jobs.submit(5, source="broken")
+    ok = jobs.submit(5)
+
+    assert _wait_for(lambda: ok.phase == PHASE_DONE)
+    assert broken.phase == PHASE_FAILED
+    assert broken.error == "capture failed"
+    assert states[-1] is None
+
+
+def test_submit_rejects_when_queue_is_full():
+    hold = threading.Event()
+
+    def capture(job):
+        hold.wait(2.0)
+        return None
+
+    async def remux(path: Path) -> Path:
+        return path
+
+    jobs = RecordingJobQueue(capture, remux, lambda job, path: None, max_pending=1)
+    try:
+        jobs.submit(5)
+        assert _wait_for(lambda: jobs.capturing is not None)
+        assert jobs.submit(5) is not None
+        assert jobs.submit(5) is None
+    finally:
+        hold.set()
+
+
+def _backend(tmp_path: Path, upload) -> tuple[BackendService, UploadQueue]:
+    queue = UploadQueue(upload, tmp_path / "journal.jsonl", workers=1, max_attempts=2, base_delay=0.01)
+    backend = BackendService(
+        media_dir=tmp_path,
+        media_retention_days=1,
+        recording_state={},
+        camera_service=MagicMock(),
+        motion_service=MagicMock(),
+        notification_service=MagicMock(),
+        azure_service=MagicMock(is_configured=True),
+        upload_queue=queue,
+        progressive_upload=False,
+    )
+    queue.on_uploaded = backend.upload_finished
+    queue.on_dropped = backend.upload_dropped
+    return backend, queue
+
+
+def _recording(tmp_path: Path) -> tuple[RecordingJob, Path]:
+    path = tmp_path / "recording_1.mp4"
+    path.write_bytes(b"mp4")
+    return RecordingJob(id="rec-1", duration=5, source="api", phase=PHASE_UPLOADING), path
+
+
+def test_recording_is_announced_only_once_its_queued_upload_lands(tmp_path: Path):
+    release = threading.Event()
+    backend, queue = _backend(tmp_path, lambda path, blob_name: release.wait(2.0))
+    job, path = _recording(tmp_path)
+    queue.start()
+    try:
+        assert backend._finish_recording(job, path) is True
+        time.sleep(0.1)
+        assert job.phase == PHASE_UPLOADING
+        backend.notification_service.send_push_notification_sync.assert_not_called()
+        release.set()
+        assert _wait_for(lambda: job.phase == PHASE_DONE)
+        assert _wait_for(lambda: backend.notification_service.send_push_notification_sync.called)
+    finally:
+        queue.stop()
+
+
+def test_recording_fails_when_its_upload_is_dropped(tmp_path: Path):
+    def upload(path: Path, blob_name: str) -> None:
+        raise ConnectionError("offline")
+
+    backend, queue = _backend(tmp_path, upload)
+    job, path = _recording(tmp_path)
+    queue.start()
+    try:
+        backend._finish_recording(job, path)
+        assert _wait_for(lambda: job.phase == PHASE_FAILED)
+    finally:
+        queue.stop()
+    assert job.error == "upload failed: offline"
+    backend.notification_service.send_push_notification_sync.assert_not_called()
@@ -0,0 +1,116 @@
+"""Tests for the shared MJPEG broadcast hub used by /stream."""
+from services.stream_hub import StreamHub
+
+
+class _Session:
+    def __init__(self, ok: bool = True):
+        self.ok = ok
+        self.starts = 0
+        self.stops = 0
+
+    def start(self) -> bool:
+        self.starts += 1
+        return self.ok
+
+    def stop(self) -> None:
+        self.stops += 1
+
+
+def _hub(session: _Session) -> StreamHub:
+    return StreamHub(start_session=session.start, stop_session=session.stop)
+
+
+def test_first_subscriber_starts_single_session():
+    session = _Session()
+    hub = _hub(session)
+    first = hub.subscribe()
+    second = hub.subscribe()
+    assert session.starts == 1
+    assert hub.is_running
+    hub.unsubscribe(first)
+    assert session.stops == 0
+    hub.unsubscribe(second)
+    assert session.stops == 1
+    assert not hub.is_running
+
+
+def test_publish_fans_out_to_all_subscribers():
+    hub = _hub(_Session())
+    viewers = [hub.subscribe() for _ in range(3)]
+    seq = hub.publish(b"jpeg-1")
+    views = [viewer.next_frame(timeout=0.1) for viewer in viewers]
+    assert [view.seq for view in views] == [seq] * 3
+    assert all(bytes(view.data) == b"jpeg-1" for view in views)
+
+
+def test_each_frame_delivered_once():
+    hub = _hub(_Session())
+    viewer = hub.subscribe()
+    hub.publish(b"frame-1")
+    assert bytes(viewer.next_frame(timeout=0.1).data) == b"frame-1"
+    assert viewer.next_frame(timeout=0.05) is None
+
+
+def test_slow_subscriber_skips_to_newest_frame():
+    hub = _hub(_Session())
+    viewer = hub.subscribe()
+    hub.publish(b"frame-0")
+    viewer.next_frame(timeout=0.1)
+    for index in range(1, 5):
+        hub.publish(b"frame-%d" % index)
+    assert bytes(viewer.next_frame(timeout=0.1).data) == b"frame-4"
+    assert viewer.frames_skipped == 3
+
+
+def test_frame_being_sent_is_not_overwritten_by_a_lapping_writer():
+    hub = StreamHub(start_session=_Session().start, stop_session=lambda: None, ring_size=2)
+    viewer = hub.subscribe()
+    hub.publish(b"frame-0")
+    view = viewer.next_frame(timeout=0.1)
+    for index in range(1, 6):
+        hub.publish(b"FRAME-%d" % index)
+    assert bytes(view.data) == b"frame-0"
+
+    assert bytes(viewer.next_frame(timeout=0.1).data) == b"FRAME-5"
+    hub.unsubscribe(viewer)
+    assert all(slot.pins == 0 for slot in hub.ring.slots)
+
+
+def test_waiting_subscriber_is_woken_by_publish():
+    import threading
+
+    hub = _hub(_Session())
+    viewer = hub.subscribe()
+    timer = threading.Timer(0.05, hub.publish, args=(b"late",))
+    timer.start()
+    view = viewer.next_frame(timeout=2.0)
+    timer.join()
+    assert bytes(view.data) == b"late"
+
+
+def test_joining_live_session_gets_current_frame():
+    hub = _hub(_Session())
+    hub.subscribe()
+    hub.publish(b"current")
+    late_viewer = hub.subscribe()
+    assert bytes(late_viewer.next_frame(timeout=0.1).data) == b"current"
+
+
+def test_close_all_wakes_subscribers():
+    session = _Session()
+    hub = _hub(session)
+    viewer = hub.subscribe()
+    hub.close_all()
+    assert viewer.closed
+    assert viewer.next_frame(timeout=0.1) is None
+    assert session.stops == 1
+
+
+def test_failed_session_start_is_retried_by_next_subscriber():
+    session = _Session(ok=False)
+    hub = _hub(session)
+    hub.subscribe()
+    assert not hub.is_running
+    session.ok = True
+    hub.subscribe()
+    assert hub.is_running
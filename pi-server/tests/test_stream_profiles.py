@@ -0,0 +1,100 @@
+"""Tests for shared, downscaled /stream profiles."""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from services.frame_ring import FrameRing
+from services.stream_profiles import StreamProfile, StreamProfileManager
+
+
+def _jpeg(index: int) -> bytes:
+    frame = np.full((480, 640, 3), index % 255, dtype=np.uint8)
+    return cv2.imencode(".jpg", frame)[1].tobytes()
+
+
+class _Source:
+    def __init__(self, ring: FrameRing, fps: float = 50) -> None:
+        self.ring = ring
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(1.0 / fps,), daemon=True)
+
+    def _run(self, interval: float) -> None:
+        index = 0
+        while not self.stop.wait(interval):
+            index += 1
+            self.ring.write(_jpeg(index))
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join(1.0)
+
+
+def test_normalize_clamps_and_maps_source_settings_to_none():
+    manager = StreamProfileManager(FrameRing())
+    assert manager.normalize() is None
+    assert manager.normalize(width=1920) is None
+    assert manager.normalize(width=321, fps=100, quality=1) == StreamProfile(width=320, fps=30.0, quality=10)
+
+
+def test_clients_of_one_profile_share_a_downscaled_variant():
+    ring = FrameRing()
+    manager = StreamProfileManager(ring)
+    profile = manager.normalize(width=320, fps=10)
+    first_variant, first = manager.subscribe(profile)
+    second_variant, second = manager.subscribe(profile)
+    assert first_variant is second_variant
+    try:
+        with _Source(ring):
+            view = first.next_frame(timeout=2.0)
+            assert second.next_frame(timeout=2.0) is not None
+            time.sleep(0.5)
+        decoded = cv2.imdecode(np.frombuffer(view.data, np.uint8), cv2.IMREAD_COLOR)
+        assert decoded.shape[:2] == (240, 320)
+        stats = manager.stats()["profiles"][profile.key]
+        assert stats["readers"] == 2
+        # 50 fps in, capped at 10 fps out (plus scheduling slack).
+        assert stats["frames_out"] <= 10
+    finally:
+        manager.unsubscribe(first_variant, first)
+        manager.unsubscribe(second_variant, second)
+
+
+def test_idle_variant_is_evicted_by_its_worker():
+    ring = FrameRing()
+    manager = StreamProfileManager(ring, idle_sec=0.1)
+    variant, reader = manager.subscribe(manager.normalize(width=160))
+    manager.unsubscribe(variant, reader)
+    deadline = time.monotonic() + 3.0
+    while manager.variants and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not manager.variants
+    assert manager.evictions == 1
+    assert variant.stopped
+
+
+def test_idle_variant_blocks_instead_of_spinning():
+    ring = FrameRing()
+    manager = StreamProfileManager(ring, idle_sec=30.0)
+    variant, reader = manager.subscribe(manager.normalize(width=160))
+    manager.unsubscribe(variant, reader)
+    calls = []
+    wait_newer = ring.wait_newer
+
+    def counting_wait_newer(*args, **kwargs):
+        calls.append(1)
+        return wait_newer(*args, **kwargs)
+
+    ring.wait_newer = counting_wait_newer
+    try:
+        with _Source(ring, fps=20):
+            time.sleep(0.5)
+        # Roughly one wait per source frame, not a busy loop on the last one.
+        assert len(calls) <= 15
+    finally:
+        manager.close_all()
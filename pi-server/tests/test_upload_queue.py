@@ -0,0 +1,148 @@
+"""Tests for the journaled background Azure upload queue."""
+import threading
+import time
+from pathlib import Path
+
+from services.upload_queue import UploadQueue
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_failed_uploads_are_retried_with_backoff(tmp_path: Path):
+    photo = tmp_path / "photo_1.jpg"
+    photo.write_bytes(b"x" * 100)
+    attempts = []
+
+    def upload(path: Path, blob_name: str) -> None:
+        attempts.append((blob_name, time.monotonic()))
+        if len(attempts) < 3:
+            raise ConnectionError("offline")
+
+    queue = UploadQueue(upload, tmp_path / "journal.jsonl", workers=1, base_delay=0.05, max_delay=0.2)
+    queue.start()
+    try:
+        queue.enqueue(photo, "photos/photo_1.jpg")
+        assert _wait_for(lambda: queue.stats()["completed"] == 1)
+    finally:
+        queue.stop()
+
+    assert [blob for blob, _ in attempts] == ["photos/photo_1.jpg"] * 3
+    first_gap = attempts[1][1] - attempts[0][1]
+    second_gap = attempts[2][1] - attempts[1][1]
+    assert first_gap >= 0.04
+    assert second_gap > first_gap
+    stats = queue.stats()
+    assert stats["depth"] == 0
+    assert stats["failed_attempts"] == 2
+    assert stats["bytes_uploaded"] == 100
+    assert stats["uploads_last_min"] == 1
+    # The journal is compacted back to empty once the queue drains.
+    assert _wait_for(lambda: (tmp_path / "journal.jsonl").read_text() == "")
+
+
+def test_pending_uploads_survive_a_restart(tmp_path: Path):
+    journal = tmp_path / "journal.jsonl"
+    files = []
+    for index in range(3):
+        path = tmp_path / f"photo_{index}.jpg"
+        path.write_bytes(b"jpeg")
+        files.append(path)
+
+    # Never started: simulates a crash before the workers got to the files.
+    first = UploadQueue(lambda path, blob_name: None, journal)
+    for path in files:
+        first.enqueue(path)
+    first.tasks.clear()
+
+    uploaded = []
+    lock = threading.Lock()
+
+    def upload(path: Path, blob_name: str) -> None:
+        with lock:
+            uploaded.append(blob_name)
+
+    second = UploadQueue(upload, journal, workers=2)
+    assert second.stats()["depth"] == 3
+    second.start()
+    try:
+        assert _wait_for(lambda: second.stats()["completed"] == 3)
+    finally:
+        second.stop()
+    assert sorted(uploaded) == ["photo_0.jpg", "photo_1.jpg", "photo_2.jpg"]
+    assert UploadQueue(upload, journal).stats()["depth"] == 0
+
+
+def test_missing_files_and_exhausted_retries_are_dropped(tmp_path: Path):
+    present = tmp_path / "clip.mp4"
+    present.write_bytes(b"mp4")
+
+    def upload(path: Path, blob_name: str) -> None:
+        raise ConnectionError("offline")
+
+    dropped = []
+    queue = UploadQueue(
+        upload, tmp_path / "journal.jsonl", max_attempts=2, base_delay=0.01, on_dropped=dropped.append
+    )
+    queue.start()
+    try:
+        queue.enqueue(tmp_path / "gone.jpg")
+        queue.enqueue(present)
+        assert _wait_for(lambda: queue.stats()["dropped"] == 2)
+    finally:
+        queue.stop()
+    assert queue.stats()["failed_attempts"] == 2
+    assert queue.stats()["completed"] == 0
+    assert sorted(task.blob_name for task in dropped) == ["clip.mp4", "gone.jpg"]
+    assert [task.last_error for task in dropped if task.blob_name == "clip.mp4"] == ["offline"]
+
+
+class _HookedCondition:
+    """Runs ``on_release`` right after the wrapped condition is released."""
+
+    def __init__(self, cond: threading.Condition, on_release) -> None:
+        self.cond = cond
+        self.on_release = on_release
+
+    def __enter__(self):
+        return self.cond.__enter__()
+
+    def __exit__(self, *exc):
+        result = self.cond.__exit__(*exc)
+        self.on_release()
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.cond, name)
+
+
+def test_compaction_keeps_a_task_enqueued_mid_snapshot(tmp_path: Path):
+    journal = tmp_path / "journal.jsonl"
+    photo = tmp_path / "photo_1.jpg"
+    photo.write_bytes(b"x")
+    queue = UploadQueue(lambda path, blob_name: None, journal)
+    compactor = threading.current_thread()
+    fired = []
+
+    def enqueue_between_snapshot_and_write() -> None:
+        # Fire once, just after the compaction snapshot is taken.
+        if threading.current_thread() is not compactor or fired:
+            return
+        fired.append(True)
+        enqueuer = threading.Thread(target=queue.enqueue, args=(photo, "photos/photo_1.jpg"))
+        enqueuer.start()
+        enqueuer.join(0.3)
+        fired.append(enqueuer)
+
+    queue.cond = _HookedCondition(queue.cond, enqueue_between_snapshot_and_write)
+    queue._compact()
+    fired[-1].join(2.0)
+
+    resumed = UploadQueue(lambda path, blob_name: None, journal)
+    assert [task.blob_name for task in resumed.tasks.values()] == ["photos/photo_1.jpg"]
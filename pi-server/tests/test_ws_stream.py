@@ -0,0 +1,75 @@
+"""Tests for the acknowledged WebSocket frame stream."""
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import create_camera_router
+from services.camera_service import CameraService
+from services.camera_backends import ReplayBackend
+from services.ws_stream import WS_FRAME_HEADER, WS_FRAME_VERSION, WS_MAX_WINDOW
+
+
+def _client(service: CameraService) -> TestClient:
+    app = FastAPI()
+    app.include_router(
+        create_camera_router(
+            health_fn=lambda: {"status": "ok"},
+            stream_fn=service.stream_response,
+            stop_stream_fn=service.stop_stream,
+            photo_fn=lambda: {},
+            record_start_fn=lambda req: {},
+            stream_ws_fn=service.stream_websocket,
+        )
+    )
+    return TestClient(app)
+
+
+def test_websocket_frames_are_flow_controlled_by_acks():
+    service = CameraService(
+        picamera_available=True,
+        stream_stale_sec=30,
+        stream_debounce_sec=0,
+        stream_warmup_sec=10,
+        is_recording=lambda: False,
+        backend=ReplayBackend(fps=50),
+    )
+    with _client(service).websocket_connect("/stream/ws?window=2") as ws:
+        first = ws.receive_bytes()
+        version, seq1, ts = WS_FRAME_HEADER.unpack_from(first)
+        assert version == WS_FRAME_VERSION
+        assert abs(ts / 1_000_000 - time.time()) < 5
+        assert first[WS_FRAME_HEADER.size:WS_FRAME_HEADER.size + 2] == b"\xff\xd8"
+        _, seq2, _ = WS_FRAME_HEADER.unpack_from(ws.receive_bytes())
+
+        # Window is full: the server must wait instead of queueing frames.
+        time.sleep(0.3)
+        stats = service.ws_stats()[0]
+        assert stats["in_flight"] == 2
+        assert stats["frames_sent"] == 2
+
+        ws.send_text(json.dumps({"ack": seq2}))
+        _, seq3, _ = WS_FRAME_HEADER.unpack_from(ws.receive_bytes())
+        # The viewer resumes on a fresh frame; the ones produced meanwhile were skipped.
+        assert seq3 > seq2 + 1
+        stats = service.ws_stats()[0]
+        assert stats["frames_acked"] == 2
+        assert stats["frames_dropped"] >= seq3 - seq2 - 1
+        assert stats["rtt_ms"] is not None
+    service.stop_stream()
+
+
+def test_websocket_window_is_clamped():
+    service = CameraService(
+        picamera_available=True,
+        stream_stale_sec=30,
+        stream_debounce_sec=0,
+        stream_warmup_sec=10,
+        is_recording=lambda: False,
+        backend=ReplayBackend(fps=50),
+    )
+    with _client(service).websocket_connect("/stream/ws?window=100000") as ws:
+        ws.receive_bytes()
+        assert service.ws_stats()[0]["window"] == WS_MAX_WINDOW
+    service.stop_stream()
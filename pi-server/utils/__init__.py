@@ -1,3 +1,16 @@
-from .helpers import clamp, cleanup_old_media
+from .helpers import clamp, cleanup_old_media, parse_size, parse_timestamp, remux_h264_to_mp4, remux_h264_to_mp4_async
+from .http_media import MediaPlan, RangeNotSatisfiable, file_response, parse_range, plan_media_response
 
-__all__ = ["clamp", "cleanup_old_media"]
+__all__ = [
+    "clamp",
+    "cleanup_old_media",
+    "file_response",
+    "MediaPlan",
+    "parse_range",
+    "parse_size",
+    "parse_timestamp",
+    "plan_media_response",
+    "RangeNotSatisfiable",
+    "remux_h264_to_mp4",
+    "remux_h264_to_mp4_async",
+]
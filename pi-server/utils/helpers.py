@@ -1,4 +1,9 @@
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
+import asyncio
+import shutil
+import subprocess
 import time
 
 
@@ -6,6 +11,78 @@ def clamp(value: float, minimum: int, maximum: int) -> float:
     return max(minimum, min(maximum, value))
 
 
+def parse_size(value: str, default: tuple[int, int]) -> tuple[int, int]:
+    try:
+        width, height = (int(part) for part in value.lower().split("x", 1))
+    except (AttributeError, ValueError):
+        return default
+    if width <= 0 or height <= 0:
+        return default
+    return width, height
+
+
+def parse_timestamp(value: str) -> float:
+    """Epoch seconds from either a number or an ISO 8601 string (naive means UTC)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _remux_command(video_path: Path, mp4_path: Path, framerate: Optional[int]) -> list[str]:
+    command = ["ffmpeg", "-y"]
+    if framerate:
+        command += ["-framerate", str(framerate)]
+    return command + ["-i", str(video_path), "-c:v", "copy", str(mp4_path)]
+
+
+def remux_h264_to_mp4(video_path: Path, framerate: Optional[int] = None) -> Path:
+    """Copy a raw .h264 stream into an .mp4 container; returns the raw path if ffmpeg is unavailable or fails."""
+    if not shutil.which("ffmpeg"):
+        print("FFmpeg not found; keeping raw h264 recording")
+        return video_path
+
+    mp4_path = video_path.with_suffix(".mp4")
+    command = _remux_command(video_path, mp4_path, framerate)
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        print(f"FFmpeg conversion successful: {mp4_path}")
+        video_path.unlink()
+        return mp4_path
+    except Exception as convert_err:
+        print(f"FFmpeg conversion error: {convert_err}")
+        return video_path
+
+
+async def remux_h264_to_mp4_async(video_path: Path, framerate: Optional[int] = None) -> Path:
+    """Same as ``remux_h264_to_mp4`` but awaits ffmpeg as an asyncio subprocess."""
+    if not shutil.which("ffmpeg"):
+        print("FFmpeg not found; keeping raw h264 recording")
+        return video_path
+
+    mp4_path = video_path.with_suffix(".mp4")
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *_remux_command(video_path, mp4_path, framerate),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await process.communicate()
+    except Exception as convert_err:
+        print(f"FFmpeg conversion error: {convert_err}")
+        return video_path
+    if process.returncode != 0:
+        print(f"FFmpeg conversion error: exit {process.returncode}: {stderr.decode(errors='replace')[-300:]}")
+        return video_path
+    print(f"FFmpeg conversion successful: {mp4_path}")
+    video_path.unlink()
+    return mp4_path
+
+
 def cleanup_old_media(media_dir: Path, retention_days: int) -> None:
     if retention_days <= 0:
         return
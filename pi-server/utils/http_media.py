@@ -0,0 +1,246 @@
+import os
+import secrets
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterable, Iterator, Mapping, Optional
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[list[tuple[int, int]]]:
+    """Inclusive ``(start, end)`` byte ranges from a ``Range`` header, sorted and coalesced.
+
+    Returns None when the header should be ignored (absent, malformed, not
+    bytes, or too many ranges) and the whole body served; raises
+    RangeNotSatisfiable when it is valid but no range overlaps the body.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(","):
+        first, dash, last = part.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if not first:
+                # Suffix range: the last N bytes.
+                suffix = int(last)
+                if suffix < 0:
+                    return None
+                if suffix > 0 and size > 0:
+                    ranges.append((max(0, size - suffix), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last.strip() else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end < start):
+            return None
+        if start < size:
+            ranges.append((start, size - 1 if end is None else min(end, size - 1)))
+    if not ranges:
+        raise RangeNotSatisfiable(f"bytes */{size}")
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged if len(merged) <= MAX_RANGES else None
+
+
+def _opaque_tags(header: str) -> list[str]:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def etag_matches(header: str, etag: Optional[str]) -> bool:
+    """Weak ETag comparison against an ``If-None-Match`` list."""
+    if header.strip() == "*":
+        return True
+    return etag is not None and etag.removeprefix("W/") in _opaque_tags(header)
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+@dataclass
+class MediaPlan:
+    """What to send for a media GET: status, headers and the byte spans of the body.
+
+    ``parts`` are ``(preamble, start, length)``: the preamble bytes go out
+    before ``length`` bytes of the resource from ``start``. Only
+    multipart/byteranges responses have preambles and an ``epilogue``.
+    """
+
+    status: int
+    headers: dict[str, str]
+    parts: list[tuple[bytes, int, int]] = field(default_factory=list)
+    epilogue: bytes = b""
+
+
+def plan_media_response(
+    request_headers: Mapping[str, str],
+    size: int,
+    content_type: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[float] = None,
+) -> MediaPlan:
+    """Evaluate conditional and range headers for a resource of ``size`` bytes."""
+    headers = {"Accept-Ranges": "bytes"}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag_matches(if_none_match, etag):
+            return MediaPlan(304, headers)
+    elif last_modified is not None and request_headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request_headers["if-modified-since"]).timestamp()
+        except (TypeError, ValueError):
+            since = None
+        if since is not None and int(last_modified) <= since:
+            return MediaPlan(304, headers)
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header and if_range is not None:
+        # If-Range needs a strong validator match; otherwise the client's copy is stale.
+        strong_etag = etag is not None and not etag.startswith("W/") and if_range.strip() == etag
+        if not strong_etag and if_range.strip() != headers.get("Last-Modified"):
+            range_header = None
+
+    try:
+        ranges = parse_range(range_header, size)
+    except RangeNotSatisfiable as exc:
+        return MediaPlan(416, {**headers, "Content-Range": str(exc), "Content-Length": "0"})
+
+    if ranges is None:
+        headers["Content-Length"] = str(size)
+        return MediaPlan(200, headers, [(b"", 0, size)])
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return MediaPlan(206, headers, [(b"", start, end - start + 1)])
+
+    boundary = secrets.token_hex(12)
+    parts = []
+    for index, (start, end) in enumerate(ranges):
+        # Each part after the first starts with the CRLF that ends the previous one.
+        separator = "\r\n" if index else ""
+        preamble = (
+            f"{separator}--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        )
+        parts.append((preamble.encode("latin-1"), start, end - start + 1))
+    epilogue = f"\r\n--{boundary}--\r\n".encode("latin-1")
+    headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+    headers["Content-Length"] = str(sum(len(preamble) + length for preamble, _, length in parts) + len(epilogue))
+    return MediaPlan(206, headers, parts, epilogue)
+
+
+def plan_chunks(plan: MediaPlan, read: Callable[[int, int], Iterable[bytes]]) -> Iterator[bytes]:
+    """The response body for ``plan``, with ``read(start, length)`` supplying resource bytes."""
+    for preamble, start, length in plan.parts:
+        if preamble:
+            yield preamble
+        yield from read(start, length)
+    if plan.epilogue:
+        yield plan.epilogue
+
+
+async def plan_chunks_async(plan: MediaPlan, read: Callable[[int, int], AsyncIterator[bytes]]) -> AsyncIterator[bytes]:
+    for preamble, start, length in plan.parts:
+        if preamble:
+            yield preamble
+        async for chunk in read(start, length):
+            yield chunk
+    if plan.epilogue:
+        yield plan.epilogue
+
+
+class MediaFileResponse(Response):
+    """Serves a planned local file response, zero-copy when the ASGI server allows it.
+
+    Whole files go out as ``http.response.pathsend`` and byte spans as
+    ``http.response.zerocopysend`` when the server advertises those
+    extensions; otherwise the file is read in chunks off the event loop.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: Path, plan: MediaPlan, media_type: str) -> None:
+        self.path = path
+        self.plan = plan
+        super().__init__(status_code=plan.status, headers=plan.headers, media_type=media_type)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions") or {}
+        parts = self.plan.parts
+        if scope.get("method") == "HEAD" or not parts:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if self.status_code == 200 and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        zerocopy = "http.response.zerocopysend" in extensions
+        handle = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            for preamble, start, length in parts:
+                if preamble:
+                    await send({"type": "http.response.body", "body": preamble, "more_body": True})
+                if zerocopy:
+                    await send(
+                        {
+                            "type": "http.response.zerocopysend",
+                            "file": handle,
+                            "offset": start,
+                            "count": length,
+                            "more_body": True,
+                        }
+                    )
+                    continue
+                offset, end = start, start + length
+                while offset < end:
+                    data = await anyio.to_thread.run_sync(os.pread, handle.fileno(), min(self.chunk_size, end - offset), offset)
+                    if not data:
+                        break
+                    offset += len(data)
+                    await send({"type": "http.response.body", "body": data, "more_body": True})
+        finally:
+            handle.close()
+        await send({"type": "http.response.body", "body": self.plan.epilogue, "more_body": False})
+
+
+def file_response(path: Path, request_headers: Mapping[str, str], media_type: str) -> Response:
+    """A conditional, range-aware response for a local file."""
+    stat_result = path.stat()
+    plan = plan_media_response(
+        request_headers, stat_result.st_size, media_type, file_etag(stat_result), stat_result.st_mtime
+    )
+    return MediaFileResponse(path, plan, media_type)